@@ -6,7 +6,7 @@ import importlib.util
 import config
 import inspect
 
-from app.utils.db_utils import DbCfg
+from app.utils.db_utils import db_manager
 from app.views import register_all_views
 
 
@@ -17,8 +17,6 @@ class FlaskApp(_Flask):
     def __init__(self, *args, **kwargs):
         super(FlaskApp, self).__init__(*args, **kwargs)
 
-from app.views.basic_views import basic_app  # 导入蓝图
-
 app = FlaskApp(
     config.APP_NAME,
     static_url_path='/%s/static' % config.APP_NAME,
@@ -38,8 +36,16 @@ register_all_views(module)
 
 app.register_blueprint(module, url_prefix='/%s' % config.APP_NAME)
 
-db_zj3 = DbCfg('zj3', config.DATABASES).init_db(app)
-db_zj3user = DbCfg('zj3user', config.DATABASES).init_db(app)
-db_zj3setting = DbCfg('zj3setting', config.DATABASES).init_db(app)
-db_zj3element = DbCfg('zj3element', config.DATABASES).init_db(app)
-db_zj3bim = DbCfg('zj3bim', config.DATABASES).init_db(app)
+# 数据库按需创建，请求结束时由同一个 teardown 钩子归还本请求用到的连接
+db_manager.init_app(app)
+db_zj3 = db_manager.proxy('zj3')
+db_zj3user = db_manager.proxy('zj3user')
+db_zj3setting = db_manager.proxy('zj3setting')
+db_zj3element = db_manager.proxy('zj3element')
+db_zj3bim = db_manager.proxy('zj3bim')
+
+# 开发环境可开启 SYNC_MODELS，启动时创建缺失的表；生产环境由部署步骤执行 python -m app.models.migrations
+if getattr(config, 'SYNC_MODELS', False):
+    from app.models import sync_models
+
+    sync_models()
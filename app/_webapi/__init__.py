@@ -1,72 +1,257 @@
-from functools import wraps
-from flask import request, jsonify
+import inspect
+import time
+from contextlib import ExitStack
+from functools import partial, wraps
+from flask import Response, request
 from enum import Enum
 
+from app.utils.sql_profiler import attach_summary as attach_sql_summary, should_attach_summary as should_attach_sql_summary
+
+from .aio import run_coroutine, run_sync
+from .caching import CachePolicy, LocalRedis, LRUCacheBackend, RedisCacheBackend
+from .coalesce import SingleFlight
+from .keys import current_user_id, make_request_key
+from .limits import Bulkhead, RateLimit, RejectedError, admit, get_bulkhead, register_bulkhead, resolve_admission
+from .metrics import EndpointMetrics, error_type_of
+from .serializers import (
+    RequestBodyError, build_response, is_msgpack_request, load_request_json, load_request_msgpack,
+    negotiate_serializer,
+)
+from .streaming import event_stream_response
+
 
 class InputType(Enum):
     FORM = 'form'
     JSON = 'json'
+    MSGPACK = 'msgpack'
 
 
-def rpc(desc, args=None, returns=None, input_type=InputType.FORM):
+def rpc(desc, args=None, returns=None, input_type=InputType.FORM, timeout=None,
+        stream=False, heartbeat=15, cache=None, coalesce=False, bulkhead=None, rate_limit=None):
     """
     RPC装饰器，用于处理请求参数验证和响应格式化
 
+    被装饰的方法可以是普通函数，也可以是 async def 协程函数；
+    协程在 worker 共享的事件循环上执行（见 app/_webapi/aio.py）。
+
     Args:
         descr: API描述
         args: 参数定义字典
         returns: 返回值定义
-        input_type: 输入类型(FORM/JSON)
+        input_type: 输入类型(FORM/JSON/MSGPACK)，也可以是元组，如 (InputType.JSON, InputType.MSGPACK)，
+            此时按请求的 Content-Type 选择解析方式；响应格式按 Accept 头协商（JSON 或 MessagePack）
+        timeout: async 视图的最长执行时间（秒），超时取消协程并返回 504
+        stream: 流式模式，视图为（async）生成器，yield 的 chunk 以 SSE(text/event-stream) 下发，
+            此时忽略 returns
+        heartbeat: 流式模式下无数据时发送心跳的间隔（秒）
+        cache: 响应缓存策略 CachePolicy，缓存序列化后的成功响应（见 app/_webapi/caching.py）
+        coalesce: 是否合并同一 worker 内 (接口, 参数, 用户) 相同的并发请求，只执行一次并共享结果；
+                  未接入用户标识（keys.set_identity_provider）时不合并
+        bulkhead: 并发隔离舱，Bulkhead 实例或 config.BULKHEADS 中的名称；未指定时取视图类的 bulkhead 属性。
+            名称未配置时装饰即报错（ValueError）
+        rate_limit: 按用户的令牌桶限流 RateLimit；未指定时取视图类的 rate_limit 属性
+            （准入控制见 app/_webapi/limits.py，超限返回 503/429 与 Retry-After）
     """
+    # 装饰时一次性编译 schema，请求期间直接复用
+    args_plan = compile_schema(args)
+    returns_plan = compile_schema(returns, output=True)
+    input_types = tuple(input_type) if isinstance(input_type, (tuple, list)) else (input_type,)
+    bulkhead, rate_limit = resolve_admission(bulkhead, rate_limit)
 
     def decorator(func):
-        @wraps(func)
-        def wrapper(self, *f_args, **f_kwargs):
+        is_async = inspect.iscoroutinefunction(func)
+        endpoint = f'{func.__module__}.{func.__qualname__}'
+        stats = EndpointMetrics(endpoint)
+        flights = SingleFlight() if coalesce else None
+
+        def handle(self, validated_data):
+            """执行视图并校验出参，返回 (响应体, HTTP 状态码)"""
+            started = time.perf_counter()
             # 创建请求和响应对象
             req = RequestObject()
             rsp = ResponseObject()
+            req.update(validated_data)
             try:
-                # 根据 input_type 获取请求数据
-                if input_type == InputType.JSON:
-                    raw_data = request.get_json(silent=True) or {}
-                else:
-                    # 优先取 querystring，再合并 form，确保 GET 也能取到参数
-                    raw_data = {}
-                    raw_data.update(request.args.to_dict())
-                    raw_data.update(request.form.to_dict())
-
-                # 验证并解析输入参数
-                validated_data = validate_input(raw_data, args)
-                req.update(validated_data)
-
                 # 调用实际的处理函数
-                func(self, req, rsp)
+                if is_async:
+                    run_coroutine(func(self, req, rsp), timeout=timeout)
+                else:
+                    func(self, req, rsp)
 
                 # 验证返回值格式
-                if returns:
-                    rsp.data = validate_output(rsp.data, returns)
+                if returns_plan:
+                    rsp.data = validate_output(rsp.data, returns_plan)
 
-                return jsonify(rsp.to_dict())
+                payload, status = rsp.to_payload(), 200
 
             except ValidationError as e:
-                return jsonify({
-                    'result': 1,
-                    'message': str(e),
-                    'error': e.to_dict()
-                }), e.error_code
+                payload, status = _validation_error_payload(e), e.error_code
+            except TimeoutError:
+                payload, status = {
+                    'result': -1,
+                    'message': f'Request timeout after {timeout}s'
+                }, 504
             except Exception as e:
-                return jsonify({
+                payload, status = {
                     'result': -1,
                     'message': f'Internal error: {str(e)}'
-                })
+                }, 200
+
+            stats.phase('handler', time.perf_counter() - started)
+            error_type = error_type_of(payload, status)
+            if error_type is not None:
+                stats.error(error_type)
+            return payload, status
+
+        def invoke(self, raw_data):
+            """
+            校验入参并执行视图，返回 (响应体, HTTP 状态码)
+
+            批量接口（app/_webapi/batch.py）在进程内直接调用
+            """
+            stats.request(0)
+            try:
+                # 验证并解析输入参数
+                validated_data = args_plan(raw_data) if args_plan else {}
+            except ValidationError as e:
+                stats.error(e.error_type)
+                return _validation_error_payload(e), e.error_code
+            try:
+                with admit(*admission(self)):
+                    return handle(self, validated_data)
+            except RejectedError as e:
+                stats.error(e.error_type)
+                return e.to_payload(), e.status
+
+        def execute(self, validated_data, serializer):
+            """执行视图并序列化，返回 (响应体字节, HTTP 状态码, 是否为成功响应)"""
+            payload, status = handle(self, validated_data)
+            started = time.perf_counter()
+            body = serializer.dumps(payload)
+            stats.phase('serialization', time.perf_counter() - started)
+            return body, status, status == 200 and payload.get('result') == 0
+
+        def execute_coalesced(validated_data, serializer, produce):
+            if current_user_id() is None:
+                # 用户未知时不能确认是同一用户的相同请求，不合并
+                return produce()
+            key = make_request_key(endpoint, validated_data, prefix='rpc-flight', variant=serializer.mimetype)
+            result, shared = flights.do(key, produce)
+            stats.coalesced(shared)
+            return result
+
+        def invoke_stream(self, validated_data, on_close):
+            req = RequestObject()
+            rsp = ResponseObject()
+            req.update(validated_data)
+            # 生成器在响应迭代时才开始执行，错误以 SSE error 事件返回
+            return event_stream_response(func(self, req, rsp), heartbeat=heartbeat, on_close=on_close)
+
+        def admission(self):
+            """本次调用适用的 (隔离舱, 限流)，rpc 参数优先，其次取视图类上的声明"""
+            return (
+                bulkhead if bulkhead is not None else get_bulkhead(getattr(self, 'bulkhead', None)),
+                rate_limit if rate_limit is not None else getattr(self, 'rate_limit', None),
+            )
+
+        @wraps(func)
+        def wrapper(self, *f_args, **f_kwargs):
+            stats.request(request.content_length or 0)
+            with ExitStack() as guard:
+                try:
+                    guard.enter_context(admit(*admission(self)))
+                except RejectedError as e:
+                    stats.error(e.error_type)
+                    response = build_response(e.to_payload(), e.status, negotiate_serializer())
+                    response.headers['Retry-After'] = str(e.retry_after)
+                    return response
+                return respond(self, guard)
+
+        def respond(self, guard):
+            started = time.perf_counter()
+            try:
+                raw_data = _read_request_data(input_types)
+                # 验证并解析输入参数
+                validated_data = args_plan(raw_data) if args_plan else {}
+            except ValidationError as e:
+                stats.error(e.error_type)
+                return build_response(_validation_error_payload(e), e.error_code, negotiate_serializer())
+            finally:
+                stats.phase('validation', time.perf_counter() - started)
+
+            if stream:
+                # 流式响应在流结束时才释放隔离舱
+                return invoke_stream(self, validated_data, on_close=guard.pop_all().close)
+
+            serializer = negotiate_serializer()
+            produce = partial(execute, self, validated_data, serializer)
+            if coalesce:
+                produce = partial(execute_coalesced, validated_data, serializer, produce)
+            if cache:
+                body, status, hit = cache.fetch(endpoint, validated_data, produce, variant=serializer.mimetype)
+            else:
+                body, status, _ = produce()
+
+            if should_attach_sql_summary():
+                # debug 模式下附带本请求的 SQL 汇总（需开启 config.SQL_PROFILER）；
+                # 缓存与合并共享的响应体保持不变，只在本次发出的副本上附加
+                body = serializer.dumps(attach_sql_summary(serializer.loads(body)))
+
+            response = Response(body, status=status, mimetype=serializer.mimetype)
+            if cache:
+                response.headers['X-Cache'] = 'BYPASS' if hit is None else ('HIT' if hit else 'MISS')
+            stats.response(len(body))
+            return response
 
         setattr(wrapper, '_is_route', True)
+        setattr(wrapper, '_is_async', is_async)
+        setattr(wrapper, '_is_stream', stream)
+        setattr(wrapper, '_rpc_invoke', invoke)
+        setattr(wrapper, '_rpc_endpoint', endpoint)
 
         return wrapper
 
     return decorator
 
 
+def _read_request_data(input_types):
+    """根据 input_type 获取请求数据，声明了多种输入类型时按 Content-Type 选择；请求体格式错误时抛出 ValidationError"""
+    try:
+        return _load_request_data(input_types)
+    except RequestBodyError as e:
+        raise ValidationError(str(e), error_type=ValidationError.ERROR_INVALID_FORMAT)
+
+
+def _load_request_data(input_types):
+    if len(input_types) == 1:
+        if input_types[0] == InputType.JSON:
+            return load_request_json()
+        if input_types[0] == InputType.MSGPACK:
+            return load_request_msgpack()
+    else:
+        if InputType.JSON in input_types and request.is_json:
+            return load_request_json()
+        if InputType.MSGPACK in input_types and is_msgpack_request():
+            return load_request_msgpack()
+        # 都不匹配时回退到表单
+        if InputType.FORM not in input_types:
+            return {}
+
+    # 优先取 querystring，再合并 form，确保 GET 也能取到参数
+    raw_data = {}
+    raw_data.update(request.args.to_dict())
+    raw_data.update(request.form.to_dict())
+    return raw_data
+
+
+def _validation_error_payload(e):
+    return {
+        'result': 1,
+        'message': str(e),
+        'error': e.to_dict()
+    }
+
+
 class ValidationError(Exception):
     """
     参数验证错误
@@ -122,48 +307,17 @@ class ValidationError(Exception):
         return " ".join(parts)
 
 # 验证入参
-def validate_input(data, args_schema:dict):
-    """验证输入参数"""
+def validate_input(data, args_schema):
+    """验证输入参数，args_schema 可以是字段字典或 compile_schema 的编译结果"""
     if not args_schema:
         return {}
 
-    result = {}
-    for field_name, field in args_schema.items():
-        value = data.get(field_name)
+    return compile_schema(args_schema)(data)
 
-        # 处理必填字段
-        if getattr(field, '_is_required', False):
-            if value is None or value == '':
-                raise ValidationError(
-                    message=f'必填字段不能为空',
-                    field_name=field_name,
-                    error_type=ValidationError.ERROR_MISSING_REQUIRED,
-                    value=value
-                )
-
-        # 使用字段的验证规则
-        if value is not None and value != '':
-            try:
-                result[field_name] = field.validate(value)
-            except ValidationError:
-                # 如果是 ValidationError，直接抛出
-                raise
-            except Exception as e:
-                # 其他异常包装为 ValidationError
-                raise ValidationError(
-                    message=f'字段值验证失败: {str(e)}',
-                    field_name=field_name,
-                    error_type=ValidationError.ERROR_INVALID_VALUE,
-                    value=value
-                )
-        else:
-            # 使用默认值
-            result[field_name] = field.default
 
-    return result
 # 验证响应
-def validate_output(data, returns_schema: dict):
-    """验证输出数据"""
+def validate_output(data, returns_schema):
+    """验证输出数据，returns_schema 可以是字段字典或 compile_schema 的编译结果"""
     if not returns_schema:
         return data
 
@@ -175,37 +329,89 @@ def validate_output(data, returns_schema: dict):
     else:
         payload = getattr(data, '__dict__', {})
 
-    result = {}
-    for field_name, field in returns_schema.items():
-        value = payload.get(field_name)
+    return compile_schema(returns_schema, output=True)(payload)
 
-        if getattr(field, '_is_required', False):
-            if value is None or value == '':
-                raise ValidationError(
-                    message=f'响应中必填字段不能为空',
-                    field_name=field_name,
-                    error_type=ValidationError.ERROR_MISSING_REQUIRED,
-                    value=value
-                )
-
-        if value is not None and value != '':
-            try:
-                result[field_name] = field.validate(value)
-            except ValidationError:
-                # 如果是 ValidationError，直接抛出
-                raise
-            except Exception as e:
-                # 其他异常包装为 ValidationError
-                raise ValidationError(
-                    message=f'响应字段值验证失败: {str(e)}',
-                    field_name=field_name,
-                    error_type=ValidationError.ERROR_INVALID_VALUE,
-                    value=value
-                )
+
+def compile_schema(schema, output=False):
+    """
+    将字段定义字典编译为 SchemaPlan
+
+    Args:
+        schema: 字段定义字典，为空时返回 None
+        output: 是否用于响应校验（影响错误提示）
+    """
+    if not schema:
+        return None
+    if isinstance(schema, SchemaPlan):
+        return schema
+    return SchemaPlan(schema, output=output)
+
+
+class SchemaPlan(object):
+    """
+    预编译的字段校验计划
+
+    rpc 装饰时把 args/returns 展开成扁平的 (字段名, 是否必填, 转换函数, 默认值) 元组，
+    内置字段类型直接使用专用转换函数，每次请求只需线性遍历一次。
+    """
+
+    __slots__ = ('fields', 'required', 'defaults', '_missing_message', '_invalid_message')
+
+    def __init__(self, schema, output=False):
+        fields = []
+        for field_name, field in schema.items():
+            fields.append((
+                field_name,
+                bool(getattr(field, '_is_required', False)),
+                _get_coercer(field),
+                field.default,
+            ))
+        self.fields = tuple(fields)
+        self.required = frozenset(f[0] for f in fields if f[1])
+        self.defaults = {f[0]: f[3] for f in fields}
+        if output:
+            self._missing_message = '响应中必填字段不能为空'
+            self._invalid_message = '响应字段值验证失败: %s'
         else:
-            result[field_name] = field.default
+            self._missing_message = '必填字段不能为空'
+            self._invalid_message = '字段值验证失败: %s'
+
+    def __call__(self, data):
+        result = {}
+        get = data.get
+        for field_name, is_required, coerce, default in self.fields:
+            value = get(field_name)
+
+            if value is None or value == '':
+                # 处理必填字段
+                if is_required:
+                    raise ValidationError(
+                        message=self._missing_message,
+                        field_name=field_name,
+                        error_type=ValidationError.ERROR_MISSING_REQUIRED,
+                        value=value
+                    )
+                # 使用默认值
+                result[field_name] = default
+            elif coerce is None:
+                result[field_name] = value
+            else:
+                try:
+                    result[field_name] = coerce(value)
+                except ValidationError:
+                    # 如果是 ValidationError，直接抛出
+                    raise
+                except Exception as e:
+                    # 其他异常包装为 ValidationError
+                    raise ValidationError(
+                        message=self._invalid_message % e,
+                        field_name=field_name,
+                        error_type=ValidationError.ERROR_INVALID_VALUE,
+                        value=value
+                    )
+
+        return result
 
-    return result
 
 class Field:
     """字段基类"""
@@ -242,6 +448,45 @@ class StringField(Field):
         return value
 
 
+def _coerce_int(value):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            message='必须是整数类型',
+            error_type=ValidationError.ERROR_INVALID_TYPE,
+            value=value
+        )
+
+
+def _coerce_str(value):
+    if isinstance(value, str):
+        return value
+    raise ValidationError(
+        message='必须是字符串类型',
+        error_type=ValidationError.ERROR_INVALID_TYPE,
+        value=value
+    )
+
+
+# 内置字段的 validate 与专用转换函数的对应关系，None 表示原样返回
+_FAST_COERCERS = {
+    Field.validate: None,
+    IntegerField.validate: _coerce_int,
+    StringField.validate: _coerce_str,
+}
+
+
+def _get_coercer(field):
+    """取字段对应的转换函数；子类重写了 validate 时退回到字段自身的 validate"""
+    validate = type(field).validate
+    if validate in _FAST_COERCERS:
+        return _FAST_COERCERS[validate]
+    return field.validate
+
+
 class FieldWrapper:
     """
     字段包装器基类
@@ -316,6 +561,9 @@ class RequestObject(object):
     def update(self, data):
         self._data.update(data)
 
+    def get(self, name, default=None):
+        return self._data.get(name, default)
+
     def __getattr__(self, name):
         return self._data.get(name)
 
@@ -345,3 +593,11 @@ class ResponseObject(object):
             'data': data_obj
         }
 
+    def to_payload(self):
+        """响应体结构，data 原样交给序列化层编码（见 serializers.default_encoder）"""
+        return {
+            'result': self.result,
+            'message': self.message,
+            'data': self.data
+        }
+
@@ -0,0 +1,157 @@
+# coding: utf-8
+
+"""
+rpc 异步视图的事件循环运行器。
+
+Flask 自带的 async 支持会为每个请求新建一个事件循环，协程之间无法共享 IO 等待。
+这里改为每个 worker 进程维护一个常驻的后台事件循环线程：
+- async def 视图提交到该循环执行，请求线程只阻塞等待结果
+- 同一 worker 内所有 agent.ainvoke 等调用在同一个循环上并发，
+  配合 gunicorn gthread worker（少量进程、较多线程）即可同时挂起上百个 LLM 调用
+- 每个进行中的调用仍占用一个请求线程，单 worker 的并发上限为 gunicorn 的 threads
+  （conf/gunicorn.conf.py 默认 256，等待中的线程只占栈内存），估算方法见 README 异步视图一节
+- 调用方的 contextvars（flask 的 request / g）会随协程一起带入事件循环
+- 事件循环线程中不能执行 peewee 查询（会报错）：所有协程共用该线程的连接，阻塞查询会卡住整个循环。
+  协程中用 `await run_sync(func, ...)` 在线程池中执行同步的数据库访问（执行后归还连接），
+  或用 db_manager.aio() 的 aiomysql 连接池
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+from typing import Any, Callable, Coroutine, Optional
+
+from app.utils.db_utils import db_manager, mark_event_loop_thread
+from app.utils.fork_utils import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+# run_sync 线程池大小：同时在执行的阻塞调用数，也是这些调用最多占用的数据库连接数
+BLOCKING_WORKERS = 32
+
+
+class LoopRunner(object):
+    """
+    在后台线程中运行的共享事件循环。
+
+    事件循环在首次使用时创建；检测到进程 pid 变化（fork 后的子进程）时重新创建，
+    避免子进程沿用父进程中已经不存在的循环线程。
+    """
+
+    def __init__(self, name: str = 'rpc-aio') -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+
+    def reset_after_fork(self) -> None:
+        """子进程中没有父进程的循环线程，丢弃旧循环，下次使用时重新创建"""
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._pid != os.getpid():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid():
+                    self._start()
+        return self._loop  # type: ignore[return-value]
+
+    def _start(self) -> None:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=self._run, args=(loop,), name=self.name, daemon=True)
+        thread.start()
+        self._loop = loop
+        self._pid = os.getpid()
+        logger.debug('start event loop thread %s in pid %s', self.name, self._pid)
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        mark_event_loop_thread()
+        loop.run_forever()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """
+        把协程提交到事件循环，返回线程安全的 Future。
+        """
+        # 在调用方上下文的副本中提交，协程内可以继续使用 flask 的 request / g
+        ctx = contextvars.copy_context()
+        return ctx.run(asyncio.run_coroutine_threadsafe, coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        同步等待协程执行完成；超时后取消协程并抛出 TimeoutError。
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+
+# 每个 worker 进程一个共享实例
+runner = LoopRunner()
+register_after_fork(runner.reset_after_fork)
+
+_blocking_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_blocking_lock = threading.Lock()
+
+
+def _get_blocking_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _blocking_executor
+    if _blocking_executor is None:
+        with _blocking_lock:
+            if _blocking_executor is None:
+                _blocking_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=BLOCKING_WORKERS, thread_name_prefix='rpc-blocking')
+    return _blocking_executor
+
+
+@register_after_fork
+def _reset_blocking_executor() -> None:
+    global _blocking_executor, _blocking_lock
+    _blocking_executor = None
+    _blocking_lock = threading.Lock()
+
+
+def _call_and_release(func: Callable[..., Any], args: Any, kwargs: Any) -> Any:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # 线程池中的线程不属于任何请求，调用结束即归还本线程打开的连接
+        db_manager.close_connections()
+
+
+async def run_sync(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    在线程池中执行阻塞调用（peewee 查询等）并等待结果，不阻塞事件循环。
+
+    在调用方上下文的副本中执行，可以使用 flask 的 request / g；结束后归还该线程打开的数据库连接，
+    一次调用内的多条查询（包括事务）使用同一个连接
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_blocking_executor(), ctx.run, _call_and_release, func, args, kwargs)
+
+
+def run_coroutine(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """在共享事件循环上执行协程并返回结果"""
+    return runner.run(coro, timeout)
+
+
+__all__ = [
+    'LoopRunner',
+    'BLOCKING_WORKERS',
+    'runner',
+    'run_coroutine',
+    'run_sync',
+]
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+"""
+批量 rpc：一次 HTTP 请求在进程内执行多个 rpc 调用。
+
+请求（POST JSON，或 Content-Type: application/msgpack 的 MessagePack，响应格式按 Accept 协商）：
+
+    {
+        "items": [
+            {"path": "/basic/add_account", "params": {...}},
+            {"path": "/tiger/basic/list", "method": "GET", "params": {...}}
+        ],
+        "parallel": false
+    }
+
+也可以直接提交 items 数组。path 可以带或不带蓝图前缀；method 默认 POST，需为该路由允许的方法。
+每个子调用与单独请求走同一套 rpc 校验逻辑，响应 data 为按顺序排列的 {result, message, data} 列表。
+
+- 默认串行执行：所有子调用共用当前请求上下文、g 与同一个数据库连接
+- parallel=true 时用线程池并发执行：每个子调用在独立的应用上下文（独立的 g）中执行，
+  结束后归还该线程打开的数据库连接，读己之写标记与 SQL 汇总并回批量请求
+"""
+
+from __future__ import annotations
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+from flask import current_app, g, request
+
+from app.utils.db_utils import db_manager
+from app.utils.sql_profiler import attach_summary as attach_sql_summary
+
+from .serializers import RequestBodyError, build_response, load_request_body, negotiate_serializer
+
+
+BATCH_PATH = '/_batch'
+# 单次批量请求允许的最大子调用数
+MAX_BATCH_ITEMS = 50
+# 并发模式下的最大线程数
+MAX_PARALLEL = 8
+
+# path -> (view_func, methods)
+_routes: Dict[str, Tuple[Any, Sequence[str]]] = {}
+
+
+def register_route(path: str, view_func: Any, methods: Sequence[str]) -> None:
+    """登记可被批量接口调用的 rpc 路由（由 LoginRequiredDispatchView.register 调用）"""
+    _routes[path] = (view_func, tuple(methods))
+
+
+def _resolve(path: str) -> Tuple[Any, Sequence[str]]:
+    # 去掉蓝图前缀，如 /tiger/basic/add_account -> /basic/add_account
+    prefix = request.path[:-len(BATCH_PATH)]
+    if prefix and path.startswith(prefix + '/'):
+        path = path[len(prefix):]
+    return _routes.get(path, (None, ()))
+
+
+def _dispatch(item: Any) -> Dict[str, Any]:
+    if not isinstance(item, dict) or not item.get('path'):
+        return {'result': 1, 'message': 'Invalid batch item, "path" is required'}
+
+    path = item['path']
+    view_func, methods = _resolve(path)
+    invoke = getattr(view_func, '_rpc_invoke', None)
+    if invoke is None:
+        return {'result': 1, 'message': f'Unknown rpc path {path}'}
+    method = str(item.get('method') or 'POST').upper()
+    if method not in methods:
+        return {'result': 1, 'message': f'Method {method} is not allowed for rpc {path}'}
+    if getattr(view_func, '_is_stream', False):
+        return {'result': 1, 'message': f'Stream rpc {path} is not supported in batch'}
+
+    params = item.get('params') or {}
+    if not isinstance(params, dict):
+        return {'result': 1, 'message': 'Invalid batch item, "params" must be an object'}
+
+    payload, _ = invoke(view_func.__self__, params)
+    return payload
+
+
+def _dispatch_in_thread(app: Any, item: Any) -> Tuple[Dict[str, Any], Any, Any]:
+    """
+    在独立的应用上下文中执行子调用：request 仍是批量请求，g 为子调用独享，
+    避免并发的子调用无锁地读写同一个 g。返回 (响应体, 读己之写标记, SQL 汇总)
+    """
+    ctx = app.app_context()
+    ctx.push()
+    try:
+        payload = _dispatch(item)
+        return payload, g.get('_db_write_pins'), g.get('_sql_profile')
+    finally:
+        # 线程内打开的数据库连接是线程独享的，需要在线程内归还连接池；
+        # 不能调用 do_teardown_request，那会对尚未结束的请求执行全部 teardown 钩子与信号
+        db_manager.close_connections()
+        ctx.pop()
+
+
+def _merge_into_request(pins: Any, profile: Any) -> None:
+    """子调用的读己之写标记与 SQL 汇总并回批量请求的 g（在请求线程中调用）"""
+    if pins:
+        merged = g.get('_db_write_pins')
+        if merged is None:
+            merged = g._db_write_pins = set()
+        merged.update(pins)
+    if profile is not None:
+        current = g.get('_sql_profile')
+        if current is None:
+            g._sql_profile = profile
+        else:
+            current.merge(profile)
+
+
+def _run_parallel(items: List[Any]) -> List[Dict[str, Any]]:
+    app = current_app._get_current_object()
+    with ThreadPoolExecutor(max_workers=min(len(items), MAX_PARALLEL)) as executor:
+        # 每个子调用在当前上下文副本中执行，可以继续访问 request
+        futures = [
+            executor.submit(contextvars.copy_context().run, _dispatch_in_thread, app, item)
+            for item in items
+        ]
+        results = []
+        for future in futures:
+            payload, pins, profile = future.result()
+            _merge_into_request(pins, profile)
+            results.append(payload)
+        return results
+
+
+def rpc_batch():
+    """批量 rpc 视图函数"""
+    serializer = negotiate_serializer()
+    try:
+        body = load_request_body()
+    except RequestBodyError as e:
+        return build_response({'result': 1, 'message': str(e)}, 400, serializer)
+    parallel = False
+    if isinstance(body, dict):
+        items = body.get('items')
+        parallel = bool(body.get('parallel'))
+    else:
+        items = body
+
+    if not isinstance(items, list) or not items:
+        return build_response({'result': 1, 'message': '"items" must be a non-empty array'}, 400, serializer)
+    if len(items) > MAX_BATCH_ITEMS:
+        return build_response({
+            'result': 1,
+            'message': f'Too many batch items, max {MAX_BATCH_ITEMS}'
+        }, 400, serializer)
+
+    if parallel and len(items) > 1:
+        results = _run_parallel(items)
+    else:
+        results = [_dispatch(item) for item in items]
+
+    # debug 模式下附带整个批量请求的 SQL 汇总（各子调用的响应不再单独附带）
+    payload = attach_sql_summary({'result': 0, 'message': 'ok', 'data': results})
+    return build_response(payload, serializer=serializer)
+
+
+__all__ = [
+    'BATCH_PATH',
+    'MAX_BATCH_ITEMS',
+    'register_route',
+    'rpc_batch',
+]
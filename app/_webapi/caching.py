@@ -0,0 +1,336 @@
+# coding: utf-8
+
+"""
+rpc 响应缓存。
+
+用法：
+
+    @rpc('项目列表', args=..., cache=CachePolicy(ttl=30, vary=['group_id', 'page']))
+    def list(self, req, rsp):
+        ...
+
+- key 由接口、校验后的参数（vary 指定的字段，默认全部）、当前用户与响应 mimetype 计算；
+  per_user=True（默认）时请求用户未知（见 keys.set_identity_provider）则不读写缓存，
+  避免把一个用户的响应返回给其他用户，响应头 X-Cache 为 BYPASS
+- 缓存的是序列化后的响应体，只缓存 result == 0 的成功响应
+- 后端：进程内 LRU（默认，带容量上限）或 Redis（使用 config.REDIS / SESSION['redis']），
+  测试时可用 LocalRedis 代替真实 Redis
+- 防击穿：同一 key 同时只有一个请求回源，其余请求等待其结果
+- Redis 不可用（redis.RedisError）时记录警告并直接回源，不影响接口本身
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from app.utils.cache_utils import KeyedLocks, LRUCache
+
+from .keys import current_user_id, has_identity_provider, make_request_key
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis 为可选依赖
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# 未安装 redis 时不会有 Redis 客户端抛出的异常
+RedisError: Any = redis.RedisError if redis is not None else ()
+
+# 只删除自己持有的锁：锁已过期并被其他请求重新获取时，值（token）不同，不删除
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# compute 回调的返回值：(响应体, HTTP 状态码, 是否可缓存)
+ComputeResult = Tuple[bytes, int, bool]
+
+
+class CacheBackend(object):
+    """缓存后端基类"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get_or_fill(
+        self, key: str, ttl: float, compute: Callable[[], ComputeResult]
+    ) -> Tuple[bytes, int, bool]:
+        """
+        读缓存，未命中时回源并写入缓存。
+
+        Returns:
+            (响应体, HTTP 状态码, 是否命中缓存)
+        """
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """进程内 LRU 缓存后端，同一 key 的并发回源由 KeyedLocks 串行化"""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.cache = LRUCache(maxsize=maxsize)
+        self._locks = KeyedLocks()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.cache.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+    def get_or_fill(self, key, ttl, compute):
+        value = self.cache.get(key)
+        if value is not None:
+            return value, 200, True
+
+        with self._locks.hold(key):
+            # 等锁期间可能已经有其他请求写入
+            value = self.cache.get(key)
+            if value is not None:
+                return value, 200, True
+            body, status, cacheable = compute()
+            if cacheable:
+                self.cache.set(key, body, ttl=ttl)
+            return body, status, False
+
+
+class LocalRedis(object):
+    """
+    进程内的 Redis 替身，只实现缓存后端用到的 get / set / delete 与释放锁的 eval，供测试和本地开发使用。
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            value, expire_at = entry
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name: str, value: bytes, ex: Optional[float] = None, nx: bool = False) -> bool:
+        with self._lock:
+            if nx:
+                entry = self._data.get(name)
+                if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                    return False
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> int:
+        if script != RELEASE_LOCK_SCRIPT or numkeys != 1:
+            raise NotImplementedError('LocalRedis only supports RELEASE_LOCK_SCRIPT')
+        name, token = keys_and_args
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None or entry[0] != token:
+                return 0
+            del self._data[name]
+            return 1
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis 缓存后端，多个 worker / 多台机器共享。
+
+    防击穿使用 SET NX 分布式锁：拿到锁的请求回源，其余请求轮询等待结果，
+    等待超过 lock_timeout 后自行回源。锁的值为随机 token，释放时比较后再删除（RELEASE_LOCK_SCRIPT），
+    回源超过 lock_timeout 时不会删掉其他请求重新获取的锁。
+
+    Redis 出错时读当作未命中、写与加锁跳过，请求照常回源。
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        prefix: str = 'cache:',
+        lock_timeout: float = 5.0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self._client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    @staticmethod
+    def _create_client() -> Any:
+        import config
+
+        if redis is None:
+            raise RuntimeError('redis 未安装，无法使用 RedisCacheBackend')
+        redis_cfg = getattr(config, 'REDIS', None) or (getattr(config, 'SESSION', None) or {}).get('redis')
+        if not redis_cfg:
+            raise RuntimeError('未配置 REDIS，无法使用 RedisCacheBackend')
+        return redis.Redis(**redis_cfg)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self.prefix + key)
+        except RedisError as exc:
+            logger.warning('redis cache get failed, key=%s: %s', key, exc)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except RedisError as exc:
+            logger.warning('redis cache set failed, key=%s: %s', key, exc)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(self.prefix + key)
+        except RedisError as exc:
+            logger.warning('redis cache delete failed, key=%s: %s', key, exc)
+
+    def _release_lock(self, lock_key: str, token: bytes) -> None:
+        try:
+            self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except RedisError as exc:
+            # 释放失败时锁在 lock_timeout 后自动过期
+            logger.warning('redis cache unlock failed, key=%s: %s', lock_key, exc)
+
+    def _fill(self, key, ttl, compute):
+        body, status, cacheable = compute()
+        if cacheable:
+            self.set(key, body, ttl)
+        return body, status, False
+
+    def get_or_fill(self, key, ttl, compute):
+        value = self.get(key)
+        if value is not None:
+            return value, 200, True
+
+        lock_key = self.prefix + key + ':lock'
+        token = uuid.uuid4().hex.encode('ascii')
+        try:
+            locked = self.client.set(lock_key, token, ex=max(1, int(self.lock_timeout)), nx=True)
+        except RedisError as exc:
+            logger.warning('redis cache lock failed, key=%s: %s', lock_key, exc)
+            return self._fill(key, ttl, compute)
+        if locked:
+            try:
+                return self._fill(key, ttl, compute)
+            finally:
+                self._release_lock(lock_key, token)
+
+        # 其他请求正在回源，等待其写入缓存
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.get(key)
+            if value is not None:
+                return value, 200, True
+
+        logger.warning('wait for cache fill timeout, key=%s', key)
+        return self._fill(key, ttl, compute)
+
+
+_default_redis_backend: Optional[RedisCacheBackend] = None
+
+
+def get_redis_backend() -> RedisCacheBackend:
+    """全局共享的 Redis 缓存后端，首次使用时按配置创建连接"""
+    global _default_redis_backend
+    if _default_redis_backend is None:
+        _default_redis_backend = RedisCacheBackend()
+    return _default_redis_backend
+
+
+class CachePolicy(object):
+    """
+    rpc 响应缓存策略。
+
+    Args:
+        ttl: 缓存有效期（秒）
+        vary: 参与缓存 key 计算的参数名，None 表示全部校验后的参数
+        per_user: 是否按用户区分缓存；用户未知（未登录）的请求不走缓存。与用户无关的接口设为 False；
+            per_user=True 时要求已注册 identity provider（keys.set_identity_provider），否则装饰时报错
+        maxsize: 默认 LRU 后端的容量上限
+        backend: 'lru'、'redis' 或 CacheBackend 实例
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        vary: Optional[Iterable[str]] = None,
+        per_user: bool = True,
+        maxsize: int = 1024,
+        backend: Union[str, CacheBackend] = 'lru',
+    ) -> None:
+        self.ttl = ttl
+        self.vary = tuple(vary) if vary is not None else None
+        self.per_user = per_user
+        if per_user and not has_identity_provider():
+            # 没有用户标识时 per_user 缓存永远不会命中，在装饰时报错，而不是上线后静默失效
+            raise ValueError('CachePolicy(per_user=True) requires an identity provider, '
+                             'call keys.set_identity_provider() before the view is imported, '
+                             'or use per_user=False for user-independent endpoints')
+        if backend == 'lru':
+            self.backend: Any = LRUCacheBackend(maxsize=maxsize)
+        elif backend == 'redis':
+            # 延迟到首次请求再取全局后端，避免导入期连接 Redis
+            self.backend = None
+        elif isinstance(backend, CacheBackend):
+            self.backend = backend
+        else:
+            raise ValueError('Unknown cache backend %r' % (backend,))
+
+    def get_backend(self) -> CacheBackend:
+        return self.backend if self.backend is not None else get_redis_backend()
+
+    def make_key(self, endpoint: str, data: Dict[str, Any], variant: str = '') -> str:
+        return make_request_key(
+            endpoint, data, vary=self.vary, per_user=self.per_user, prefix='rpc-cache', variant=variant)
+
+    def fetch(self, endpoint: str, data: Dict[str, Any], compute: Callable[[], ComputeResult], variant: str = ''):
+        """
+        按策略读取缓存，未命中时调用 compute 回源；variant 区分同一请求的不同响应格式。
+
+        返回 (响应体, 状态码, 是否命中)，不走缓存时“是否命中”为 None
+        """
+        if self.per_user and current_user_id() is None:
+            body, status, _ = compute()
+            return body, status, None
+        return self.get_backend().get_or_fill(self.make_key(endpoint, data, variant), self.ttl, compute)
+
+
+__all__ = [
+    'CacheBackend',
+    'CachePolicy',
+    'LRUCacheBackend',
+    'LocalRedis',
+    'RELEASE_LOCK_SCRIPT',
+    'RedisCacheBackend',
+    'get_redis_backend',
+]
@@ -0,0 +1,76 @@
+# coding: utf-8
+
+"""
+rpc 请求合并（single-flight）。
+
+同一 worker 内，(接口, 校验后的参数, 用户) 相同的并发请求只执行一次，
+其余请求等待并共享这次执行的结果，常见于看板刷新时的大量相同查询。
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(object):
+    """
+    按 key 合并并发调用。
+
+    用法：
+
+        flights = SingleFlight()
+        result, shared = flights.do(key, fn)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn 或等待进行中的同 key 调用。
+
+        Returns:
+            (结果, 是否共享了其他请求的执行结果)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            # 先移除再唤醒，之后到达的请求会重新执行，而不是拿到旧结果
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+__all__ = [
+    'SingleFlight',
+]
@@ -0,0 +1,43 @@
+# coding: utf-8
+
+"""
+健康检查端点。
+
+- GET /_health/db：并发 ping 所有已配置的数据库，每个库最多等待 DB_PING_TIMEOUT 秒，
+  全部正常返回 200，否则返回 503，data 中为各库的结果与耗时；
+  已创建的异步连接池（db_manager.aio）在共享事件循环上一并检查，结果的 key 为 <库名>.aio
+"""
+
+from __future__ import annotations
+
+from flask import Response
+
+from app.utils.db_utils import db_manager
+
+from .aio import run_coroutine
+from .serializers import build_response
+
+# 单个数据库 ping 的最长等待时间（秒）
+DB_PING_TIMEOUT = 2.0
+
+
+def db_health() -> Response:
+    """/_health/db 视图函数"""
+    results = db_manager.ping_all(timeout=DB_PING_TIMEOUT)
+    if db_manager.has_aio():
+        aio_results = run_coroutine(db_manager.aio_ping_all(timeout=DB_PING_TIMEOUT))
+        results.update(('%s.aio' % name, result) for name, result in aio_results.items())
+    failed = sorted(name for name, result in results.items() if not result['ok'])
+    if failed:
+        return build_response({
+            'result': 1,
+            'message': 'database unavailable: %s' % ', '.join(failed),
+            'data': results,
+        }, 503)
+    return build_response({'result': 0, 'message': 'ok', 'data': results})
+
+
+__all__ = [
+    'DB_PING_TIMEOUT',
+    'db_health',
+]
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+"""
+rpc 请求的身份与去重 key。
+
+响应缓存、请求合并、按用户限流都需要用 (接口, 校验后的参数, 用户) 标识一次请求，
+统一在这里计算，保证各处对“相同请求”的判断一致。
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .serializers import default_encoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 已在 requirements.txt 中固定版本
+    orjson = None
+    import json
+
+
+# 当前请求用户的取值函数，由登录校验接入时通过 set_identity_provider 注册
+_identity_provider: Optional[Callable[[], Any]] = None
+
+
+def set_identity_provider(provider: Optional[Callable[[], Any]]) -> None:
+    """
+    注册取当前请求用户 id 的函数（在请求上下文中调用，未登录时返回 None），传 None 取消注册。
+
+    本项目目前没有登录校验，未注册时 current_user_id() 总是 None：
+    per_user 的响应缓存与请求合并直接跳过，按用户限流退回按客户端地址计数
+    """
+    global _identity_provider
+    _identity_provider = provider
+
+
+def has_identity_provider() -> bool:
+    return _identity_provider is not None
+
+
+def current_user_id() -> Any:
+    """当前请求的用户 id；未注册 identity provider 或未登录时为 None"""
+    if _identity_provider is None:
+        return None
+    return _identity_provider()
+
+
+def _canonical(data: Dict[str, Any]) -> bytes:
+    # key 排序，保证参数顺序不同的相同请求得到同一个 key
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=default_encoder,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=str, sort_keys=True).encode('utf-8')
+
+
+def make_request_key(
+    endpoint: str,
+    data: Dict[str, Any],
+    vary: Optional[Iterable[str]] = None,
+    per_user: bool = True,
+    prefix: str = 'rpc',
+    variant: str = '',
+) -> str:
+    """
+    计算请求 key：prefix:endpoint:variant:user:digest
+
+    Args:
+        endpoint: 接口标识
+        data: 校验后的参数
+        vary: 参与计算的参数名，None 表示全部参数
+        per_user: 是否区分用户（用户未知时调用方应跳过缓存 / 合并，而不是共用一个 key）
+        prefix: key 前缀
+        variant: 同一请求的不同表示，如响应 mimetype（缓存的是序列化后的响应体）
+    """
+    if vary is not None:
+        data = {name: data.get(name) for name in vary}
+    digest = hashlib.blake2b(_canonical(data), digest_size=16).hexdigest()
+    user = current_user_id() if per_user else None
+    return '%s:%s:%s:%s:%s' % (prefix, endpoint, variant, '' if user is None else user, digest)
+
+
+__all__ = [
+    'current_user_id',
+    'has_identity_provider',
+    'make_request_key',
+    'set_identity_provider',
+]
@@ -0,0 +1,284 @@
+# coding: utf-8
+
+"""
+rpc 准入控制：按接口（或标签）的并发隔离舱与按用户的令牌桶限流。
+
+慢接口（LLM / agent）与快接口（CRUD）共用同一批 worker 线程，
+用隔离舱限制慢接口的并发与排队深度，超限请求立即失败（503 + Retry-After），
+避免慢请求占满线程拖垮其他接口。
+
+用法：
+
+    # config.BULKHEADS = dict(llm=dict(max_concurrent=8, max_queue=16, queue_timeout=1))
+
+    class Agent(LoginRequiredDispatchView):
+        bulkhead = 'llm'                                # 整个视图类共用一个隔离舱
+
+        @rpc('对话', rate_limit=RateLimit(rate=1, burst=5))
+        def chat(self, req, rsp):
+            ...
+
+    @rpc('导出', bulkhead=Bulkhead('export', max_concurrent=2))
+    def export(self, req, rsp):
+        ...
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from flask import has_request_context, request
+
+from app.utils.cache_utils import LRUCache
+from app.utils.metric_utils import metrics
+
+from .keys import current_user_id
+
+ERROR_OVERLOADED = 'OVERLOADED'
+ERROR_RATE_LIMITED = 'RATE_LIMITED'
+
+
+class RejectedError(Exception):
+    """请求被准入控制拒绝"""
+
+    def __init__(self, message: str, status: int = 503, retry_after: float = 1,
+                 error_type: str = ERROR_OVERLOADED) -> None:
+        super(RejectedError, self).__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.error_type = error_type
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            'result': 1,
+            'message': self.message,
+            'error': {'error': self.error_type, 'message': self.message},
+        }
+
+
+class Bulkhead(object):
+    """
+    并发隔离舱。
+
+    Args:
+        name: 名称（标签），同名接口共享并发额度
+        max_concurrent: 最大并发执行数
+        max_queue: 并发已满时允许排队等待的请求数，超过立即拒绝
+        queue_timeout: 排队最长等待时间（秒），超时拒绝
+        retry_after: 拒绝时建议客户端的重试间隔（秒）
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0,
+                 queue_timeout: float = 0, retry_after: float = 1) -> None:
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._sem = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+
+    def _reject(self, reason: str) -> RejectedError:
+        return RejectedError(
+            'Service busy (%s: %s), please retry later' % (self.name, reason),
+            status=503, retry_after=self.retry_after)
+
+    def acquire(self) -> None:
+        if not self._sem.acquire(blocking=False):
+            with self._lock:
+                if self.queued >= self.max_queue:
+                    raise self._reject('queue full')
+                self.queued += 1
+            try:
+                acquired = self.queue_timeout > 0 and self._sem.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+            if not acquired:
+                raise self._reject('queue timeout')
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._sem.release()
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class TokenBucket(object):
+    """令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at', '_lock')
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, tokens: float = 1) -> float:
+        """取令牌，成功返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+
+class RateLimit(object):
+    """
+    按用户的令牌桶限流（进程内，每个 worker 独立计数）。
+
+    用户取 keys.current_user_id()，未接入用户标识或未登录时按客户端地址（request.remote_addr）计数；
+    部署在反向代理之后时需要让 remote_addr 反映真实客户端（如 werkzeug 的 ProxyFix），否则所有请求共用代理地址的桶。
+
+    Args:
+        rate: 每秒允许的请求数
+        burst: 突发容量，默认等于 rate
+        per_user: False 时所有用户共用一个桶
+        maxsize: 最多保留的用户桶数量，超出按 LRU 淘汰
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 per_user: bool = True, maxsize: int = 10000) -> None:
+        self.rate = rate
+        self.burst = burst or rate
+        self.per_user = per_user
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: Any) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = TokenBucket(self.rate, self.burst)
+                    self._buckets.set(key, bucket)
+        return bucket
+
+    def _key(self) -> Any:
+        if not self.per_user:
+            return None
+        user = current_user_id()
+        if user is not None:
+            return 'user:%s' % user
+        if has_request_context() and request.remote_addr:
+            return 'ip:%s' % request.remote_addr
+        return None
+
+    def check(self) -> None:
+        key = self._key()
+        wait = self._bucket(key).take()
+        if wait:
+            raise RejectedError(
+                'Too many requests, please retry later',
+                status=429, retry_after=wait, error_type=ERROR_RATE_LIMITED)
+
+
+# -----------------------------
+# 具名隔离舱
+# -----------------------------
+
+_bulkheads: Dict[str, Bulkhead] = {}
+_bulkheads_lock = threading.Lock()
+
+
+def get_bulkhead(spec: Union[str, Bulkhead, None]) -> Optional[Bulkhead]:
+    """
+    取隔离舱：传入实例直接返回，传入名称时按 config.BULKHEADS 创建并缓存
+    """
+    if spec is None or isinstance(spec, Bulkhead):
+        return spec
+    bulkhead = _bulkheads.get(spec)
+    if bulkhead is None:
+        import config
+
+        with _bulkheads_lock:
+            bulkhead = _bulkheads.get(spec)
+            if bulkhead is None:
+                bulkhead_cfgs = getattr(config, 'BULKHEADS', None) or {}
+                if spec not in bulkhead_cfgs:
+                    raise KeyError('Unknown bulkhead "%s"' % spec)
+                bulkhead = _bulkheads[spec] = Bulkhead(spec, **bulkhead_cfgs[spec])
+    return bulkhead
+
+
+def register_bulkhead(bulkhead: Bulkhead) -> Bulkhead:
+    """登记隔离舱，使其出现在 /_metrics 中（rpc 装饰时自动调用）"""
+    with _bulkheads_lock:
+        return _bulkheads.setdefault(bulkhead.name, bulkhead)
+
+
+def resolve_admission(bulkhead: Union[str, Bulkhead, None] = None,
+                      rate_limit: Optional[RateLimit] = None) -> Tuple[Optional[Bulkhead], Optional[RateLimit]]:
+    """
+    解析并校验准入控制参数，返回 (隔离舱, 限流)。
+
+    在 rpc 装饰与视图类定义时调用：config.BULKHEADS 中没有的名称抛出 ValueError，
+    rate_limit 不是 RateLimit 时抛出 TypeError，在导入期暴露配置错误，而不是请求时返回 500
+    """
+    if isinstance(bulkhead, Bulkhead):
+        bulkhead = register_bulkhead(bulkhead)
+    elif bulkhead is not None:
+        try:
+            bulkhead = get_bulkhead(bulkhead)
+        except KeyError:
+            raise ValueError('Unknown bulkhead %r, configure it in config.BULKHEADS' % (bulkhead,)) from None
+    if rate_limit is not None and not isinstance(rate_limit, RateLimit):
+        raise TypeError('rate_limit must be a RateLimit, got %r' % (rate_limit,))
+    return bulkhead, rate_limit
+
+
+@contextmanager
+def admit(bulkhead: Optional[Bulkhead] = None, rate_limit: Optional[RateLimit] = None) -> Iterator[None]:
+    """依次检查限流与隔离舱，任一不通过抛出 RejectedError"""
+    if rate_limit is not None:
+        rate_limit.check()
+    if bulkhead is None:
+        yield
+        return
+    with bulkhead.hold():
+        yield
+
+
+def _collect_bulkheads():
+    bulkheads = list(_bulkheads.values())
+    yield ('rpc_bulkhead_in_flight', 'gauge', '隔离舱当前并发数',
+           [({'bulkhead': b.name}, b.in_flight) for b in bulkheads])
+    yield ('rpc_bulkhead_queued', 'gauge', '隔离舱当前排队数',
+           [({'bulkhead': b.name}, b.queued) for b in bulkheads])
+
+
+metrics.register_collector(_collect_bulkheads)
+
+
+__all__ = [
+    'Bulkhead',
+    'RateLimit',
+    'RejectedError',
+    'TokenBucket',
+    'admit',
+    'get_bulkhead',
+    'register_bulkhead',
+    'resolve_admission',
+]
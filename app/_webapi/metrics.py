@@ -0,0 +1,101 @@
+# coding: utf-8
+
+"""
+rpc 接口指标，以及 /_metrics 暴露端点。
+
+每个 rpc 接口记录：
+- rpc_requests_total{endpoint}：请求数
+- rpc_errors_total{endpoint, error_type}：按错误类型（ValidationError.error_type 等）统计的失败数
+- rpc_phase_seconds{endpoint, phase}：校验 / 业务处理 / 序列化三个阶段的耗时直方图
+- rpc_request_bytes{endpoint} / rpc_response_bytes{endpoint}：请求与响应体大小
+- rpc_coalesce_total{endpoint, outcome}：开启请求合并的接口，hit 为共享了其他请求的结果，miss 为实际执行
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from flask import Response
+
+from app.utils.metric_utils import BYTES_BUCKETS, format_labels, metrics
+
+# 非 ValidationError 的错误类型
+ERROR_TIMEOUT = 'TIMEOUT'
+ERROR_INTERNAL = 'INTERNAL_ERROR'
+ERROR_BUSINESS = 'BUSINESS_ERROR'
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+requests_total = metrics.counter('rpc_requests_total', 'rpc 请求数')
+errors_total = metrics.counter('rpc_errors_total', 'rpc 失败数（按错误类型）')
+phase_seconds = metrics.histogram('rpc_phase_seconds', 'rpc 各阶段耗时（秒）')
+request_bytes = metrics.histogram('rpc_request_bytes', 'rpc 请求体大小（字节）', buckets=BYTES_BUCKETS)
+response_bytes = metrics.histogram('rpc_response_bytes', 'rpc 响应体大小（字节）', buckets=BYTES_BUCKETS)
+coalesce_total = metrics.counter('rpc_coalesce_total', 'rpc 请求合并命中/未命中次数')
+
+
+def error_type_of(payload: Dict[str, Any], status: int) -> Any:
+    """从响应体推断错误类型，成功时返回 None"""
+    if payload.get('result') == 0:
+        return None
+    error = payload.get('error')
+    if error:
+        return error.get('error')
+    if status == 504:
+        return ERROR_TIMEOUT
+    if payload.get('result') == -1:
+        return ERROR_INTERNAL
+    return ERROR_BUSINESS
+
+
+class EndpointMetrics(object):
+    """
+    单个 rpc 接口的指标记录器，标签串在装饰时预先计算，请求期间只做自增。
+    """
+
+    PHASES = ('validation', 'handler', 'serialization')
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.labels = format_labels(endpoint=endpoint)
+        self._phase_labels = {
+            phase: format_labels(endpoint=endpoint, phase=phase) for phase in self.PHASES
+        }
+        self._error_labels: Dict[Any, str] = {}
+        self._coalesce_labels = {
+            True: format_labels(endpoint=endpoint, outcome='hit'),
+            False: format_labels(endpoint=endpoint, outcome='miss'),
+        }
+
+    def request(self, size: int) -> None:
+        requests_total.inc(self.labels)
+        request_bytes.observe(size, self.labels)
+
+    def phase(self, phase: str, seconds: float) -> None:
+        phase_seconds.observe(seconds, self._phase_labels[phase])
+
+    def response(self, size: int) -> None:
+        response_bytes.observe(size, self.labels)
+        metrics.maybe_flush()
+
+    def coalesced(self, shared: bool) -> None:
+        coalesce_total.inc(self._coalesce_labels[shared])
+
+    def error(self, error_type: Any) -> None:
+        labels = self._error_labels.get(error_type)
+        if labels is None:
+            labels = self._error_labels[error_type] = format_labels(
+                endpoint=self.endpoint, error_type=error_type)
+        errors_total.inc(labels)
+
+
+def rpc_metrics() -> Response:
+    """/_metrics 视图函数，Prometheus 文本格式，合并所有 worker"""
+    return Response(metrics.expose(), content_type=PROMETHEUS_MIMETYPE)
+
+
+__all__ = [
+    'EndpointMetrics',
+    'error_type_of',
+    'rpc_metrics',
+]
@@ -0,0 +1,238 @@
+# coding: utf-8
+
+"""
+rpc 请求/响应的序列化层。
+
+设计目标：
+- 默认使用 orjson 解析请求体、编码响应体，未安装时退回标准库 json
+- 原生处理 datetime、Decimal、peewee 模型行与 ResponseData 对象，
+  响应不再经过 ResponseObject.to_dict 的 __dict__ 转换
+- 日期时间与 Flask jsonify 一致，编码为 RFC 822 格式（werkzeug.http.http_date），如 "Wed, 01 Jan 2025 08:00:00 GMT"
+- 请求体不是合法的 JSON / MessagePack 时抛出 RequestBodyError（rpc 返回 400），不再当作空请求
+- 按 mimetype 注册序列化器，可插拔替换
+- 支持 MessagePack（application/msgpack，兼容 application/x-msgpack），
+  请求按 Content-Type 解析，响应按 Accept 头协商，默认仍为 JSON
+"""
+
+from __future__ import annotations
+
+import datetime
+import decimal
+import json
+from typing import Any, Dict, Optional
+
+import peewee
+from flask import Response, request
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 已在 requirements.txt 中固定版本
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:  # pragma: no cover - ormsgpack 已在 requirements.txt 中固定版本
+    ormsgpack = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack 已在 requirements.txt 中固定版本
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# 旧客户端常用的非标准 mimetype，按同一序列化器处理
+MSGPACK_MIMETYPE_ALIASES = ('application/x-msgpack',)
+
+
+class RequestBodyError(ValueError):
+    """请求体无法按 Content-Type 解析"""
+
+
+def default_encoder(obj: Any) -> Any:
+    """
+    处理序列化库无法原生编码的对象。
+
+    - datetime / date：RFC 822 格式（与 Flask jsonify 一致）；time 无日期，输出 ISO 8601
+    - peewee 模型行：取 __data__（字段名 -> 值）
+    - peewee 查询：展开为列表，元素再交给本函数处理
+    - Decimal：转为字符串，避免精度丢失（与 Flask 默认行为一致）
+    - 其他带 __dict__ 的对象（如 rsp.new() 创建的 ResponseData）：取 __dict__
+    """
+    if isinstance(obj, datetime.date):
+        return http_date(obj)
+    if isinstance(obj, datetime.time):
+        return obj.isoformat()
+    if isinstance(obj, peewee.Model):
+        return obj.__data__
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, peewee.BaseQuery):
+        return list(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    data = getattr(obj, '__dict__', None)
+    if data is not None:
+        return data
+    raise TypeError('Object of type %s is not serializable' % type(obj).__name__)
+
+
+class Serializer(object):
+    """序列化器基类，子类实现 loads/dumps"""
+
+    mimetype = JSON_MIMETYPE
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+
+class OrjsonSerializer(Serializer):
+    """基于 orjson 的 JSON 序列化器"""
+
+    def __init__(self) -> None:
+        # 与标准库 json 一样允许非字符串 key；时间类型交给 default_encoder，保持 jsonify 的格式
+        self.option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=default_encoder, option=self.option)
+
+
+class StdJsonSerializer(Serializer):
+    """标准库 json 实现，仅在 orjson 不可用时兜底"""
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(
+            obj, default=default_encoder, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+
+class OrmsgpackSerializer(Serializer):
+    """基于 ormsgpack 的 MessagePack 序列化器，时间类型编码与 JSON 一致"""
+
+    mimetype = MSGPACK_MIMETYPE
+
+    def __init__(self) -> None:
+        self.option = ormsgpack.OPT_NON_STR_KEYS | ormsgpack.OPT_PASSTHROUGH_DATETIME
+
+    def loads(self, data: bytes) -> Any:
+        return ormsgpack.unpackb(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return ormsgpack.packb(obj, default=default_encoder, option=self.option)
+
+
+class MsgpackSerializer(Serializer):
+    """msgpack 实现，仅在 ormsgpack 不可用时兜底"""
+
+    mimetype = MSGPACK_MIMETYPE
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=default_encoder, use_bin_type=True)
+
+
+_serializers: Dict[str, Serializer] = {}
+
+
+def register_serializer(serializer: Serializer, mimetype: Optional[str] = None) -> None:
+    """注册（或替换）指定 mimetype 的序列化器"""
+    _serializers[mimetype or serializer.mimetype] = serializer
+
+
+def get_serializer(mimetype: str = JSON_MIMETYPE) -> Serializer:
+    """获取指定 mimetype 的序列化器"""
+    return _serializers[mimetype]
+
+
+def negotiate_serializer() -> Serializer:
+    """按请求的 Accept 头选择响应序列化器，未声明或不支持时使用 JSON"""
+    accept = request.accept_mimetypes
+    if not accept:
+        return _serializers[JSON_MIMETYPE]
+    # 同等权重时按注册顺序优先（JSON 最先注册），Accept: */* 仍返回 JSON
+    mimetype = accept.best_match(list(_serializers), default=JSON_MIMETYPE)
+    return _serializers[mimetype]
+
+
+def is_msgpack_request() -> bool:
+    """请求体是否为 MessagePack"""
+    return request.mimetype == MSGPACK_MIMETYPE or request.mimetype in MSGPACK_MIMETYPE_ALIASES
+
+
+def _load_body(mimetype: str) -> Any:
+    body = request.get_data(cache=True)
+    if not body:
+        return {}
+    try:
+        data = _serializers[mimetype].loads(body)
+    except Exception as exc:
+        raise RequestBodyError('Invalid %s request body: %s' % (mimetype, exc)) from exc
+    return data or {}
+
+
+def load_request_json() -> Any:
+    """解析 JSON 请求体，Content-Type 不符或为空时返回 {}，格式错误时抛出 RequestBodyError"""
+    if not request.is_json:
+        return {}
+    return _load_body(JSON_MIMETYPE)
+
+
+def load_request_msgpack() -> Any:
+    """解析 MessagePack 请求体，Content-Type 不符或为空时返回 {}，格式错误时抛出 RequestBodyError"""
+    if not is_msgpack_request():
+        return {}
+    return _load_body(MSGPACK_MIMETYPE)
+
+
+def load_request_body() -> Any:
+    """按 Content-Type 解析 JSON 或 MessagePack 请求体"""
+    if is_msgpack_request():
+        return _load_body(MSGPACK_MIMETYPE)
+    return load_request_json()
+
+
+def build_response(payload: Any, status: int = 200, serializer: Optional[Serializer] = None) -> Response:
+    """使用序列化层生成 Flask 响应"""
+    serializer = serializer or _serializers[JSON_MIMETYPE]
+    return Response(serializer.dumps(payload), status=status, mimetype=serializer.mimetype)
+
+
+register_serializer(OrjsonSerializer() if orjson is not None else StdJsonSerializer())
+if ormsgpack is not None or msgpack is not None:
+    _msgpack_serializer = OrmsgpackSerializer() if ormsgpack is not None else MsgpackSerializer()
+    register_serializer(_msgpack_serializer)
+    for _alias in MSGPACK_MIMETYPE_ALIASES:
+        register_serializer(_msgpack_serializer, _alias)
+
+
+__all__ = [
+    'JSON_MIMETYPE',
+    'MSGPACK_MIMETYPE',
+    'RequestBodyError',
+    'Serializer',
+    'OrjsonSerializer',
+    'StdJsonSerializer',
+    'OrmsgpackSerializer',
+    'MsgpackSerializer',
+    'default_encoder',
+    'register_serializer',
+    'get_serializer',
+    'negotiate_serializer',
+    'is_msgpack_request',
+    'load_request_json',
+    'load_request_msgpack',
+    'load_request_body',
+    'build_response',
+]
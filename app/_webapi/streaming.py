@@ -0,0 +1,212 @@
+# coding: utf-8
+
+"""
+rpc 的 Server-Sent Events 流式输出。
+
+视图方法写成生成器（同步或 async）逐个 yield chunk，例如
+agent.stream(..., stream_mode="messages") 产生的 token（返回列表等普通可迭代对象也可以），框架负责：
+- 把每个 chunk 编码为一条 SSE 消息并立即 flush
+- 上游长时间没有产出时发送心跳注释，防止代理/负载均衡断开空闲连接
+- 客户端断开（WSGI 服务器调用 close）时停止并取消上游生成器
+- 缓冲队列有上限，客户端读得慢时上游在队列满后等待，不会无限堆积
+- 同步上游在独立线程中执行，结束后归还该线程打开的数据库连接；async 上游在共享事件循环上执行，
+  循环线程中不能直接执行 peewee 查询，需经 app._webapi.aio.run_sync（调用结束即归还连接）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from flask import Response, stream_with_context
+
+from app.utils.db_utils import db_manager
+
+from .aio import runner
+from .serializers import Serializer, get_serializer
+
+logger = logging.getLogger(__name__)
+
+SSE_MIMETYPE = 'text/event-stream'
+HEARTBEAT = b': ping\n\n'
+# 上游与响应迭代器之间最多缓冲的 chunk 数
+MAX_BUFFER = 256
+# 队列满时上游重试入队的间隔（秒），期间检查是否已取消
+_PUT_INTERVAL = 0.05
+
+# 队列中的控制标记
+_DONE = object()
+
+
+class _Failure(object):
+    def __init__(self, exc: Exception) -> None:
+        self.exc = exc
+
+
+def format_event(data: bytes, event: Optional[str] = None) -> bytes:
+    """编码一条 SSE 消息，data 需为不含换行的单行内容（紧凑 JSON 满足要求）"""
+    if event:
+        return b'event: ' + event.encode('utf-8') + b'\ndata: ' + data + b'\n\n'
+    return b'data: ' + data + b'\n\n'
+
+
+class EventStream(object):
+    """
+    把视图返回的生成器转换为 SSE 响应体。
+
+    上游在后台执行（同步生成器用独立线程，async 生成器用共享事件循环），
+    产出的 chunk 经队列交给响应迭代器；响应迭代器超过 heartbeat 秒取不到数据就发送心跳。
+    """
+
+    def __init__(
+        self,
+        source: Any,
+        heartbeat: float = 15.0,
+        serializer: Optional[Serializer] = None,
+        on_close: Optional[Callable[[], Any]] = None,
+        max_buffer: int = MAX_BUFFER,
+    ) -> None:
+        self.source = source
+        self.heartbeat = heartbeat
+        self.on_close = on_close
+        self.serializer = serializer or get_serializer()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_buffer)
+        self._cancelled = threading.Event()
+        self._future = None
+
+    def _start(self) -> None:
+        if hasattr(self.source, '__anext__'):
+            self._future = runner.submit(self._pump_async())
+        else:
+            # 在当前上下文副本中运行，生成器内可以继续使用 flask 的 request / g
+            ctx = contextvars.copy_context()
+            thread = threading.Thread(
+                target=ctx.run, args=(self._pump_sync,), name='rpc-sse', daemon=True)
+            thread.start()
+
+    def _put(self, item: Any) -> bool:
+        """队列满时阻塞等待，已取消（客户端断开）时放弃，返回是否入队"""
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=_PUT_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def _put_async(self, item: Any) -> bool:
+        # 不能在事件循环中阻塞，队列满时让出循环后重试
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                await asyncio.sleep(_PUT_INTERVAL)
+        return False
+
+    def _pump_sync(self) -> None:
+        source = self.source
+        try:
+            # 视图返回 None 等不可迭代的值时 iter() 抛出 TypeError，以 error 事件结束
+            for chunk in iter(source):
+                if not self._put(chunk):
+                    break
+        except Exception as exc:
+            self._put(_Failure(exc))
+        finally:
+            try:
+                # 生成器需要关闭，列表等普通可迭代对象没有 close
+                close = getattr(source, 'close', None)
+                if close is not None:
+                    close()
+            except Exception as exc:  # pragma: no cover - 生成器 finally 中出错
+                logger.warning('close event stream source failed: %r', exc)
+            finally:
+                self._put(_DONE)
+                # 生成器在本线程中打开的数据库连接不会被请求的 teardown 归还
+                db_manager.close_connections()
+
+    async def _pump_async(self) -> None:
+        agen = self.source
+        try:
+            async for chunk in agen:
+                if not await self._put_async(chunk):
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await self._put_async(_Failure(exc))
+        finally:
+            try:
+                aclose = getattr(agen, 'aclose', None)
+                if aclose is not None:
+                    await aclose()
+            finally:
+                await self._put_async(_DONE)
+
+    def close(self) -> None:
+        """停止上游：async 生成器直接取消任务，同步生成器在下一个 chunk 时退出"""
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        if self._future is not None:
+            self._future.cancel()
+        if self.on_close is not None:
+            self.on_close()
+
+    def __iter__(self) -> Iterator[bytes]:
+        dumps = self.serializer.dumps
+        self._start()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield HEARTBEAT
+                    continue
+
+                if item is _DONE:
+                    yield format_event(dumps({'result': 0, 'message': 'ok'}), 'end')
+                    return
+                if isinstance(item, _Failure):
+                    logger.warning('event stream aborted: %r', item.exc)
+                    yield format_event(dumps({
+                        'result': -1,
+                        'message': f'Internal error: {str(item.exc)}'
+                    }), 'error')
+                    return
+                yield format_event(dumps(item), 'message')
+        finally:
+            # 正常结束或客户端断开（GeneratorExit）都会走到这里
+            self.close()
+
+
+def event_stream_response(
+    source: Any, heartbeat: float = 15.0, on_close: Optional[Callable[[], Any]] = None
+) -> Response:
+    """
+    生成 SSE 响应；请求上下文保持到流结束，数据库等 teardown 钩子在流结束后才执行。
+
+    on_close 在流结束或客户端断开时调用一次（如释放准入控制占用的并发额度）。
+    """
+    stream = EventStream(source, heartbeat=heartbeat, on_close=on_close)
+    response = Response(stream_with_context(iter(stream)), mimetype=SSE_MIMETYPE)
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 的响应缓冲，保证 chunk 立即下发
+    response.headers['X-Accel-Buffering'] = 'no'
+    # 响应未开始迭代就被丢弃时，也要保证 on_close 被调用
+    response.call_on_close(stream.close)
+    return response
+
+
+__all__ = [
+    'MAX_BUFFER',
+    'SSE_MIMETYPE',
+    'EventStream',
+    'event_stream_response',
+    'format_event',
+]
@@ -1 +1,15 @@
+#!-*- coding=utf-8 -*-
 
+from app.consts import ConstGroup, Item
+
+__all__ = [
+    'CountStrategy',
+]
+
+
+class CountStrategy(ConstGroup):
+    '''列表接口 total 的计数方式，见 HelperSvcApi.count_strategy'''
+    EXACT              = Item('exact', '精确计数（单独的 COUNT 查询，随增删改失效）')
+    EXACT_SINGLE_QUERY = Item('exact_single_query', '精确计数（COUNT(*) OVER() 与分页同一条查询）')
+    CACHED             = Item('cached', '按数据范围缓存计数，过期前不随增删改更新')
+    ESTIMATE           = Item('estimate', '行数超过阈值时使用 EXPLAIN 估算值')
@@ -607,5 +607,18 @@ class ErrorNum(ErrorNumGroup):
 
 ErrorNum.init_cls()
 
+
+class CommonErrors(ErrorNumGroup):
+    '''HelperSvcApi 通用增删改查的错误'''
+    ''' 2500000 通用增删改查 begin '''
+    ArgsError       = Error.clsf(2500000, '参数有误')
+    NameRepeatError = Error.clsf(2500001, '名称已存在')
+    CreateError     = Error.clsf(2500002, '新建失败')
+    NotExistsError  = Error.clsf(2500003, '记录不存在')
+    ''' 2599999 通用增删改查 end '''
+
+
+CommonErrors.init_cls()
+
 if __name__ == '__main__':
     print(Error.cls('MakerExists', 'E01', '问题')('测试'))
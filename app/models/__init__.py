@@ -1,7 +1,30 @@
+import importlib
+import os
+import os.path as osp
+
 import peewee
 
-# 配置数据库连接
-db = peewee.MySQLDatabase('wz', user='root', password='wiseyq123', host='localhost', port=3306)
+from app.utils.db_utils import db_manager
+
+# 模型所在的数据库；config.DATABASES 中配置了同名库时以配置为准
+MODELS_DB = 'wz'
+db_manager.register(MODELS_DB, dict(
+    engine='mysql',
+    database='wz',
+    params=dict(host='localhost', port=3306, user='root', password='wiseyq123'),
+))
+
+# 配置数据库连接（按需创建，导入期不连接数据库）
+db = db_manager.proxy(MODELS_DB)
+
+
+class SoftDeleteSelect(peewee.ModelSelect):
+    """BaseModel.select() 返回的查询，增加软删除过滤"""
+
+    def no_deleted(self):
+        """只保留未删除的行（delete_at IS NULL）"""
+        return self.where(self.model.delete_at.is_null())
+
 
 # 定义模型
 class BaseModel(peewee.Model):
@@ -12,3 +35,39 @@ class BaseModel(peewee.Model):
 
     class Meta:
         database = db
+
+    @classmethod
+    def select(cls, *fields):
+        is_default = not fields
+        if not fields:
+            fields = cls._meta.sorted_fields
+        return SoftDeleteSelect(cls, fields, is_default=is_default)
+
+
+def iter_models():
+    """导入 app/models 下的所有模块，返回 BaseModel 的全部子类（不含声明了 _abstract = True 的抽象基类）"""
+    models_dir = osp.dirname(osp.abspath(__file__))
+    for file in sorted(os.listdir(models_dir)):
+        if file.endswith('.py') and not file.startswith('_'):
+            importlib.import_module(f'{__name__}.{file[:-3]}')
+
+    seen, stack = [], list(BaseModel.__subclasses__())
+    while stack:
+        model = stack.pop(0)
+        if model not in seen:
+            seen.append(model)
+            stack.extend(model.__subclasses__())
+    return [model for model in seen if not model.__dict__.get('_abstract')]
+
+
+def sync_models(models=None):
+    """
+    创建缺失的表（CREATE TABLE IF NOT EXISTS），不修改已有表结构。
+
+    导入模型时不再检查/建表；部署时由迁移的第一个版本执行（python -m app.models.migrations），
+    开发环境也可以直接执行 python -m app.models.sync
+    """
+    models = models or iter_models()
+    # SQLite 的 safe 建表会给已有的表补建索引，MySQL 不会；统一跳过已有的表，索引变更交给迁移
+    db.create_tables([model for model in models if not model.table_exists()], safe=True)
+    return models
@@ -13,6 +13,7 @@ class Account(BaseModel):
 
     class Meta:
         db_table = 'account'
-
-if not Account.table_exists():
-    Account.create_table()
\ No newline at end of file
+        indexes = (
+            # 账号列表的游标分页按 (create_at, id) 倒序
+            (('create_at', 'id'), False),
+        )
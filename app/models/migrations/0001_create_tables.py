@@ -0,0 +1,9 @@
+# coding: utf-8
+
+"""创建模型对应的缺失数据表（同 python -m app.models.sync），已有的表不变"""
+
+from app.models import sync_models
+
+
+def migrate(migrator, database):
+    sync_models()
@@ -0,0 +1,14 @@
+# coding: utf-8
+
+"""
+为已有的 account 表补上游标分页用的 (create_at, id) 索引。
+
+版本 0002 / 0003 已删除（曾在部分库中执行过），版本号不复用。
+"""
+
+from app.models.basic_model import Account
+from app.models.migrations import add_missing_indexes
+
+
+def migrate(migrator, database):
+    add_missing_indexes(migrator, database, [Account], only=(('create_at', 'id'),))
@@ -0,0 +1,157 @@
+# coding: utf-8
+
+"""
+版本化的表结构迁移（基于 playhouse.migrate）。
+
+迁移文件放在本目录，文件名为 <4 位版本号>_<说明>.py，按版本号顺序执行，每个文件定义：
+
+    def migrate(migrator, database):
+        # migrator 为 playhouse.migrate.SchemaMigrator，database 为模型所在的数据库实例
+        run_migrations(migrator.add_column('account', 'remark', peewee.CharField(default='')))
+
+已执行的版本记录在 schema_migrations 表中，重复执行只会执行新增的版本。
+
+用法：
+    python -m app.models.migrations                 # 执行全部未执行的迁移
+    python -m app.models.migrations --list          # 查看各版本状态
+    python -m app.models.migrations --to 0002       # 只执行到 0002（含）
+    python -m app.models.migrations --fake --to 0002  # 只记录为已执行（表结构已手工变更过的库）
+
+MySQL 的 DDL 会隐式提交，迁移中途失败时已执行的语句不会回滚，迁移应写成可重复执行的
+（例如用 add_missing_indexes 只补缺失的索引），修复后重新执行即可。
+
+迁移默认在一个事务中执行；需要分批提交大量数据更新的迁移可以在模块中设置 ATOMIC = False，
+自行控制事务（例如按主键区间每批提交一次），版本在迁移成功后再记录。
+"""
+
+import datetime
+import importlib
+import logging
+import os
+import os.path as osp
+import re
+
+import peewee
+from playhouse.migrate import SchemaMigrator, migrate as run_migrations
+
+from app.models import db
+from app.utils.model_utils import _unwrap_database
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = osp.dirname(osp.abspath(__file__))
+_MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+
+class SchemaMigration(peewee.Model):
+    """已执行的迁移版本"""
+    version = peewee.CharField(max_length=16, primary_key=True)
+    name = peewee.CharField(max_length=255)
+    applied_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+        table_name = 'schema_migrations'
+
+
+def discover():
+    """本目录下的迁移，按版本号排序：[(version, name), ...]"""
+    migrations = []
+    for file in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _MIGRATION_FILE.match(file)
+        if match:
+            migrations.append(match.groups())
+    return migrations
+
+
+def load(version, name):
+    return importlib.import_module(f'{__name__}.{version}_{name}')
+
+
+def applied_versions():
+    db.create_tables([SchemaMigration], safe=True)
+    return {row.version for row in SchemaMigration.select(SchemaMigration.version)}
+
+
+def pending(target=None):
+    """未执行的迁移，target 不为空时只到该版本（含）"""
+    applied = applied_versions()
+    return [(version, name) for version, name in discover()
+            if version not in applied and (target is None or version <= target)]
+
+
+def migrate(target=None, fake=False):
+    """
+    按顺序执行未执行的迁移，返回本次执行的版本列表。
+
+    fake 为 True 时不执行迁移，只记录为已执行
+    """
+    database = _unwrap_database(db)
+    migrator = SchemaMigrator.from_database(database)
+    done = []
+    for version, name in pending(target):
+        module = None if fake else load(version, name)
+        if module is not None and not getattr(module, 'ATOMIC', True):
+            # 迁移自行分批提交，中途失败时版本不记录，重新执行
+            logger.info('apply migration %s_%s', version, name)
+            module.migrate(migrator, database)
+            SchemaMigration.create(version=version, name=name)
+            done.append(version)
+            continue
+        # SQLite 的 DDL 可以随事务回滚；MySQL 的 DDL 隐式提交，这里只保证版本记录与迁移一起成功
+        with database.atomic():
+            if module is not None:
+                logger.info('apply migration %s_%s', version, name)
+                module.migrate(migrator, database)
+            SchemaMigration.create(version=version, name=name)
+        done.append(version)
+    return done
+
+
+def declared_indexes(model, only=None):
+    """
+    模型 Meta.indexes 中以字段名元组声明的索引：[(列名元组, unique), ...]；
+    only 不为空时只取其中列出的（字段名元组）
+    """
+    indexes = []
+    for index in model._meta.indexes:
+        if isinstance(index, (list, tuple)) and len(index) == 2 and isinstance(index[0], (list, tuple)):
+            fields, unique = index
+            if only is not None and tuple(fields) not in only:
+                continue
+            columns = tuple(model._meta.fields[field].column_name for field in fields)
+            indexes.append((columns, bool(unique)))
+    return indexes
+
+
+def add_missing_indexes(migrator, database, models, only=None):
+    """
+    为已有的表补上模型中声明、数据库中还没有的索引（按列与是否唯一比较，不看索引名），返回补建的索引。
+
+    模型的声明会随版本变化，迁移中应通过 only 写明本次要补的索引（字段名元组）。
+    表不存在时跳过：新建表时 create_tables 会一并创建声明的索引
+    """
+    added = []
+    for model in models:
+        table = model._meta.table_name
+        if not database.table_exists(table):
+            continue
+        existing = {(tuple(index.columns), index.unique) for index in database.get_indexes(table)}
+        for columns, unique in declared_indexes(model, only):
+            if (columns, unique) not in existing:
+                logger.info('add index on %s%r', table, columns)
+                run_migrations(migrator.add_index(table, columns, unique))
+                added.append((table, columns, unique))
+    return added
+
+
+__all__ = [
+    'SchemaMigration',
+    'add_missing_indexes',
+    'applied_versions',
+    'declared_indexes',
+    'discover',
+    'migrate',
+    'pending',
+    'run_migrations',
+]
@@ -0,0 +1,36 @@
+# coding: utf-8
+
+"""
+执行表结构迁移，见 app/models/migrations/__init__.py。
+
+用法：
+    python -m app.models.migrations [--list] [--to VERSION] [--fake]
+"""
+
+import argparse
+
+from app.models.migrations import applied_versions, discover, migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.models.migrations', description='执行表结构迁移')
+    parser.add_argument('--list', action='store_true', help='列出全部迁移及是否已执行')
+    parser.add_argument('--to', metavar='VERSION', help='只执行到该版本（含）')
+    parser.add_argument('--fake', action='store_true', help='只记录为已执行，不实际变更表结构')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        applied = applied_versions()
+        for version, name in discover():
+            print('[%s] %s_%s' % ('x' if version in applied else ' ', version, name))
+        return
+
+    done = migrate(target=args.to, fake=args.fake)
+    for version in done:
+        print('%s migration %s' % ('faked' if args.fake else 'applied', version))
+    if not done:
+        print('no pending migrations')
+
+
+if __name__ == '__main__':
+    main()
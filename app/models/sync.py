@@ -0,0 +1,19 @@
+# coding: utf-8
+
+"""
+创建模型对应的缺失数据表。
+
+用法：
+    python -m app.models.sync
+"""
+
+from app.models import sync_models
+
+
+def main():
+    for model in sync_models():
+        print('synced table %s' % model._meta.table_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,27 @@ import datetime
 
 from app.models.basic_model import Account as AccountModel
 from app.services.common_help_services import HelperSvcApi
+from app.utils.query_cache import normalize_scope, query_cache
+
+# 批量导入时按此顺序组成 insert_many 的行
+ACCOUNT_COLUMNS = ('securityCode', 'cardNumber', 'month', 'year', 'postalCode')
+# 账号不按 group / team / project 划分数据范围，查询缓存中整张表为同一个范围
+ACCOUNT_SCOPE = normalize_scope(None)
 
 
 class BasicSvr(HelperSvcApi):
+    @staticmethod
+    def get_base_cond(obj, req):
+        return obj.delete_at.is_null()
+
+    @staticmethod
+    def get_scope(req):
+        return ACCOUNT_SCOPE
+
+    def list_accounts(self, req):
+        """账号列表，返回 (total, items, page_info)，见 HelperSvcApi._model_db_page"""
+        return self._model_db_page(AccountModel, req)
+
     def add_account(self, req):
         result = 0
         message = 'success'
@@ -22,5 +40,23 @@ class BasicSvr(HelperSvcApi):
             AccountModel.insert(item).execute()
         except:
             raise Exception('参数错误')
+        query_cache.invalidate(AccountModel._meta.table_name, ACCOUNT_SCOPE)
 
         return result, message
+
+    def add_accounts(self, accounts, batch_size=500):
+        """
+        批量添加账号，accounts 为已校验的账号字典列表。
+
+        Returns:
+            (写入行数, [(下标, 错误信息), ...])
+        """
+        now = datetime.datetime.now()
+        fields = [getattr(AccountModel, name) for name in ACCOUNT_COLUMNS] + [
+            AccountModel.create_at, AccountModel.update_at]
+        rows = [tuple(account.get(name) for name in ACCOUNT_COLUMNS) + (now, now) for account in accounts]
+
+        inserted, errors = self._model_db_bulk_insert(AccountModel, fields, rows, batch_size=batch_size)
+        if inserted:
+            query_cache.invalidate(AccountModel._meta.table_name, ACCOUNT_SCOPE)
+        return inserted, errors
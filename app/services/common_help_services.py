@@ -1,9 +1,17 @@
+import copy
 import datetime
 import logging
 import os
 
-from app.consts.errors import Error
-from config import ZJ_BASE_DIR
+from peewee import SQL, DatabaseError, chunked, fn
+
+from app.consts.basic_const import CountStrategy
+from app.consts.errors import CommonErrors, Error, ErrorNum
+from app.utils.cache_utils import LRUCache
+from app.utils.model_utils import (FIRST_CURSOR, InvalidCursor, decode_cursor, encode_cursor, estimate_rows,
+                                   seek_condition, seek_fields, seek_order, supports_window_functions)
+from app.utils.query_cache import normalize_scope, query_cache
+from config import LIST_COUNT, ZJ_BASE_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +19,14 @@ class BaseSvc(object):
     pass
 
 
+# cached 计数模式的缓存，不随增删改失效，只按 ttl 过期
+_count_cache = LRUCache(maxsize=LIST_COUNT['cached_maxsize'], ttl=LIST_COUNT['cached_ttl'])
+
+
 class HelperSvcApi(BaseSvc):
+    # 列表接口 total 的默认计数方式，子类可覆盖，单次调用可通过 count_strategy 参数指定
+    count_strategy = CountStrategy.EXACT
+
     def __init__(self):
         pass
 
@@ -44,6 +59,18 @@ class HelperSvcApi(BaseSvc):
 
         return model
 
+    @staticmethod
+    def update_values(model, req):
+        """与 update_obj 取值规则相同，返回 model.update() 用的 {字段: 值}"""
+        now_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        obj_dic = req.__dict__['_field_values']
+        obj_dic.update({
+            'update_at': now_time,
+        })
+
+        fields = model._meta.fields
+        return {fields[k]: v for k, v in obj_dic.items() if v is not None and k in fields}
+
     @staticmethod
     def get_base_cond(obj, req):
         cond = (obj.group_id == req.group_id)
@@ -54,6 +81,26 @@ class HelperSvcApi(BaseSvc):
 
         return cond
 
+    def get_list_cond(self, model, req):
+        cond = self.get_base_cond(model, req)
+        if req.kw:
+            cond = cond & (model.name.contains(req.kw))
+
+        return cond
+
+    @staticmethod
+    def get_scope(req):
+        """与 get_base_cond 对应的数据范围 (group_id, team_id, project_id)，用于查询缓存"""
+        return normalize_scope(req.group_id, req.team_id, req.project_id)
+
+    @staticmethod
+    def _clone_row(item):
+        # 缓存中的行在多个请求间共享，返回副本，避免调用方修改缓存内容
+        row = copy.copy(item)
+        row.__data__ = dict(item.__data__)
+        row._dirty = set(item._dirty)
+        return row
+
     def check_name_repeat(self, model, req, _field, name, _id=None):
         cond = self.get_base_cond(model, req)
         if _id:
@@ -78,13 +125,9 @@ class HelperSvcApi(BaseSvc):
         total = 0
         items = list()
 
-        base_cond = self.get_base_cond(model, req)
-
-        cond = base_cond & (model.name == req.name)
-
-        check_name = model.select().where(cond).no_deleted().get_or_none()
-        if check_name:
+        if self.check_name_repeat(model, req, 'name', req.name):
             raise CommonErrors.NameRepeatError
+
         item = model()
         item = self.create_obj(item, req)
         if getattr(model, 'sender', None):
@@ -92,47 +135,151 @@ class HelperSvcApi(BaseSvc):
 
         try:
             item.save()
-        except:
+        except Exception:
+            logger.exception('create %s failed', model._meta.table_name)
             raise CommonErrors.CreateError
+        query_cache.invalidate(model._meta.table_name, self.get_scope(req))
 
         return total, items
 
-    def _model_db_list(self, model=None, req=None, **kwargs) -> (int, list):
-        cond = self.get_base_cond(model, req)
-        if req.kw:
-            cond = cond & (model.name.contains(req.kw))
-        items = model.select().where(cond).paginate(
-            req.page, req.pageSize).no_deleted()
-        total = model.select().where(cond).no_deleted().count()
+    def _count_total(self, model, req, cond, strategy):
+        """按计数方式统计 cond 范围内未删除的行数，返回 (行数, 是否为估算值)"""
+        query = model.select().where(cond).no_deleted()
+        table, scope = model._meta.table_name, self.get_scope(req)
+
+        if strategy == CountStrategy.CACHED:
+            key = (table, scope, req.kw)
+            total = _count_cache.get(key)
+            if total is None:
+                total = query.count()
+                _count_cache.set(key, total)
+            return total, False
+
+        if strategy == CountStrategy.ESTIMATE:
+            estimate = estimate_rows(query)
+            if estimate is not None and estimate >= LIST_COUNT['estimate_threshold']:
+                return estimate, True
+
+        total = query_cache.get_or_load(
+            table, scope, (req.kw, 'count'), query.count,
+            database=model._meta.database)
+        return total, False
+
+    def _model_db_list(self, model=None, req=None, count_strategy=None, **kwargs) -> (int, list):
+        """列表查询，返回 (total, items)；需要下一页游标或 total 是否为估算值时用 _model_db_page"""
+        total, items, _ = self._model_db_page(model, req, count_strategy=count_strategy)
+        return total, items
 
-        for item in items:
-            item.create_at = self.datetime_to_str(item.create_at)
+    def _model_db_page(self, model=None, req=None, count_strategy=None, **kwargs) -> (int, list, dict):
+        """
+        列表查询，返回 (total, items, page_info)。传了 cursor（第一页传 FIRST_CURSOR）时按游标翻页，
+        见 _model_db_seek；否则沿用 page / pageSize 分页。
+
+        total 的计数方式见 CountStrategy，默认取 self.count_strategy。
+        page_info['next_cursor'] 为下一页的游标（page / pageSize 分页或已到末页时为 None），
+        page_info['is_estimate'] 表示 total 是否为估算值，二者应在响应中与 total、items 并列返回
+        """
+        strategy = count_strategy or self.count_strategy
+        if req.cursor:
+            return self._model_db_seek(model, req, count_strategy=strategy)
+
+        cond = self.get_list_cond(model, req)
+        single_query = (strategy == CountStrategy.EXACT_SINGLE_QUERY
+                        and supports_window_functions(model._meta.database))
+
+        def load():
+            query = model.select().where(cond).paginate(
+                req.page, req.pageSize).no_deleted()
+            total = None
+            if single_query:
+                # 总数随分页结果一起返回；页码超出范围时结果为空，退回单独计数
+                items = list(query.select_extend(fn.COUNT(SQL('*')).over().alias('_total')))
+                if items:
+                    total = items[0]._total
+                for item in items:
+                    item.__dict__.pop('_total', None)
+            else:
+                items = list(query)
+
+            for item in items:
+                item.create_at = self.datetime_to_str(item.create_at)
+
+            return total, items
+
+        # 按 (表, 数据范围, 关键字, 分页) 缓存，增删改时按范围失效
+        total, items = query_cache.get_or_load(
+            model._meta.table_name, self.get_scope(req),
+            (req.kw, req.page, req.pageSize, single_query), load,
+            database=model._meta.database)
+        is_estimate = False
+        if total is None:
+            total, is_estimate = self._count_total(model, req, cond, strategy)
+
+        page_info = dict(next_cursor=None, is_estimate=is_estimate)
+        return total, [self._clone_row(item) for item in items], page_info
+
+    def _model_db_seek(self, model=None, req=None, count_strategy=None, **kwargs) -> (int, list, dict):
+        """
+        游标（keyset）分页：按 (create_at, id) 倒序，每页取 pageSize 条。
+
+        返回值同 _model_db_page，page_info['next_cursor'] 传给下一次请求的 cursor，为 None 时已到末页。
+        翻页深度不影响查询耗时；total 单独统计并缓存，同一范围内翻页只统计一次。
+        create_at 为空的行不会出现在游标分页结果中
+        """
+        fields = seek_fields(model)
+        page_size = req.pageSize or 20
+        try:
+            after = None if req.cursor == FIRST_CURSOR else decode_cursor(fields, req.cursor)
+        except InvalidCursor as exc:
+            raise ErrorNum.ArgError(str(exc))
 
-        return total, items
+        cond = self.get_list_cond(model, req)
+
+        def load_page():
+            page_cond = cond if after is None else cond & seek_condition(fields, after)
+            # 多取一条判断是否还有下一页
+            items = list(model.select().where(page_cond).no_deleted().order_by(
+                *seek_order(fields)).limit(page_size + 1))
+            next_cursor = None
+            if len(items) > page_size:
+                items = items[:page_size]
+                next_cursor = encode_cursor(fields, items[-1])
+
+            for item in items:
+                item.create_at = self.datetime_to_str(item.create_at)
+
+            return items, next_cursor
+
+        items, next_cursor = query_cache.get_or_load(
+            model._meta.table_name, self.get_scope(req), (req.kw, 'seek', req.cursor, page_size), load_page,
+            database=model._meta.database)
+        # 游标分页不做窗口计数：每页都带 COUNT(*) OVER() 会让深翻页重新扫描全部范围
+        total, is_estimate = self._count_total(model, req, cond, count_strategy or self.count_strategy)
+
+        page_info = dict(next_cursor=next_cursor, is_estimate=is_estimate)
+        return total, [self._clone_row(item) for item in items], page_info
 
     def _model_db_update(self, model=None, typ_id=None, req=None, user_id=None, **kwargs) -> (int, list):
+        """编辑：查重后一条 UPDATE 完成"""
         if not typ_id:
             raise CommonErrors.ArgsError
 
         total = 0
         items = list()
 
-        base_cond = self.get_base_cond(model, req)
-        cond = base_cond & (model.id != typ_id) & (
-                model.name == req.name)
-
-        check_name = model.select().where(cond).no_deleted().get_or_none()
-        if check_name:
+        if self.check_name_repeat(model, req, 'name', req.name, typ_id):
             raise CommonErrors.NameRepeatError
 
-        item = model.select().where(base_cond & (
-                model.id == typ_id)).no_deleted().get_or_none()
-
-        item = self.update_obj(item, req)
-        if getattr(model, 'sender'):
-            item.sender = user_id
+        values = self.update_values(model, req)
+        if getattr(model, 'sender', None):
+            values[model.sender] = user_id
 
-        item.save()
+        cond = self.get_base_cond(model, req) & (model.id == typ_id) & model.delete_at.is_null()
+        updated = model.update(values).where(cond).execute()
+        # MySQL 返回实际变更的行数，值没有变化时也是 0，此时再确认记录是否存在
+        if not updated and not model.select(model.id).where(cond).exists():
+            raise CommonErrors.NotExistsError
+        query_cache.invalidate(model._meta.table_name, self.get_scope(req))
 
         return total, items
 
@@ -148,9 +295,47 @@ class HelperSvcApi(BaseSvc):
         base_cond = self.get_base_cond(model, req)
         cond = base_cond & (model.id == typ_id)
         model.update(delete_at=delete_at).where(cond).execute()
+        query_cache.invalidate(model._meta.table_name, self.get_scope(req))
 
         return total, items
 
+    def _model_db_bulk_insert(self, model, fields, rows, batch_size=500):
+        """
+        批量插入：rows 为与 fields 顺序一致的元组列表，按 batch_size 分批 insert_many，
+        全部批次在同一个事务中。某一批失败时回滚该批（保存点）并逐行重试，定位出错的行，
+        其余行照常写入。
+
+        Returns:
+            (写入行数, [(行号, 错误信息), ...])，行号为 rows 中的下标
+        """
+        inserted = 0
+        errors = []
+        database = model._meta.database
+        with database.atomic():
+            offset = 0
+            for batch in chunked(rows, batch_size):
+                try:
+                    with database.atomic():
+                        model.insert_many(batch, fields=fields).execute()
+                    inserted += len(batch)
+                except DatabaseError:
+                    for i, row in enumerate(batch, offset):
+                        try:
+                            with database.atomic():
+                                model.insert_many([row], fields=fields).execute()
+                            inserted += 1
+                        except DatabaseError as exc:
+                            errors.append((i, str(exc)))
+                offset += len(batch)
+
+        # 涉及多个范围，按组整体失效列表缓存
+        names = [getattr(f, 'name', f) for f in fields]
+        if inserted and 'group_id' in names:
+            index = names.index('group_id')
+            for group_id in {row[index] for row in rows}:
+                query_cache.invalidate(model._meta.table_name, normalize_scope(group_id))
+        return inserted, errors
+
     def operate_model(self, **kwargs) -> (int, list):
         op_typ = kwargs.get('req').op_typ
 
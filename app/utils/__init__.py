@@ -2,28 +2,56 @@
 通用工具模块集合。
 
 这里可以统一导出各类工具，方便其他模块直接从 app.utils 导入。
+
+提示词 / LLM 相关的导出按需加载（PEP 562 模块级 __getattr__）：
+首次访问 app.utils.build_system_message 等名称时才导入对应模块，
+不使用 AI 能力的 web worker 启动时不再加载 LangChain / LangGraph。
 """
 
+import importlib
+
 from .db_utils import DbCfg, DatabaseManager, db_manager  # noqa: F401
 from .strings import split_string  # noqa: F401
-from app.utils.langchain_langgraph.common_tools.prompt_builder import (  # noqa: F401
-    PromptMessage,
-    PromptTemplate,
-    DEFAULT_ASSISTANT_SYSTEM,
-    assistant_chat_template,
-    build_assistant_chat_messages,
-    build_code_review_messages,
-    build_conversation,
-    build_structured_extract_messages,
-    build_summarize_messages,
-    build_system_message,
-    build_user_message,
-    build_assistant_message,
-    code_review_template,
-    messages_to_dicts,
-    structured_extract_template,
-    summarize_template,
-)
+
+_PROMPT_BUILDER = "app.utils.langchain_langgraph.common_tools.prompt_builder"
+
+# 延迟导出：名称 -> 所在模块
+_LAZY_EXPORTS = {
+    name: _PROMPT_BUILDER
+    for name in (
+        "PromptMessage",
+        "PromptTemplate",
+        "DEFAULT_ASSISTANT_SYSTEM",
+        "assistant_chat_template",
+        "build_assistant_chat_messages",
+        "build_code_review_messages",
+        "build_conversation",
+        "build_structured_extract_messages",
+        "build_summarize_messages",
+        "build_system_message",
+        "build_user_message",
+        "build_assistant_message",
+        "code_review_template",
+        "messages_to_dicts",
+        "structured_extract_template",
+        "summarize_template",
+    )
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    # 缓存到模块命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
 
 __all__ = [
     # db
@@ -50,4 +78,3 @@ __all__ = [
     "structured_extract_template",
     "summarize_template",
 ]
-
@@ -0,0 +1,201 @@
+# coding: utf-8
+
+"""
+MySQL 的 asyncio 访问方式，供 async 视图与 agent 工具使用。
+
+peewee 的查询是阻塞的，在事件循环中执行会卡住同一循环上的所有协程（见 app/_webapi/aio.py）。
+这里按 config.DATABASES 中同名库的配置创建 aiomysql 连接池，并提供一组很薄的查询接口：
+
+    from app.utils.db_utils import db_manager
+
+    adb = db_manager.aio('zj3')
+    rows = await adb.fetchall('SELECT id, name FROM account WHERE group_id = %s', (group_id,))
+    rows = await adb.fetch_query(Account.select().where(Account.id == 1))   # peewee 查询只用来生成 SQL
+    async with adb.transaction() as cur:
+        await cur.execute('UPDATE ...', params)
+
+连接池参数与 PooledMySQLDatabase 对应：max_connections -> maxsize，stale_timeout -> pool_recycle，
+timeout -> 取连接的最长等待时间。连接池绑定创建它的事件循环，在其他循环中使用时会为该循环单独建池。
+
+aiomysql 已列入依赖（requirements.txt），导入仍按可选处理：未安装时调用 db_manager.aio() 会报错，其余功能不受影响。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+try:
+    import aiomysql  # type: ignore[import]
+except ImportError:  # pragma: no cover - aiomysql 为可选依赖
+    aiomysql = None
+
+from app.utils.fork_utils import register_after_fork
+from app.utils.metric_utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 已创建的异步库，供指标采集
+_databases: "weakref.WeakSet[AsyncDatabase]" = weakref.WeakSet()
+
+
+class AsyncDatabase(object):
+    """
+    单个 MySQL 库的 aiomysql 连接池封装，按事件循环懒创建连接池。
+
+    Args:
+        name: 库名（用于日志与指标）
+        database: 数据库名
+        params: DbCfg.params，即 PooledMySQLDatabase 的参数
+    """
+
+    def __init__(self, name: str, database: str, params: Dict[str, Any]) -> None:
+        if aiomysql is None:
+            raise RuntimeError('aiomysql 未安装，无法创建异步数据库连接池')
+        params = dict(params)
+        self.name = name
+        self.max_connections: int = params.pop('max_connections', None) or 20
+        self.min_connections: int = params.pop('min_connections', 1)
+        self.stale_timeout: Optional[float] = params.pop('stale_timeout', None)
+        self.acquire_timeout: Optional[float] = params.pop('timeout', None) or None
+        for key in ('autorollback', 'autoconnect', 'thread_safe', 'field_types', 'operations'):
+            params.pop(key, None)
+        # 其余为 pymysql 连接参数（host / port / user / password / charset ...），aiomysql 参数名一致
+        self.connect_params = dict(params, db=database)
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._pid = os.getpid()
+        _databases.add(self)
+
+    async def pool(self) -> Any:
+        """当前事件循环上的连接池，首次使用时创建"""
+        loop = asyncio.get_running_loop()
+        if self._pid != os.getpid():
+            # fork 出的子进程不能沿用父进程的连接
+            self._pools = weakref.WeakKeyDictionary()
+            self._pid = os.getpid()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = await aiomysql.create_pool(
+                minsize=min(self.min_connections, self.max_connections),
+                maxsize=self.max_connections,
+                pool_recycle=int(self.stale_timeout) if self.stale_timeout else -1,
+                autocommit=True,
+                **self.connect_params
+            )
+            # 创建连接池期间其他协程可能已经建好
+            if loop in self._pools:
+                pool.close()
+                await pool.wait_closed()
+                return self._pools[loop]
+            self._pools[loop] = pool
+            logger.debug('create aiomysql pool for %s (maxsize=%s)', self.name, self.max_connections)
+        return pool
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        """从连接池取一个连接，超过 timeout 秒取不到时抛出 asyncio.TimeoutError"""
+        pool = await self.pool()
+        conn = await asyncio.wait_for(pool.acquire(), self.acquire_timeout)
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+
+    @asynccontextmanager
+    async def cursor(self, dict_rows: bool = True) -> AsyncIterator[Any]:
+        async with self.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor if dict_rows else aiomysql.Cursor) as cur:
+                yield cur
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Any]:
+        """在一个事务中执行，正常退出时提交，异常时回滚"""
+        async with self.connection() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cur:
+                    yield cur
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> int:
+        """执行写语句，返回影响行数"""
+        async with self.cursor() as cur:
+            return await cur.execute(sql, params)
+
+    async def executemany(self, sql: str, seq_params: Sequence[Sequence[Any]]) -> int:
+        async with self.cursor() as cur:
+            return await cur.executemany(sql, seq_params)
+
+    async def fetchall(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        async with self.cursor() as cur:
+            await cur.execute(sql, params)
+            return list(await cur.fetchall())
+
+    async def fetchone(self, sql: str, params: Optional[Sequence[Any]] = None) -> Optional[Dict[str, Any]]:
+        async with self.cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchone()
+
+    async def fetch_query(self, query: Any) -> List[Dict[str, Any]]:
+        """执行 peewee 查询（只用于生成 SQL），返回字典列表"""
+        sql, params = query.sql()
+        return await self.fetchall(sql, params)
+
+    async def ping(self) -> Dict[str, Any]:
+        """健康检查，返回格式与 DatabaseManager.ping_all 中的单项一致"""
+        started = time.perf_counter()
+        try:
+            async with self.connection() as conn:
+                await conn.ping(reconnect=True)
+            result: Dict[str, Any] = {'ok': True}
+        except Exception as exc:
+            logger.warning('ping async database %s failed: %s', self.name, exc)
+            result = {'ok': False, 'error': str(exc)}
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    async def close(self) -> None:
+        """关闭当前事件循环上的连接池"""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+
+@register_after_fork
+def _reset_after_fork() -> None:
+    # 连接池属于父进程的事件循环，子进程中丢弃，按需重新创建
+    for db in list(_databases):
+        db._pools = weakref.WeakKeyDictionary()
+        db._pid = os.getpid()
+
+
+def _collect_aio_pools():
+    # 同一个库在多个事件循环上的连接池合并统计
+    in_use: Dict[str, int] = {}
+    idle: Dict[str, int] = {}
+    for db in list(_databases):
+        for pool in list(db._pools.values()):
+            in_use[db.name] = in_use.get(db.name, 0) + pool.size - pool.freesize
+            idle[db.name] = idle.get(db.name, 0) + pool.freesize
+    yield ('db_aio_pool_in_use', 'gauge', '异步连接池使用中的连接数',
+           [({'db': name}, value) for name, value in in_use.items()])
+    yield ('db_aio_pool_idle', 'gauge', '异步连接池空闲连接数',
+           [({'db': name}, value) for name, value in idle.items()])
+
+
+metrics.register_collector(_collect_aio_pools)
+
+
+__all__ = [
+    'AsyncDatabase',
+]
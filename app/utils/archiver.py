@@ -0,0 +1,322 @@
+# coding: utf-8
+
+"""
+软删除归档：把 delete_at 早于 retain_days 天的行从热表移到 <表名>_archive。
+
+_model_db_del 只设置 delete_at，删除的行一直留在热表里，no_deleted() 查询要跳过它们，
+索引与 buffer pool 中也有越来越多用不到的页。归档任务在后台按主键区间分批处理：
+
+- 每批只处理 (last_id, last_id + batch_size] 这一段主键，INSERT ... SELECT 复制到归档表后 DELETE，
+  复制、删除与检查点在同一个事务中，锁住的行少、持有时间短
+- 批次之间暂停 pause 秒，避免与线上请求争抢 IO 与锁
+- 检查点（archive_checkpoints 表）记录本轮处理到的主键，进程重启后从检查点继续；
+  扫到本轮开始时的最大主键后从头开始下一轮，检查点之前后来才删除的行在下一轮归档
+- 进度指标：archive_rows_total / archive_batches_total / archive_batch_seconds，
+  以及 archive_checkpoint_id、archive_max_id（二者之比为本轮进度）与 archive_last_pass_timestamp
+
+归档表的列与原表相同（不带二级索引），另加 archived_at 记录归档时间。每轮处理前对照模型补齐归档表
+缺少的列（迁移给热表加列后，归档表自动跟上，补上的列允许为空，之前归档的行为 NULL）；
+列类型的变更不会同步，需要在迁移中同时修改归档表。热表中有模型没有声明的列时（迁移已执行、
+常驻进程还在运行旧代码）跳过该表，避免删除未复制的列中的数据，重启进程后继续。
+
+用法：
+    python -m app.utils.archiver                   # 按 config.ARCHIVE 处理一轮
+    python -m app.utils.archiver --loop            # 常驻，每 interval 秒一轮（见 conf/supervisor_archiver.conf）
+    python -m app.utils.archiver --table account --retain-days 30 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import datetime
+import logging
+import signal
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import peewee
+from playhouse.migrate import SchemaMigrator, migrate as run_migrations
+
+from app.utils.metric_utils import format_labels, metrics
+from app.utils.model_utils import _unwrap_database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = dict(
+    tables=None,
+    retain_days=90,
+    batch_size=1000,
+    pause=0.2,
+    interval=3600,
+)
+
+ARCHIVE_SUFFIX = '_archive'
+
+rows_total = metrics.counter('archive_rows_total', '归档的行数')
+batches_total = metrics.counter('archive_batches_total', '归档批次数')
+batch_seconds = metrics.histogram('archive_batch_seconds', '单批归档耗时（秒）')
+
+# 各表的进度，供指标采集：{表名: dict(checkpoint=, max_id=, last_pass=)}
+_progress: Dict[str, Dict[str, float]] = {}
+
+
+def get_options() -> Dict[str, Any]:
+    try:
+        import config
+
+        return dict(DEFAULT_OPTIONS, **(getattr(config, 'ARCHIVE', None) or {}))
+    except Exception:  # pragma: no cover - 兜底处理
+        return dict(DEFAULT_OPTIONS)
+
+
+class ArchiveCheckpoint(peewee.Model):
+    """各表本轮归档处理到的主键，与被归档的表放在同一个库（处理时绑定）"""
+    table_name = peewee.CharField(max_length=128, primary_key=True)
+    last_id = peewee.BigIntegerField(default=0)
+    max_id = peewee.BigIntegerField(default=0)
+    updated_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'archive_checkpoints'
+
+
+_archive_models: Dict[type, type] = {}
+
+
+def archive_model(model: type) -> type:
+    """
+    model 对应的归档表模型（按模型缓存）：同样的列、主键不自增、不带二级索引，另加 archived_at。
+
+    不继承 model，不会出现在 iter_models() 中
+    """
+    cls = _archive_models.get(model)
+    if cls is not None:
+        return cls
+
+    attrs: Dict[str, Any] = {}
+    for field in model._meta.sorted_fields:
+        if field.primary_key:
+            attrs[field.name] = peewee.BigIntegerField(primary_key=True, column_name=field.column_name)
+            continue
+        clone = copy.deepcopy(field)
+        clone.index = clone.unique = False
+        attrs[field.name] = clone
+    attrs['archived_at'] = peewee.DateTimeField(null=True)
+    attrs['Meta'] = type('Meta', (object,), dict(
+        database=model._meta.database,
+        table_name=model._meta.table_name + ARCHIVE_SUFFIX,
+        indexes=(),
+    ))
+    cls = _archive_models[model] = type(model.__name__ + 'Archive', (peewee.Model,), attrs)
+    return cls
+
+
+def sync_archive_table(model: type) -> List[str]:
+    """创建归档表，或给已有的归档表补上模型中新增的列（允许为空），返回补上的列名"""
+    archive = archive_model(model)
+    database = model._meta.database
+    table = archive._meta.table_name
+    if not database.table_exists(table):
+        database.create_tables([archive])
+        return []
+
+    existing = {column.name for column in database.get_columns(table)}
+    missing = [field for field in archive._meta.sorted_fields if field.column_name not in existing]
+    if not missing:
+        return []
+    migrator = SchemaMigrator.from_database(_unwrap_database(database))
+    operations = []
+    for field in missing:
+        clone = copy.deepcopy(field)
+        clone.null = True
+        clone.default = None
+        operations.append(migrator.add_column(table, field.column_name, clone))
+    run_migrations(*operations)
+    added = [field.column_name for field in missing]
+    logger.info('added columns %s to %s', ', '.join(added), table)
+    return added
+
+
+class Archiver(object):
+    """
+    按主键区间分批归档软删除的行。
+
+    Args:
+        models: 要处理的模型，需有自增整数主键与 delete_at 字段
+        retain_days: 删除超过多少天的行才归档
+        batch_size: 每批的主键区间大小
+        pause: 批次之间暂停的秒数
+        stop_event: 设置后在当前批次结束时停止（检查点已保存，下次从此处继续）
+    """
+
+    def __init__(
+        self,
+        models: Iterable[type],
+        retain_days: int = 90,
+        batch_size: int = 1000,
+        pause: float = 0.2,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        self.models = list(models)
+        self.retain_days = retain_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.stop_event = stop_event or threading.Event()
+
+    def _condition(self, model: type, cutoff: datetime.datetime) -> Any:
+        return model.delete_at.is_null(False) & (model.delete_at < cutoff)
+
+    def pending(self, model: type) -> int:
+        """可归档的行数（会扫描整表，只用于 --dry-run）"""
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=self.retain_days)
+        return model.select().where(self._condition(model, cutoff)).count()
+
+    def archive_table(self, model: type) -> int:
+        """从检查点继续处理一张表，返回本次归档的行数；被 stop_event 打断时检查点停在最后完成的批次"""
+        database = model._meta.database
+        table = model._meta.table_name
+        pk = model._meta.primary_key
+        archive = archive_model(model)
+        labels = format_labels(table=table)
+
+        known = {field.column_name for field in model._meta.sorted_fields}
+        unknown = sorted(column.name for column in database.get_columns(table) if column.name not in known)
+        if unknown:
+            logger.warning('skip archiving %s: columns %s are not declared on the model, restart the archiver',
+                           table, ', '.join(unknown))
+            return 0
+
+        with database.bind_ctx([ArchiveCheckpoint]):
+            database.create_tables([ArchiveCheckpoint], safe=True)
+            sync_archive_table(model)
+            checkpoint = ArchiveCheckpoint.get_or_none(ArchiveCheckpoint.table_name == table)
+            if checkpoint is None or checkpoint.last_id >= checkpoint.max_id:
+                # 新的一轮：处理到本轮开始时的最大主键，之后插入的行留给下一轮
+                last_id = 0
+                max_id = model.select(peewee.fn.MAX(pk)).scalar() or 0
+            else:
+                last_id, max_id = checkpoint.last_id, checkpoint.max_id
+            _progress[table] = dict(_progress.get(table, {}), checkpoint=last_id, max_id=max_id)
+
+            cutoff = datetime.datetime.now() - datetime.timedelta(days=self.retain_days)
+            condition = self._condition(model, cutoff)
+            src_fields = [getattr(model, field.name) for field in model._meta.sorted_fields]
+            dst_fields = [getattr(archive, field.name) for field in model._meta.sorted_fields]
+            dst_fields.append(archive.archived_at)
+
+            archived = 0
+            while last_id < max_id and not self.stop_event.is_set():
+                end = min(last_id + self.batch_size, max_id)
+                cond = (pk > last_id) & (pk <= end) & condition
+                started = time.perf_counter()
+                with database.atomic():
+                    query = model.select(*src_fields + [peewee.Value(datetime.datetime.now())]).where(cond)
+                    archive.insert_from(query, dst_fields).execute()
+                    moved = model.delete().where(cond).execute()
+                    ArchiveCheckpoint.insert(
+                        table_name=table, last_id=end, max_id=max_id,
+                        updated_at=datetime.datetime.now()).on_conflict_replace().execute()
+                batch_seconds.observe(time.perf_counter() - started, labels)
+                batches_total.inc(labels)
+                if moved:
+                    rows_total.inc(labels, moved)
+                archived += moved
+                last_id = end
+                _progress[table]['checkpoint'] = last_id
+                metrics.maybe_flush()
+                if last_id < max_id:
+                    self.stop_event.wait(self.pause)
+
+            if last_id >= max_id:
+                _progress[table]['last_pass'] = time.time()
+                logger.info('archive pass on %s finished, %d rows archived', table, archived)
+        return archived
+
+    def run_once(self) -> Dict[str, int]:
+        """依次处理全部表，返回 {表名: 归档行数}；单表出错不影响其他表"""
+        result = {}
+        for model in self.models:
+            if self.stop_event.is_set():
+                break
+            try:
+                result[model._meta.table_name] = self.archive_table(model)
+            except peewee.DatabaseError:
+                logger.exception('archive %s failed', model._meta.table_name)
+        return result
+
+    def run_forever(self, interval: float = 3600) -> None:
+        """每 interval 秒处理一轮，直到 stop_event 被设置"""
+        while not self.stop_event.is_set():
+            self.run_once()
+            metrics.flush()
+            self.stop_event.wait(interval)
+
+
+def _collect_progress():
+    yield ('archive_checkpoint_id', 'gauge', '本轮归档处理到的主键',
+           [({'table': table}, p['checkpoint']) for table, p in _progress.items() if 'checkpoint' in p])
+    yield ('archive_max_id', 'gauge', '本轮归档要处理到的最大主键',
+           [({'table': table}, p['max_id']) for table, p in _progress.items() if 'max_id' in p])
+    yield ('archive_last_pass_timestamp', 'gauge', '最近一轮归档完成的时间（unix 时间戳）',
+           [({'table': table}, p['last_pass']) for table, p in _progress.items() if 'last_pass' in p])
+
+
+metrics.register_collector(_collect_progress)
+
+
+def _select_models(tables: Optional[List[str]]) -> List[type]:
+    from app.models import iter_models
+
+    models = [model for model in iter_models()
+              if isinstance(model._meta.primary_key, peewee.AutoField)]
+    if tables:
+        unknown = set(tables) - {model._meta.table_name for model in models}
+        if unknown:
+            raise SystemExit('unknown tables: %s' % ', '.join(sorted(unknown)))
+        models = [model for model in models if model._meta.table_name in tables]
+    return models
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options()
+    parser = argparse.ArgumentParser(prog='python -m app.utils.archiver', description='归档软删除的行')
+    parser.add_argument('--table', action='append', dest='tables', help='只处理指定的表，可重复')
+    parser.add_argument('--retain-days', type=int, default=options['retain_days'])
+    parser.add_argument('--batch-size', type=int, default=options['batch_size'])
+    parser.add_argument('--pause', type=float, default=options['pause'])
+    parser.add_argument('--loop', action='store_true', help='常驻，每 interval 秒处理一轮')
+    parser.add_argument('--interval', type=float, default=options['interval'])
+    parser.add_argument('--dry-run', action='store_true', help='只统计可归档的行数')
+    args = parser.parse_args(argv)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    archiver = Archiver(_select_models(args.tables or options['tables']), retain_days=args.retain_days,
+                        batch_size=args.batch_size, pause=args.pause, stop_event=stop_event)
+    if args.dry_run:
+        for model in archiver.models:
+            print('%s: %d rows to archive' % (model._meta.table_name, archiver.pending(model)))
+    elif args.loop:
+        archiver.run_forever(args.interval)
+    else:
+        for table, count in archiver.run_once().items():
+            print('%s: archived %d rows' % (table, count))
+        metrics.flush()
+
+
+__all__ = [
+    'ARCHIVE_SUFFIX',
+    'ArchiveCheckpoint',
+    'Archiver',
+    'archive_model',
+    'get_options',
+    'sync_archive_table',
+]
+
+
+if __name__ == '__main__':
+    main()
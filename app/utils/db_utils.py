@@ -8,16 +8,33 @@
 - 对外提供简洁的获取数据库实例的接口，而不是到处手工 new Database
 - 支持 mysql / sqlite，两种引擎的创建方式与原来的 DbCfg 基本保持一致
 - 默认使用 peewee3 及以上版本的连接池实现
+- 数据库实例按需创建：模型可以先绑定 db_manager.proxy(name)，第一次使用时才创建实例，
+  连接在第一次执行 SQL 时才从连接池取出；Flask 只注册一个 teardown 钩子，
+  请求结束时只归还本线程实际打开过的连接
+- fork 安全：fork 出的子进程（如 gunicorn --preload 的 worker）丢弃从父进程继承的连接与锁，
+  重新建立自己的连接（见 app/utils/fork_utils.py）
 """
 
 from __future__ import annotations
 
+import itertools
 import logging
-from typing import Any, Dict, Optional
+import os
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional
 
 import peewee
 from playhouse import pool # type: ignore[import]
 from playhouse.sqlite_ext import SqliteExtDatabase # type: ignore[import]
+from flask import g, has_request_context
+
+from app.utils.fork_utils import after_fork, register_after_fork
+from app.utils.metric_utils import format_labels, metrics
+from app.utils.sql_profiler import get_options as get_profiler_options, profiled_class
 
 try:
     # 优先使用项目内的配置
@@ -28,6 +45,266 @@ except Exception:  # pragma: no cover - 兜底处理
 logger = logging.getLogger(__name__)
 
 
+# -----------------------------
+# 连接池指标
+# -----------------------------
+
+# 取连接耗时分桶（秒），池中有空闲连接时通常在 1ms 以内
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+pool_checkout_seconds = metrics.histogram(
+    'db_pool_checkout_seconds', '从连接池取连接的耗时（秒，含等待与新建连接）', buckets=CHECKOUT_BUCKETS)
+pool_timeouts_total = metrics.counter('db_pool_timeouts_total', '连接池已满且等待超时的次数')
+pool_stale_recycles_total = metrics.counter('db_pool_stale_recycles_total', '超过 stale_timeout 被回收的连接数')
+
+# 已创建的连接池，供指标采集
+_pools: "weakref.WeakSet[PoolMetricsMixin]" = weakref.WeakSet()
+
+
+class PoolMetricsMixin(object):
+    """
+    为 peewee 连接池记录指标：取连接耗时、等待超时次数、过期连接回收数，
+    以及采集时的使用中 / 空闲连接数（见 _collect_pools）。
+    """
+
+    pool_name = ""
+
+    def set_pool_name(self, name: str) -> None:
+        self.pool_name = name
+        self._pool_labels = format_labels(db=name)
+        _pools.add(self)
+
+    def connect(self, reuse_if_open: bool = False) -> Any:
+        if not self.pool_name:
+            return super(PoolMetricsMixin, self).connect(reuse_if_open)
+        started = time.perf_counter()
+        try:
+            result = super(PoolMetricsMixin, self).connect(reuse_if_open)
+        except pool.MaxConnectionsExceeded:
+            pool_timeouts_total.inc(self._pool_labels)
+            raise
+        pool_checkout_seconds.observe(time.perf_counter() - started, self._pool_labels)
+        return result
+
+    def _is_stale(self, timestamp: float) -> bool:
+        # 取出与归还连接时都会检查，返回 True 的连接随即被关闭
+        stale = super(PoolMetricsMixin, self)._is_stale(timestamp)
+        if stale and self.pool_name:
+            pool_stale_recycles_total.inc(self._pool_labels)
+        return stale
+
+
+class InstrumentedPooledMySQLDatabase(PoolMetricsMixin, pool.PooledMySQLDatabase):
+    """带指标的 MySQL 连接池"""
+
+
+def _collect_pools():
+    pools = [p for p in list(_pools) if p.pool_name]
+    yield ('db_pool_in_use', 'gauge', '连接池使用中的连接数',
+           [({'db': p.pool_name}, len(p._in_use)) for p in pools])
+    yield ('db_pool_idle', 'gauge', '连接池空闲连接数',
+           [({'db': p.pool_name}, len(p._connections)) for p in pools])
+    yield ('db_pool_max_connections', 'gauge', '连接池最大连接数',
+           [({'db': p.pool_name}, p._max_connections or 0) for p in pools])
+
+
+metrics.register_collector(_collect_pools)
+
+
+# -----------------------------
+# 读写分离
+# -----------------------------
+
+REPLICA_ROUND_ROBIN = "round_robin"
+REPLICA_LEAST_CONNECTIONS = "least_connections"
+
+_READ_SQL = re.compile(r"^\s*(\(?\s*SELECT|EXPLAIN|DESCRIBE|SHOW)\b", re.I)
+# 只影响当前会话、不修改数据的语句：在主库执行，但不触发读己之写
+_SESSION_SQL = re.compile(r"^\s*SET\b", re.I)
+_LOCKING_READ = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.I)
+
+replica_reads_total = metrics.counter('db_replica_reads_total', '路由到从库执行的查询数')
+replica_failures_total = metrics.counter('db_replica_failures_total', '从库不可用、回退到主库的次数')
+
+
+# 说明连接本身不可用的 MySQL 错误码：连接失败 / 连接断开 / 连接数已满 / 服务正在关闭
+CONNECTION_ERRNOS = frozenset((1040, 1053, 2002, 2003, 2006, 2013, 2055))
+
+
+def is_read_sql(sql: str) -> bool:
+    """是否为可以在从库执行的只读语句（SELECT / EXPLAIN / SHOW，不含 SELECT ... FOR UPDATE 等加锁读）"""
+    return bool(_READ_SQL.match(sql)) and not _LOCKING_READ.search(sql)
+
+
+def is_connection_error(exc: Exception) -> bool:
+    """异常是否说明数据库连接不可用（而不是语句本身出错，如语法错误、锁等待超时）"""
+    if isinstance(exc, peewee.InterfaceError):
+        return True
+    if not isinstance(exc, peewee.OperationalError):
+        return False
+    args = getattr(getattr(exc, 'orig', None), 'args', None) or exc.args
+    return bool(args) and args[0] in CONNECTION_ERRNOS
+
+
+class ReplicaRoutingMixin(object):
+    """
+    主库实例上的读写分离：
+
+    - 事务外的 SELECT 发往健康的从库（轮询或最少连接）
+    - 写语句、事务内的语句、加锁读都在主库执行
+    - 读己之写：当前请求（非请求上下文中为当前线程 read_your_writes_seconds 秒内）
+      在主库写过之后，后续读也留在主库
+    - 从库连接失败（InterfaceError 或连接类错误码）时在 cooldown 秒内不再使用该从库，本次查询回退到主库；
+      语句本身的错误直接抛出
+    - SET 等会话语句在主库执行，不触发读己之写
+    """
+
+    replicas: list = []
+
+    def set_replicas(
+        self,
+        replicas: Iterable[peewee.Database],
+        strategy: str = REPLICA_ROUND_ROBIN,
+        cooldown: float = 30.0,
+        read_your_writes_seconds: float = 5.0,
+    ) -> None:
+        if strategy not in (REPLICA_ROUND_ROBIN, REPLICA_LEAST_CONNECTIONS):
+            raise ValueError('Unknown replica strategy "%s"' % strategy)
+        self.replicas = list(replicas)
+        self.replica_strategy = strategy
+        self.replica_cooldown = cooldown
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._replica_down_until = [0.0] * len(self.replicas)
+        self._replica_rr = itertools.count()
+        self._write_pin = threading.local()
+
+    # ---- 读己之写 ----
+
+    def _pin_key(self) -> str:
+        return self.pool_name or str(id(self))
+
+    def _is_pinned(self) -> bool:
+        if has_request_context():
+            return self._pin_key() in g.get('_db_write_pins', ())
+        return getattr(self._write_pin, 'until', 0.0) > time.monotonic()
+
+    def is_pinned_to_primary(self) -> bool:
+        """当前请求（或线程）写过主库、后续读固定在主库；未配置从库时为 False"""
+        return bool(self.replicas) and self._is_pinned()
+
+    def _pin_to_primary(self) -> None:
+        if has_request_context():
+            pins = g.get('_db_write_pins')
+            if pins is None:
+                pins = g._db_write_pins = set()
+            pins.add(self._pin_key())
+        else:
+            self._write_pin.until = time.monotonic() + self.read_your_writes_seconds
+
+    # ---- 从库选择 ----
+
+    def _choose_replica(self) -> Optional[Any]:
+        now = time.monotonic()
+        healthy = [(i, r) for i, r in enumerate(self.replicas) if self._replica_down_until[i] <= now]
+        if not healthy:
+            return None
+        if self.replica_strategy == REPLICA_LEAST_CONNECTIONS:
+            return min(healthy, key=lambda item: len(getattr(item[1], '_in_use', ())))
+        return healthy[next(self._replica_rr) % len(healthy)]
+
+    def _mark_replica_down(self, index: int, exc: Exception) -> None:
+        replica = self.replicas[index]
+        self._replica_down_until[index] = time.monotonic() + self.replica_cooldown
+        replica_failures_total.inc(format_labels(db=self.pool_name))
+        logger.warning('replica %s of %s unavailable for %ss: %s',
+                       index, self.pool_name, self.replica_cooldown, exc)
+        # 丢弃出错的连接，不放回连接池
+        try:
+            if isinstance(replica, pool.PooledDatabase):
+                replica.manual_close()
+            elif not replica.is_closed():
+                replica.close()
+        except Exception:  # pragma: no cover - 连接已损坏
+            pass
+
+    def execute_sql(self, sql: str, params: Any = None, *args: Any, **kwargs: Any) -> Any:
+        if self.replicas:
+            if not is_read_sql(sql):
+                if not _SESSION_SQL.match(sql):
+                    self._pin_to_primary()
+            elif not self.in_transaction() and not self._is_pinned():
+                chosen = self._choose_replica()
+                if chosen is not None:
+                    index, replica = chosen
+                    try:
+                        cursor = replica.execute_sql(sql, params)
+                    except (peewee.OperationalError, peewee.InterfaceError) as exc:
+                        if not is_connection_error(exc):
+                            raise
+                        # 只读语句可以安全地在主库重试
+                        self._mark_replica_down(index, exc)
+                    else:
+                        replica_reads_total.inc(format_labels(db=self.pool_name))
+                        return cursor
+        return super(ReplicaRoutingMixin, self).execute_sql(sql, params, *args, **kwargs)
+
+
+class RoutedPooledMySQLDatabase(ReplicaRoutingMixin, InstrumentedPooledMySQLDatabase):
+    """配置了从库的 MySQL 主库连接池"""
+
+
+# -----------------------------
+# fork 安全
+# -----------------------------
+
+# DbCfg 创建的全部数据库实例（含从库）与 DatabaseManager 实例，fork 后在子进程中重置
+_databases: "weakref.WeakSet[peewee.Database]" = weakref.WeakSet()
+_managers: "weakref.WeakSet[DatabaseManager]" = weakref.WeakSet()
+
+# ping_all 共用的线程池：健康检查被频繁调用，不为每次检查新建线程
+PING_WORKERS = 16
+_ping_executor: Optional[ThreadPoolExecutor] = None
+_ping_executor_lock = threading.Lock()
+
+
+def _get_ping_executor() -> ThreadPoolExecutor:
+    global _ping_executor
+    if _ping_executor is None:
+        with _ping_executor_lock:
+            if _ping_executor is None:
+                _ping_executor = ThreadPoolExecutor(max_workers=PING_WORKERS, thread_name_prefix="db-ping")
+    return _ping_executor
+
+
+def reset_database_state(db: peewee.Database) -> None:
+    """
+    丢弃数据库实例上从父进程继承的连接与锁。
+
+    不能关闭这些连接：socket 与父进程共享，关闭时发送的 COM_QUIT 会断开父进程的连接。
+    """
+    db._state = peewee._ConnectionLocal() if db.thread_safe else peewee._ConnectionState()
+    if db.thread_safe:
+        db._lock = threading.Lock()
+    if isinstance(db, pool.PooledDatabase):
+        db._pool_lock = threading.RLock()
+        db._connections = []
+        db._in_use = {}
+
+
+@register_after_fork
+def _reset_after_fork() -> None:
+    for db in list(_databases):
+        reset_database_state(db)
+    for manager in list(_managers):
+        manager._lock = threading.Lock()
+        manager._pid = os.getpid()
+        manager._pings = {}
+    # 子进程中没有父进程线程池的线程，下次使用时重新创建
+    global _ping_executor, _ping_executor_lock
+    _ping_executor = None
+    _ping_executor_lock = threading.Lock()
+
+
 class DbCfg(object):
     """
     单个数据库配置的封装。
@@ -62,26 +339,66 @@ class DbCfg(object):
             "register_db_close", None
         )
 
+        # 从库：每项覆盖主库的连接参数（host / port / user / password，可选 database、pool）
+        self.replicas: List[Dict[str, Any]] = list(db_cfg.get("replicas") or [])
+        self.replica_strategy: str = db_cfg.get("replica_strategy", REPLICA_ROUND_ROBIN)
+        self.replica_cooldown: float = db_cfg.get("replica_cooldown", 30)
+        self.read_your_writes_seconds: float = db_cfg.get("read_your_writes_seconds", 5)
+
+        # SQL 耗时分析：未配置时取 config.SQL_PROFILER['enabled']
+        self.profile: Optional[bool] = db_cfg.get("profile", None)
+
+    def _create_replica(self, index: int, replica_cfg: Dict[str, Any]) -> peewee.Database:
+        replica_cfg = dict(replica_cfg)
+        database = replica_cfg.pop("database", self.database)
+        params = dict(self.params)
+        params.update(replica_cfg.pop("pool", {}))
+        params.update(replica_cfg.pop("params", {}))
+        params.update(replica_cfg)
+        replica = InstrumentedPooledMySQLDatabase(database, **params)
+        replica.set_pool_name("%s.replica%d" % (self.name, index))
+        _databases.add(replica)
+        return replica
+
     def _create_db(self, enable_pool_proxy: bool = False) -> peewee.Database:
         """
         真正创建 peewee.Database 实例的地方。
         """
+        options = get_profiler_options()
+        profile = options["enabled"] if self.profile is None else self.profile
+
         if self.engine == "mysql":
-            # peewee3 及以上的连接池实现
-            db_cls: Any = pool.PooledMySQLDatabase
+            # peewee3 及以上的连接池实现，附带连接池指标
+            db_cls: Any = RoutedPooledMySQLDatabase if self.replicas else InstrumentedPooledMySQLDatabase
+            if profile:
+                db_cls = profiled_class(db_cls)
             db = db_cls(self.database, **self.params)
+            db.set_pool_name(self.name)
+            if self.replicas:
+                db.set_replicas(
+                    [self._create_replica(i, cfg) for i, cfg in enumerate(self.replicas)],
+                    strategy=self.replica_strategy,
+                    cooldown=self.replica_cooldown,
+                    read_your_writes_seconds=self.read_your_writes_seconds,
+                )
             if self.register_db_close is None:
                 self.register_db_close = True
         elif self.engine == "sqlite":
             params = self.params.copy()
             ext = bool(params.pop("ext", None))
             db_cls = SqliteExtDatabase if ext else peewee.SqliteDatabase
+            if profile:
+                db_cls = profiled_class(db_cls)
             db = db_cls(self.database, **params)
             if self.register_db_close is None:
                 self.register_db_close = False
         else:
             raise Exception('Unknown engine "%s"' % self.engine)
 
+        if profile:
+            # 从库的语句经主库实例路由，只在主库实例上记录一次
+            db.set_profile_name(self.name, options)
+        _databases.add(db)
         return db
 
     def init_db(
@@ -102,18 +419,83 @@ class DbCfg(object):
         return db
 
 
+# 禁止执行阻塞查询的线程（共享事件循环线程，见 app/_webapi/aio.py）
+_event_loop_threads: set = set()
+
+# 会取连接或执行 SQL 的属性，在事件循环线程中访问时报错
+_QUERY_ATTRS = frozenset((
+    "execute", "execute_sql", "cursor", "connection", "connect",
+    "atomic", "transaction", "savepoint", "manual_commit",
+))
+
+
+def mark_event_loop_thread(ident: Optional[int] = None) -> None:
+    """
+    登记事件循环线程：该线程中的 peewee 查询报错而不是执行。
+
+    事件循环线程上的所有协程共用一个线程级连接，阻塞查询会卡住整个循环，
+    连接也不会被请求的 teardown 归还；协程中应使用 app._webapi.aio.run_sync 或 db_manager.aio()
+    """
+    _event_loop_threads.add(threading.get_ident() if ident is None else ident)
+
+
+def check_not_event_loop_thread() -> None:
+    if threading.get_ident() in _event_loop_threads:
+        raise RuntimeError(
+            "blocking peewee query on the event loop thread; "
+            "use `await run_sync(...)` (app._webapi.aio) or db_manager.aio() in async views")
+
+
+class LazyDatabase(peewee.DatabaseProxy):
+    """
+    按需创建的数据库代理，可直接作为模型的 Meta.database。
+
+    第一次访问数据库属性（执行 SQL、开启事务等）时才通过 DatabaseManager 创建实例。
+    """
+
+    __slots__ = ("obj", "_callbacks", "_Model", "_name", "_manager")
+
+    def __init__(self, name: str, manager: "DatabaseManager") -> None:
+        super(LazyDatabase, self).__init__()
+        self._name = name
+        self._manager = manager
+
+    def _resolve(self) -> peewee.Database:
+        if self.obj is None:
+            self.initialize(self._manager.get(self._name))
+        return self.obj
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if attr in _QUERY_ATTRS and _event_loop_threads:
+            check_not_event_loop_thread()
+        return getattr(self._resolve(), attr)
+
+    def __enter__(self) -> Any:
+        return self._resolve().__enter__()
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._resolve().__exit__(*exc_info)
+
+    def __repr__(self) -> str:
+        return "<LazyDatabase %s%s>" % (self._name, "" if self.obj is None else " (initialized)")
+
+
 class DatabaseManager(object):
     """
     管理多个命名数据库连接的高层工具。
 
     一般用法：
 
-        from app.utils.db_tool import db_manager
+        from app.utils.db_utils import db_manager
 
-        db = db_manager.get('zj3')
+        db = db_manager.proxy('zj3')        # 不会立即创建数据库实例
         class MyModel(peewee.Model):
             class Meta:
                 database = db
+
+        db_manager.init_app(app)            # 注册统一的 teardown 钩子
     """
 
     def __init__(self, db_cfgs: Optional[Dict[str, Dict[str, Any]]] = None):
@@ -122,6 +504,22 @@ class DatabaseManager(object):
             name: DbCfg(name, db_cfgs) for name in db_cfgs
         }
         self._db_instances: Dict[str, peewee.Database] = {}
+        self._aio_instances: Dict[str, Any] = {}
+        self._proxies: Dict[str, LazyDatabase] = {}
+        self._lock = threading.Lock()
+        self._apps: set = set()
+        self._pid = os.getpid()
+        # 进行中的 ping，上一次还没结束的库不重复提交，卡住的库最多占用一个线程
+        self._pings: Dict[str, Any] = {}
+        _managers.add(self)
+
+    def register(self, name: str, db_cfg: Dict[str, Any], replace: bool = False) -> None:
+        """
+        登记一个数据库配置；默认不覆盖 config.DATABASES 中已有的同名配置。
+        """
+        with self._lock:
+            if replace or name not in self._cfgs:
+                self._cfgs[name] = DbCfg(name, {name: db_cfg})
 
     def get(
         self,
@@ -131,62 +529,209 @@ class DatabaseManager(object):
     ) -> peewee.Database:
         """
         获取（或创建并缓存）指定名称的数据库。
-        """
-        if name not in self._cfgs:
-            raise KeyError('Unknown database config name "%s"' % name)
 
+        实例创建后一直复用：连接池数据库在当前线程没有连接时 is_closed() 也为 True，
+        不能据此重新创建，否则每次都会新建一个连接池。
+        """
+        if self._pid != os.getpid():
+            # 兜底：没有经过 os.register_at_fork 的 fork（或钩子尚未执行）
+            after_fork()
         db = self._db_instances.get(name)
-        if db is None or db.is_closed():
-            logger.debug("init database %s", name)
-            cfg = self._cfgs[name]
-            db = cfg.init_db(app=app, enable_pool_proxy=enable_pool_proxy)
-            self._db_instances[name] = db
-
+        if db is None:
+            with self._lock:
+                db = self._db_instances.get(name)
+                if db is None:
+                    if name not in self._cfgs:
+                        raise KeyError('Unknown database config name "%s"' % name)
+                    logger.debug("init database %s", name)
+                    db = self._cfgs[name].init_db(enable_pool_proxy=enable_pool_proxy)
+                    self._db_instances[name] = db
+
+        if app is not None:
+            self.init_app(app)
         return db
 
-    def close(self, name: Optional[str] = None) -> None:
+    def proxy(self, name: str) -> LazyDatabase:
         """
-        关闭指定数据库，或在 name 为空时关闭全部已经创建的数据库。
+        获取指定名称数据库的按需代理，同名返回同一个代理。
         """
-        if name is None:
-            for n, db in list(self._db_instances.items()):
-                if not db.is_closed():
-                    db.close()
-                self._db_instances.pop(n, None)
+        with self._lock:
+            proxy = self._proxies.get(name)
+            if proxy is None:
+                proxy = self._proxies[name] = LazyDatabase(name, self)
+                db = self._db_instances.get(name)
+                if db is not None:
+                    proxy.initialize(db)
+            return proxy
+
+    def aio(self, name: str) -> Any:
+        """
+        获取指定名称 MySQL 库的 asyncio 访问对象（app.utils.aio_db.AsyncDatabase），
+        使用同名配置的连接参数与连接池大小，需要安装 aiomysql。从库配置不参与，查询都在主库执行。
+        """
+        adb = self._aio_instances.get(name)
+        if adb is None:
+            from app.utils.aio_db import AsyncDatabase
+
+            with self._lock:
+                adb = self._aio_instances.get(name)
+                if adb is None:
+                    if name not in self._cfgs:
+                        raise KeyError('Unknown database config name "%s"' % name)
+                    cfg = self._cfgs[name]
+                    if cfg.engine != "mysql":
+                        raise ValueError('async access only supports mysql, got "%s"' % cfg.engine)
+                    adb = self._aio_instances[name] = AsyncDatabase(name, cfg.database, cfg.params)
+        return adb
+
+    def has_aio(self) -> bool:
+        """是否已经通过 aio() 创建过 asyncio 访问对象"""
+        return bool(self._aio_instances)
+
+    def init_app(self, app: Any) -> None:
+        """
+        为 Flask 应用（或蓝图）注册一个统一的 teardown 钩子，重复调用只注册一次。
+        """
+        if id(app) in self._apps:
             return
+        self._apps.add(id(app))
+        app.teardown_request(self.close_connections)
 
-        db = self._db_instances.get(name)
-        if db and not db.is_closed():
-            db.close()
-        self._db_instances.pop(name, None)
+    def close_connections(self, _exc: Any = None) -> None:
+        """
+        归还当前线程打开过的连接；未创建或本线程未使用的数据库不做任何操作。
+        """
+        for name, db in list(self._db_instances.items()):
+            if not self._cfgs[name].register_db_close:
+                continue
+            for d in [db] + list(getattr(db, "replicas", ())):
+                if not d.is_closed():
+                    d.close()
+
+    def close(self, name: Optional[str] = None) -> None:
+        """
+        关闭指定数据库，或在 name 为空时关闭全部已经创建的数据库。
+
+        连接池数据库会同时关闭池中的全部连接；实例保留（模型与代理仍然绑定它），
+        之后再使用时自动重新连接。
+        """
+        names = list(self._db_instances) if name is None else [name]
+        for n in names:
+            db = self._db_instances.get(n)
+            if db is None:
+                continue
+            for d in [db] + list(getattr(db, "replicas", ())):
+                if not d.is_closed():
+                    d.close()
+                if isinstance(d, pool.PooledDatabase):
+                    d.close_all()
+
+    def _check(self, name: str) -> None:
+        db = self.get(name)
+        # 大多数 MySQL 驱动都支持底层 conn.ping()
+        conn = db.connection()
+        if hasattr(conn, "ping"):
+            conn.ping(reconnect=True)  # type: ignore[arg-type]
+        else:
+            # 对不支持 ping 的情况做一次无害查询
+            db.execute_sql("SELECT 1")
 
     def ping(self, name: str) -> bool:
         """
         尝试对指定数据库执行一次 ping，用于健康检查。
         """
-        db = self.get(name)
         try:
-            # 大多数 MySQL 驱动都支持底层 conn.ping()
-            conn = db.get_conn()
-            if hasattr(conn, "ping"):
-                conn.ping(reconnect=True)  # type: ignore[arg-type]
-            else:
-                # 对不支持 ping 的情况做一次无害查询
-                db.execute_sql("SELECT 1")
+            self._check(name)
         except Exception as exc:  # pragma: no cover - 主要用于运行时诊断
             logger.warning("ping database %s failed: %s", name, exc)
             return False
         return True
 
+    def _ping_in_thread(self, name: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            self._check(name)
+            result: Dict[str, Any] = {"ok": True}
+        except Exception as exc:
+            logger.warning("ping database %s failed: %s", name, exc)
+            result = {"ok": False, "error": str(exc)}
+        finally:
+            # 连接是线程独享的，在线程结束前归还连接池
+            db = self._db_instances.get(name)
+            if db is not None and not db.is_closed():
+                db.close()
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def ping_all(
+        self, names: Optional[Iterable[str]] = None, timeout: float = 2.0
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        并发 ping 多个数据库（默认全部已配置的库），每个库最多等待 timeout 秒。
+
+        Returns:
+            {库名: {"ok": bool, "latency_ms": float, "error": str（失败时）}}
+        """
+        names = list(names) if names is not None else sorted(self._cfgs)
+        if not names:
+            return {}
+
+        executor = _get_ping_executor()
+        futures = {}
+        with self._lock:
+            for name in names:
+                future = self._pings.get(name)
+                if future is None or future.done():
+                    future = self._pings[name] = executor.submit(self._ping_in_thread, name)
+                futures[name] = future
+        # 不等待卡住的 ping，超时的任务在后台线程中自行结束
+        wait(futures.values(), timeout=timeout)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, future in futures.items():
+            if not future.done():
+                results[name] = {"ok": False, "error": "timeout after %ss" % timeout}
+            else:
+                results[name] = future.result()
+        return results
+
+    async def aio_ping_all(self, timeout: float = 2.0) -> Dict[str, Dict[str, Any]]:
+        """
+        并发 ping 已创建的异步连接池（见 aio()），需在连接池所在的事件循环中调用。
+
+        Returns:
+            {库名: {"ok": bool, "latency_ms": float, "error": str（失败时）}}
+        """
+        import asyncio
+
+        async def _ping(adb: Any) -> Dict[str, Any]:
+            try:
+                return await asyncio.wait_for(adb.ping(), timeout)
+            except asyncio.TimeoutError:
+                return {"ok": False, "error": "timeout after %ss" % timeout}
+
+        names = sorted(self._aio_instances)
+        results = await asyncio.gather(*[_ping(self._aio_instances[n]) for n in names])
+        return dict(zip(names, results))
+
 
 # 默认导出的全局实例，方便简单项目直接使用
 db_manager = DatabaseManager()
 
 
 __all__ = [
+    "CONNECTION_ERRNOS",
     "DbCfg",
     "DatabaseManager",
+    "InstrumentedPooledMySQLDatabase",
+    "LazyDatabase",
+    "PoolMetricsMixin",
+    "ReplicaRoutingMixin",
+    "RoutedPooledMySQLDatabase",
+    "is_connection_error",
+    "is_read_sql",
+    "check_not_event_loop_thread",
     "db_manager",
+    "mark_event_loop_thread",
+    "reset_database_state",
 ]
-
-
@@ -0,0 +1,67 @@
+# coding: utf-8
+
+"""
+fork 安全：子进程中重置从父进程继承来的进程级状态。
+
+gunicorn --preload 时应用在 master 中导入，worker 由 master fork 而来，
+连接池中的 socket、后台事件循环线程、指标分片、各种锁都会原样复制到每个 worker：
+
+- 连接池：多个进程共用同一条 MySQL 连接会导致协议错乱，子进程必须丢弃（而不是关闭）继承来的连接
+- 线程：fork 只复制调用 fork 的线程，事件循环线程在子进程中不存在
+- 锁：fork 时被其他线程持有的锁在子进程中永远不会释放
+
+各模块通过 register_after_fork 登记重置函数，os.register_at_fork 在子进程中自动调用；
+gunicorn 的 post_fork 钩子中也可以显式调用 after_fork()（见 conf/gunicorn.conf.py），
+同一进程内只执行一次。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_callbacks: List[Callable[[], None]] = []
+_lock = threading.Lock()
+_last_pid = os.getpid()
+
+
+def register_after_fork(callback: Callable[[], None]) -> Callable[[], None]:
+    """登记子进程中执行的重置函数，可作为装饰器使用；按登记顺序执行"""
+    _callbacks.append(callback)
+    return callback
+
+
+def after_fork() -> None:
+    """
+    在 fork 出的子进程中重置进程级状态；非子进程或已经执行过时不做任何事。
+    """
+    global _last_pid, _lock
+    pid = os.getpid()
+    if pid == _last_pid:
+        return
+    # 父进程 fork 时可能正持有该锁，子进程中直接换一把新锁
+    _lock = threading.Lock()
+    with _lock:
+        if pid == _last_pid:
+            return
+        _last_pid = pid
+        for callback in list(_callbacks):
+            try:
+                callback()
+            except Exception:  # pragma: no cover - 单个模块重置失败不影响其他模块
+                logger.exception('after fork callback %r failed', callback)
+    logger.debug('reset process state after fork in pid %s', pid)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=after_fork)
+
+
+__all__ = [
+    'after_fork',
+    'register_after_fork',
+]
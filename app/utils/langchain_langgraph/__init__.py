@@ -3,9 +3,32 @@
 LangChain 和 LangGraph 复杂案例实现
 
 本模块包含使用最新版本的 LangChain 和 LangGraph 实现的复杂多智能体协作系统。
+
+ResearchAssistant 等导出按需加载：只导入 common_tools 下的轻量工具（如 prompt_builder）时，
+不会触发 LangChain / LangGraph 的导入。
 """
 
-from .research_assistant import ResearchAssistant, ResearchState
+import importlib
+
+# 延迟导出：名称 -> 所在子模块
+_LAZY_EXPORTS = {
+    "ResearchAssistant": ".research_assistant",
+    "ResearchState": ".research_assistant",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
 
 __all__ = [
     "ResearchAssistant",
@@ -8,10 +8,13 @@ AI 大模型提示词工程工具模块。
 
 本模块不依赖具体厂商的 SDK，只负责生成「提示词与消息结构」，
 上层可以在调用 openai / deepseek / 其他 LLM SDK 时直接使用。
+
+导入本模块不做任何 I/O：DEEPSEEK_API_KEY 在首次使用时才读取配置，requests 在发起调用时才导入。
 """
 
 from __future__ import annotations
 
+import functools
 import os
 import os.path as osp
 from pathlib import Path
@@ -19,9 +22,6 @@ from pathlib import Path
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Optional
 
-import requests
-import yaml
-
 
 # -----------------------------
 # 基础数据结构
@@ -287,6 +287,8 @@ def _load_config_from_yaml() -> Dict[str, Any]:
     config_file = Path(osp.join(osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__)))), "conf", "auto.yaml"))
     if not config_file.exists():
         return {}
+    import yaml
+
     try:
         with open(config_file, "r", encoding="utf-8") as f:
             return yaml.safe_load(f) or {}
@@ -294,16 +296,17 @@ def _load_config_from_yaml() -> Dict[str, Any]:
         return {}
 
 
+@functools.lru_cache(maxsize=None)
 def _get_deepseek_api_key() -> str:
     """
-    获取 DeepSeek API Key，优先级：
+    获取 DeepSeek API Key（首次调用时读取，之后缓存），优先级：
     1. conf/auto.yaml 中的 deepseek_api_key 或 DEEPSEEK_API_KEY
     2. 环境变量 DEEPSEEK_API_KEY
     """
     # 先从配置文件读取
     config = _load_config_from_yaml()
     api_key = (
-        config.get("llm", {}).get("deepseek").get("api_key")
+        (config.get("llm", {}).get("deepseek") or {}).get("api_key")
         if isinstance(config.get("llm"), dict)
         else None
     )
@@ -314,11 +317,16 @@ def _get_deepseek_api_key() -> str:
     return os.getenv("DEEPSEEK_API_KEY", "")
 
 
-# DeepSeek API 配置
-DEEPSEEK_API_KEY = _get_deepseek_api_key()
+# DeepSeek API 配置；DEEPSEEK_API_KEY 通过模块级 __getattr__ 延迟读取
 DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
 
 
+def __getattr__(name: str) -> Any:
+    if name == "DEEPSEEK_API_KEY":
+        return _get_deepseek_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def call_deepseek_chat(
         messages: List[Dict[str, Any]],
         model: str = "deepseek-chat",
@@ -334,7 +342,8 @@ def call_deepseek_chat(
     - temperature: 采样温度
     - max_tokens: 可选，限制生成长度
     """
-    if not DEEPSEEK_API_KEY:
+    api_key = _get_deepseek_api_key()
+    if not api_key:
         raise RuntimeError(
             "DEEPSEEK_API_KEY 未配置，请在 conf/auto.yaml 中设置 deepseek_api_key，"
             "或在环境变量中设置 DEEPSEEK_API_KEY。"
@@ -350,9 +359,11 @@ def call_deepseek_chat(
 
     headers = {
         "Content-Type": "application/json",
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
     }
 
+    import requests
+
     resp = requests.post(DEEPSEEK_API_URL, json=payload, headers=headers, timeout=60)
     resp.raise_for_status()
     return resp.json()
@@ -0,0 +1,385 @@
+# coding: utf-8
+
+"""
+轻量的进程内指标工具，输出 Prometheus 文本格式。
+
+设计目标：
+- 写入无锁：每个线程写自己的分片（threading.local），读取时再汇总，热路径只有一次字典自增
+- 多 worker 聚合：配置 METRICS_DIR 后，各 worker 定期把快照写到该目录下的 <pid>.json，
+  暴露指标时合并目录中所有快照（计数器与直方图求和，gauge 只取存活进程）；
+  已退出 worker 的计数器与直方图并入 DEAD_SNAPSHOT 后删除其快照，目录不随 worker 重启无限增长
+- 连接池等状态类指标通过 register_collector 注册回调，在快照时采集
+- fork 出的 worker 清空从 master 继承的分片，避免多进程聚合时重复计入 master 的计数
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import os.path as osp
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.fork_utils import register_after_fork
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 非 POSIX 平台不清理已退出 worker 的快照
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 字节数分桶
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# collector 回调返回的样本：(指标名, 类型, 说明, [(标签, 值), ...])
+CollectedMetric = Tuple[str, str, str, Iterable[Tuple[Dict[str, Any], float]]]
+
+# multiproc_dir 中已退出 worker 的累计快照（只有计数器与直方图），以及合并时使用的文件锁
+DEAD_SNAPSHOT = 'dead.json'
+_DIR_LOCK = '.lock'
+
+
+def format_labels(labels: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+    """把标签字典编码为 Prometheus 标签串（不含大括号），结果可作为指标分片的 key"""
+    items = dict(labels or {}, **kwargs)
+    return ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in sorted(items.items())
+    )
+
+
+class _Metric(object):
+    type = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help: str) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self._local = threading.local()
+        self._shards: List[Dict[str, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[str, Any]:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # 只在线程首次写入时加锁登记分片
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def reset(self) -> None:
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def reset_after_fork(self) -> None:
+        # 继承来的锁可能处于持有状态，分片属于父进程的线程，全部换新
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type = 'counter'
+
+    def inc(self, labels: str = '', value: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + value
+
+    def collect(self) -> Dict[str, float]:
+        result: Dict[str, float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                result[labels] = result.get(labels, 0) + value
+        return result
+
+
+class Histogram(_Metric):
+    """固定分桶直方图，每个标签组合记录 [各桶计数..., 总和, 次数]"""
+
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super(Histogram, self).__init__(registry, name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: str = '') -> None:
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (len(self.buckets) + 3)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def collect(self) -> Dict[str, List[float]]:
+        result: Dict[str, List[float]] = {}
+        for shard in list(self._shards):
+            for labels, row in list(shard.items()):
+                total = result.get(labels)
+                if total is None:
+                    result[labels] = list(row)
+                else:
+                    for i, v in enumerate(row):
+                        total[i] += v
+        return result
+
+
+class MetricsRegistry(object):
+    """
+    指标注册表。
+
+    用法：
+
+        requests_total = metrics.counter('rpc_requests_total', 'rpc 请求数')
+        requests_total.inc(format_labels(endpoint='basic.add_account'))
+        metrics.expose()
+    """
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: float = 5.0) -> None:
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[CollectedMetric]]] = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def _get_or_create(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str = '') -> Counter:
+        return self._get_or_create(Counter, name, help)
+
+    def histogram(self, name: str, help: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def reset_after_fork(self) -> None:
+        """在 fork 出的子进程中清空继承来的指标数据"""
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        for metric in list(self._metrics.values()):
+            metric.reset_after_fork()
+
+    def register_collector(self, collector: Callable[[], Iterable[CollectedMetric]]) -> None:
+        """注册状态类指标的采集回调，回调返回 (指标名, 类型, 说明, [(标签字典, 值), ...]) 列表"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前进程的指标快照，可 JSON 序列化"""
+        snap: Dict[str, Any] = {'pid': os.getpid(), 'metrics': {}}
+        for name, metric in list(self._metrics.items()):
+            entry: Dict[str, Any] = {'type': metric.type, 'help': metric.help, 'values': metric.collect()}
+            if isinstance(metric, Histogram):
+                entry['buckets'] = list(metric.buckets)
+            snap['metrics'][name] = entry
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as exc:  # pragma: no cover - 采集失败不影响其他指标
+                logger.warning('metrics collector %r failed: %s', collector, exc)
+                continue
+            for name, typ, help, samples in collected:
+                entry = snap['metrics'].setdefault(name, {'type': typ, 'help': help, 'values': {}})
+                for labels, value in samples:
+                    key = format_labels(labels)
+                    entry['values'][key] = entry['values'].get(key, 0) + value
+        return snap
+
+    # -----------------------------
+    # 多进程聚合
+    # -----------------------------
+
+    def _snapshot_path(self, pid: int) -> str:
+        return osp.join(self.multiproc_dir or '', '%s.json' % pid)
+
+    def flush(self) -> None:
+        """把当前进程快照写入 multiproc_dir（先写临时文件再原子替换）"""
+        if not self.multiproc_dir:
+            return
+        self._last_flush = time.monotonic()
+        path = self._snapshot_path(os.getpid())
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            with open(tmp_path, 'w') as fw:
+                json.dump(self.snapshot(), fw)
+            os.replace(tmp_path, path)
+        except OSError as exc:  # pragma: no cover - 磁盘问题只记录日志
+            logger.warning('flush metrics to %s failed: %s', path, exc)
+
+    def maybe_flush(self) -> None:
+        """距上次写入超过 flush_interval 时写一次快照，可在每个请求结束时调用"""
+        if self.multiproc_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as fr:
+                return json.load(fr)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            logger.warning('load metrics snapshot %s failed: %s', path, exc)
+            return None
+
+    def prune_dead(self) -> None:
+        """
+        把已退出 worker 的快照并入 DEAD_SNAPSHOT 并删除，计数器与直方图的累计值不丢失，gauge 丢弃。
+
+        多个 worker 可能同时暴露指标，合并过程持有目录下的文件锁，同一个快照只会被合并一次
+        """
+        if not self.multiproc_dir or fcntl is None:
+            return
+        dead = []
+        for filename in os.listdir(self.multiproc_dir):
+            name, ext = osp.splitext(filename)
+            if ext == '.json' and name.isdigit() and int(name) != os.getpid() and not self._pid_alive(int(name)):
+                dead.append(osp.join(self.multiproc_dir, filename))
+        if not dead:
+            return
+
+        with open(osp.join(self.multiproc_dir, _DIR_LOCK), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                archive_path = osp.join(self.multiproc_dir, DEAD_SNAPSHOT)
+                archive = self._read_snapshot(archive_path) or {'pid': None, 'metrics': {}}
+                merged = []
+                for path in dead:
+                    # 等锁期间可能已被其他 worker 合并并删除
+                    snap = self._read_snapshot(path)
+                    if snap is not None:
+                        _merge_snapshot(archive['metrics'], snap, gauges=False)
+                        merged.append(path)
+                if not merged:
+                    return
+                tmp_path = archive_path + '.%d.tmp' % os.getpid()
+                with open(tmp_path, 'w') as fw:
+                    json.dump(archive, fw)
+                os.replace(tmp_path, archive_path)
+                for path in merged:
+                    os.remove(path)
+            except OSError as exc:  # pragma: no cover - 磁盘问题只记录日志
+                logger.warning('prune metrics snapshots in %s failed: %s', self.multiproc_dir, exc)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_snapshots(self) -> List[Dict[str, Any]]:
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+
+        self.flush()
+        self.prune_dead()
+        snapshots = []
+        for filename in os.listdir(self.multiproc_dir):
+            if not filename.endswith('.json'):
+                continue
+            snap = self._read_snapshot(osp.join(self.multiproc_dir, filename))
+            if snap is not None:
+                snapshots.append(snap)
+        return snapshots
+
+    def collect_all(self) -> Dict[str, Dict[str, Any]]:
+        """合并所有 worker 的快照"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for snap in self._load_snapshots():
+            # 已退出 worker 的状态类指标没有意义
+            alive = snap.get('pid') is not None and self._pid_alive(snap['pid'])
+            _merge_snapshot(merged, snap, gauges=alive)
+        return merged
+
+    def expose(self) -> str:
+        """Prometheus 文本格式"""
+        lines: List[str] = []
+        for name, entry in sorted(self.collect_all().items()):
+            lines.append('# HELP %s %s' % (name, entry['help']))
+            lines.append('# TYPE %s %s' % (name, entry['type']))
+            for labels, value in sorted(entry['values'].items()):
+                if entry['type'] != 'histogram':
+                    lines.append('%s{%s} %s' % (name, labels, _num(value)) if labels else '%s %s' % (name, _num(value)))
+                    continue
+                sep = ',' if labels else ''
+                cumulative = 0
+                for bound, count in zip(list(entry['buckets']) + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    lines.append('%s_bucket{%s%sle="%s"} %s' % (name, labels, sep, bound, _num(cumulative)))
+                suffix = '{%s}' % labels if labels else ''
+                lines.append('%s_sum%s %s' % (name, suffix, _num(value[-2])))
+                lines.append('%s_count%s %s' % (name, suffix, _num(value[-1])))
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_snapshot(merged: Dict[str, Dict[str, Any]], snap: Dict[str, Any], gauges: bool = True) -> None:
+    """把一个快照的指标累加到 merged：计数器与直方图求和，gauges=False 时跳过 gauge"""
+    for name, entry in snap['metrics'].items():
+        if entry['type'] == 'gauge' and not gauges:
+            continue
+        target = merged.get(name)
+        if target is None:
+            target = merged[name] = dict(entry, values={})
+        values = target['values']
+        for labels, value in entry['values'].items():
+            if isinstance(value, list):
+                total = values.get(labels)
+                values[labels] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+            else:
+                values[labels] = values.get(labels, 0) + value
+
+
+def _num(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _create_default_registry() -> MetricsRegistry:
+    try:
+        import config
+
+        metrics_cfg = getattr(config, 'METRICS', None) or {}
+    except Exception:  # pragma: no cover - 兜底处理
+        metrics_cfg = {}
+    return MetricsRegistry(
+        multiproc_dir=metrics_cfg.get('multiproc_dir') or os.environ.get('METRICS_DIR'),
+        flush_interval=metrics_cfg.get('flush_interval', 5.0),
+    )
+
+
+# 默认导出的全局实例
+metrics = _create_default_registry()
+register_after_fork(metrics.reset_after_fork)
+
+
+__all__ = [
+    'DEAD_SNAPSHOT',
+    'DEFAULT_BUCKETS',
+    'BYTES_BUCKETS',
+    'Counter',
+    'Histogram',
+    'MetricsRegistry',
+    'format_labels',
+    'metrics',
+]
@@ -0,0 +1,178 @@
+# coding: utf-8
+
+"""
+peewee 模型相关的工具。
+
+- 游标（keyset）分页：按 (create_at, id) 倒序翻页，条件为 "排序键 < 上一页最后一行"，
+  翻到第几页都只扫描 page_size 行，不像 OFFSET 那样越往后越慢。游标对调用方不透明，
+  内容为上一页最后一行的排序键；第一页传 FIRST_CURSOR
+- 计数：窗口函数支持检测与 EXPLAIN 行数估算
+- 执行计划：explain() 取 MySQL / SQLite 的执行计划
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import peewee
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+# 请求游标分页第一页时传的游标。rpc 入参的空字符串会被替换为默认值，不能用来表示第一页；
+# 编码后的游标是以 [ 开头的 JSON 数组的 base64（以 Wz 开头），不会与之相同
+FIRST_CURSOR = 'first'
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或与模型的排序键不匹配"""
+
+
+def seek_fields(model: Any) -> List[peewee.Field]:
+    """模型的游标排序键：有 create_at 时为 (create_at, id)，否则为 (id,)"""
+    fields = model._meta.fields
+    if 'create_at' in fields:
+        return [fields['create_at'], model._meta.primary_key]
+    return [model._meta.primary_key]
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(field: peewee.Field, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(field, peewee.DateTimeField):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(field, peewee.DateField):
+        return datetime.date.fromisoformat(value)
+    return field.python_value(value)
+
+
+def encode_cursor(fields: Sequence[peewee.Field], row: Any) -> str:
+    """由一行数据的排序键生成游标"""
+    values = [_dump_value(getattr(row, field.name)) for field in fields]
+    raw = json.dumps([CURSOR_VERSION] + values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(fields: Sequence[peewee.Field], cursor: str) -> List[Any]:
+    """解析游标，返回与 fields 对应的排序键取值"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw.decode('utf-8'))
+        if not isinstance(data, list) or data[:1] != [CURSOR_VERSION] or len(data) != len(fields) + 1:
+            raise ValueError('cursor does not match %d sort keys' % len(fields))
+        return [_load_value(field, value) for field, value in zip(fields, data[1:])]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise InvalidCursor('invalid cursor: %s' % exc) from exc
+
+
+def seek_condition(fields: Sequence[peewee.Field], values: Sequence[Any]) -> Any:
+    """
+    倒序翻页的条件 (f1, f2, ...) < (v1, v2, ...)。
+
+    展开为 f1 < v1 OR (f1 = v1 AND f2 < v2) OR ...，而不是行构造器比较：
+    MySQL 对展开后的形式能稳定使用 (f1, f2) 上的索引做范围扫描。
+    """
+    cond = None
+    for i, (field, value) in enumerate(zip(fields, values)):
+        term = field < value
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            term = (prev_field == prev_value) & term
+        cond = term if cond is None else (cond | term)
+    return cond
+
+
+def seek_order(fields: Sequence[peewee.Field]) -> List[Any]:
+    return [field.desc() for field in fields]
+
+
+def _unwrap_database(database: Any) -> Any:
+    # LazyDatabase 按需创建实例，普通 DatabaseProxy 取已绑定的实例
+    while isinstance(database, peewee.DatabaseProxy):
+        resolve = getattr(database, '_resolve', None)
+        database = resolve() if resolve is not None else database.obj
+    return database
+
+
+def supports_window_functions(database: Any) -> bool:
+    """
+    是否支持 COUNT(*) OVER()：MySQL 8.0+ / MariaDB 10.2+、SQLite 3.25+、PostgreSQL。
+
+    MySQL 的版本号在第一次建立连接后才知道，此前返回 False，由调用方退回普通计数。
+    """
+    database = _unwrap_database(database)
+    if database is None:
+        return False
+    if isinstance(database, peewee.PostgresqlDatabase):
+        return True
+    version = database.server_version
+    if not version:
+        return False
+    if isinstance(database, peewee.SqliteDatabase):
+        return version >= (3, 25, 0)
+    if isinstance(database, peewee.MySQLDatabase):
+        return version >= (8, 0, 0)
+    return False
+
+
+def explain(query: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    查询的执行计划：MySQL 为 EXPLAIN 的结果行，SQLite 为 EXPLAIN QUERY PLAN 的结果行，
+    列名统一为小写；其他数据库或出错时返回 None。
+    """
+    database = _unwrap_database(query.model._meta.database)
+    if isinstance(database, peewee.MySQLDatabase):
+        prefix = 'EXPLAIN '
+    elif isinstance(database, peewee.SqliteDatabase):
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+    sql, params = query.sql()
+    try:
+        cursor = database.execute_sql(prefix + sql, params)
+        columns = [col[0].lower() for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except peewee.DatabaseError as exc:
+        logger.warning('explain query failed: %s', exc)
+        return None
+
+
+def estimate_rows(query: Any) -> Optional[int]:
+    """
+    用 EXPLAIN 估算查询会扫描的行数，只支持 MySQL；其他数据库或出错时返回 None。
+
+    估算值来自索引统计信息，误差可能较大，只适合在行数很多、精确值不重要时展示。
+    """
+    if not isinstance(_unwrap_database(query.model._meta.database), peewee.MySQLDatabase):
+        return None
+    try:
+        rows = [row['rows'] for row in explain(query) or ()]
+    except KeyError as exc:
+        logger.warning('explain for row estimate failed: %s', exc)
+        return None
+    rows = [int(r) for r in rows if r is not None]
+    return max(rows) if rows else None
+
+
+__all__ = [
+    'FIRST_CURSOR',
+    'InvalidCursor',
+    'decode_cursor',
+    'encode_cursor',
+    'estimate_rows',
+    'explain',
+    'seek_condition',
+    'seek_fields',
+    'seek_order',
+    'supports_window_functions',
+]
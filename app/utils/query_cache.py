@@ -0,0 +1,232 @@
+# coding: utf-8
+
+"""
+列表 / 计数查询的结果缓存，写操作按 (表, 数据范围) 失效。
+
+数据范围（scope）为 (group_id, team_id, project_id)，与 HelperSvcApi.get_base_cond 一致，
+team_id / project_id 为空表示不限。失效用代数（generation）实现，不逐条删除缓存：
+
+- 每个查询依赖若干代数计数器，缓存 key 中带上读到的代数，计数器变化后旧条目自然失效
+- 写 (g, t, p) 时推进：组 g；队 (g, t)（t 为空时推进 (g, *)）；项目 (g, p)（p 为空时推进 (g, *)）
+- 查询 (g, -, -) 依赖组 g；(g, t, -) 依赖 (g, t) 与 (g, *)；(g, -, p) 依赖 (g, p) 与 (g, *)；
+  (g, t, p) 依赖队与项目的四个计数器，不依赖组 g。同组内其他队 / 项目的写不会使其失效，
+  写入范围不明确时按最大范围失效
+
+使用从库时，写入之后从库追上之前读到的旧数据可能以新的代数写入缓存。当前请求写过主库
+（读己之写固定在主库，见 ReplicaRoutingMixin）时不读写缓存，保证写入方之后读到的是主库数据；
+其他请求仍可能在复制延迟内读到旧数据，与直接读从库一致。
+
+代数保存位置由 QUERY_CACHE['redis'] 决定：为 None（默认）时配置了 Redis 就用 Redis，否则在进程内。
+多 worker 部署必须使用 Redis，所有 worker 的写都能使各自的缓存失效（缓存数据本身仍在进程内）；
+只在进程内保存时，其他 worker 的写最多在 ttl 秒后才可见。因此 QUERY_CACHE['enabled'] 为 None（默认）时
+只在代数保存在 Redis 时启用缓存，单进程部署等可以确认没有其他 worker 写入时再显式设为 True。
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+
+from app.utils.cache_utils import LRUCache
+from app.utils.metric_utils import format_labels, metrics
+from app.utils.model_utils import _unwrap_database
+
+logger = logging.getLogger(__name__)
+
+# (group_id, team_id, project_id)
+Scope = Tuple[Any, Any, Any]
+
+_ANY = '*'
+
+requests_total = metrics.counter('query_cache_requests_total', '查询缓存命中 / 未命中次数')
+
+
+class LocalGenerations(object):
+    """
+    进程内的代数计数器。
+
+    推进时取全局递增时钟而不是在原值上加一：计数器被 LRU 淘汰后从 0 重新开始，
+    也不会与淘汰前写入的缓存条目撞上同一个代数。
+    """
+
+    def __init__(self, maxsize: int = 100000) -> None:
+        self._gens = LRUCache(maxsize=maxsize)
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[Hashable]) -> List[Any]:
+        return [self._gens.get(key, 0) for key in keys]
+
+    def bump(self, keys: Sequence[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._gens.set(key, next(self._clock))
+
+
+class RedisGenerations(object):
+    """保存在 Redis 中的代数计数器，多 worker 共享"""
+
+    def __init__(self, client_factory: Callable[[], Any], prefix: str = 'qgen:') -> None:
+        self._client_factory = client_factory
+        self._client = None
+        self.prefix = prefix
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _key(self, key: Hashable) -> str:
+        return self.prefix + ':'.join(str(part) for part in key)
+
+    def get_many(self, keys: Sequence[Hashable]) -> List[Any]:
+        return [int(v or 0) for v in self.client.mget([self._key(k) for k in keys])]
+
+    def bump(self, keys: Sequence[Hashable]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self._key(key))
+        pipe.execute()
+
+
+def normalize_scope(group_id: Any, team_id: Any = None, project_id: Any = None) -> Scope:
+    # 与 get_base_cond 一致：team_id / project_id 为假值时不参与过滤
+    return group_id, team_id or None, project_id or None
+
+
+def read_dependencies(table: str, scope: Scope) -> List[Tuple[Any, ...]]:
+    """查询结果依赖的代数计数器：限定了队或项目的查询不依赖组计数器"""
+    group_id, team_id, project_id = scope
+    if team_id is None and project_id is None:
+        return [(table, 'g', group_id)]
+    deps: List[Tuple[Any, ...]] = []
+    if team_id is not None:
+        deps += [(table, 't', group_id, team_id), (table, 't', group_id, _ANY)]
+    if project_id is not None:
+        deps += [(table, 'p', group_id, project_id), (table, 'p', group_id, _ANY)]
+    return deps
+
+
+def write_dependencies(table: str, scope: Scope) -> List[Tuple[Any, ...]]:
+    """写操作需要推进的代数计数器：组，以及写入范围对应（不明确时为 *）的队与项目"""
+    group_id, team_id, project_id = scope
+    return [
+        (table, 'g', group_id),
+        (table, 't', group_id, _ANY if team_id is None else team_id),
+        (table, 'p', group_id, _ANY if project_id is None else project_id),
+    ]
+
+
+class QueryCache(object):
+    """
+    查询结果缓存。
+
+    Args:
+        maxsize: 最多缓存的查询结果数，超出按 LRU 淘汰
+        ttl: 结果最长保留时间（秒），同时也是事务未提交等极端情况下脏数据的最长存活时间
+        generations: 代数存储，默认进程内
+        enabled: False 时直接执行查询，不读写缓存
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 60, generations: Any = None,
+                 enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.generations = generations or LocalGenerations()
+
+    def get_or_load(self, table: str, scope: Scope, params: Hashable, loader: Callable[[], Any],
+                    database: Any = None) -> Any:
+        """
+        读缓存，未命中时执行 loader 并写入；key 为 (表, 范围, 查询参数, 依赖的代数)。
+
+        database 为查询所在的库，当前请求已固定在主库时不读写缓存
+        """
+        if not self.enabled or _pinned_to_primary(database):
+            return loader()
+
+        try:
+            gens = tuple(self.generations.get_many(read_dependencies(table, scope)))
+        except Exception as exc:  # pragma: no cover - Redis 不可用时退化为不缓存
+            logger.warning('read query cache generations failed: %s', exc)
+            return loader()
+
+        key = (table, scope, params, gens)
+        value = self.cache.get(key)
+        if value is not None:
+            requests_total.inc(format_labels(table=table, outcome='hit'))
+            return value
+
+        requests_total.inc(format_labels(table=table, outcome='miss'))
+        value = loader()
+        self.cache.set(key, value)
+        return value
+
+    def invalidate(self, table: str, scope: Scope) -> None:
+        """表在 scope 范围内有写入，使相关查询结果失效（应在写入之后调用）"""
+        if not self.enabled:
+            return
+        try:
+            self.generations.bump(write_dependencies(table, scope))
+        except Exception as exc:  # pragma: no cover - 只能等待 ttl 过期
+            logger.warning('invalidate query cache for %s %s failed: %s', table, scope, exc)
+
+
+def _pinned_to_primary(database: Any) -> bool:
+    if database is None:
+        return False
+    is_pinned = getattr(_unwrap_database(database), 'is_pinned_to_primary', None)
+    return is_pinned is not None and is_pinned()
+
+
+def _redis_client() -> Any:
+    from app._webapi.caching import get_redis_backend
+
+    return get_redis_backend().client
+
+
+def _create_default_cache() -> QueryCache:
+    try:
+        import config
+
+        cache_cfg = dict(getattr(config, 'QUERY_CACHE', None) or {})
+        use_redis = cache_cfg.pop('redis', None)
+        if use_redis is None:
+            from app._webapi.caching import redis
+
+            # 自动选择时要求 redis 包已安装，否则每次查询都会因连不上而退化为不缓存
+            use_redis = redis is not None and bool(
+                getattr(config, 'REDIS', None) or (getattr(config, 'SESSION', None) or {}).get('redis'))
+    except Exception:  # pragma: no cover - 兜底处理
+        cache_cfg, use_redis = {}, False
+    if cache_cfg.get('enabled') is None:
+        # 进程内的代数无法让其他 worker 的写使本 worker 的缓存失效
+        cache_cfg['enabled'] = bool(use_redis)
+    generations = RedisGenerations(_redis_client) if use_redis else None
+    return QueryCache(generations=generations, **cache_cfg)
+
+
+# 默认导出的全局实例
+query_cache = _create_default_cache()
+
+
+def _collect_cache():
+    stats = query_cache.cache.stats()
+    yield ('query_cache_entries', 'gauge', '查询缓存当前条目数', [({}, stats['size'])])
+    yield ('query_cache_evictions_total', 'counter', '查询缓存容量淘汰次数', [({}, stats['evictions'])])
+
+
+metrics.register_collector(_collect_cache)
+
+
+__all__ = [
+    'LocalGenerations',
+    'QueryCache',
+    'RedisGenerations',
+    'normalize_scope',
+    'query_cache',
+    'read_dependencies',
+    'write_dependencies',
+]
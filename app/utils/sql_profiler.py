@@ -0,0 +1,217 @@
+# coding: utf-8
+
+"""
+SQL 执行耗时分析（按需开启，见 config.SQL_PROFILER）。
+
+开启后由 DbCfg._create_db 创建的数据库实例会记录每条 SQL 的耗时、影响 / 返回行数与调用位置：
+
+- 耗时按库记录到 db_query_seconds 直方图
+- 超过 slow_ms 的语句写入慢查询日志（logger app.sql.slow），只读语句按 explain_sample_rate 抽样附带 EXPLAIN 结果；
+  EXPLAIN 在执行该语句的连接上执行（读写分离时即为执行查询的从库），不再经过路由
+- 请求上下文中按请求汇总（语句数、总耗时、最慢的语句），debug 模式下附加到 rpc 响应的 _sql 字段，
+  便于定位是哪个 HelperSvcApi 调用路径在反复查库；只附加到本次发出的响应，不进入响应缓存与请求合并共享的结果
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import os.path as osp
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import peewee
+import playhouse
+from flask import current_app, g, has_request_context
+
+from app.utils.metric_utils import format_labels, metrics
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('app.sql.slow')
+
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+query_seconds = metrics.histogram('db_query_seconds', 'SQL 执行耗时（秒）', buckets=QUERY_BUCKETS)
+slow_queries_total = metrics.counter('db_slow_queries_total', '超过慢查询阈值的 SQL 数')
+
+DEFAULT_OPTIONS = dict(
+    enabled=False,
+    slow_ms=200,
+    explain_sample_rate=0.1,
+    max_statements=100,
+    attach_to_response=True,
+)
+
+_READ_SQL = re.compile(r"^\s*\(?\s*SELECT\b", re.I)
+
+# 查找调用位置时跳过的模块（ORM 与数据库工具层自身）
+_UTILS_DIR = osp.dirname(osp.abspath(__file__))
+_SKIP_FILES = (
+    peewee.__file__,
+    osp.dirname(playhouse.__file__) + os.sep,
+    osp.join(_UTILS_DIR, 'db_utils.py'),
+    osp.join(_UTILS_DIR, 'model_utils.py'),
+    osp.join(_UTILS_DIR, 'sql_profiler.py'),
+)
+
+_PROJECT_ROOT = osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__))))
+
+
+def get_options() -> Dict[str, Any]:
+    try:
+        import config
+
+        return dict(DEFAULT_OPTIONS, **(getattr(config, 'SQL_PROFILER', None) or {}))
+    except Exception:  # pragma: no cover - 兜底处理
+        return dict(DEFAULT_OPTIONS)
+
+
+def _call_site() -> str:
+    """第一个不属于 peewee / playhouse / 数据库工具层的栈帧，格式为 path:line func"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_SKIP_FILES):
+            if filename.startswith(_PROJECT_ROOT):
+                filename = osp.relpath(filename, _PROJECT_ROOT)
+            return '%s:%d %s' % (filename, frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return '?'
+
+
+class RequestProfile(object):
+    """单个请求内执行的 SQL 汇总，最多保留 max_statements 条明细"""
+
+    def __init__(self, max_statements: int = 100) -> None:
+        self.max_statements = max_statements
+        self.count = 0
+        self.total = 0.0
+        self.statements: List[Dict[str, Any]] = []
+
+    def record(self, db: str, sql: str, duration: float, rows: Optional[int], site: str) -> None:
+        self.count += 1
+        self.total += duration
+        if len(self.statements) < self.max_statements:
+            self.statements.append(dict(db=db, sql=sql, ms=round(duration * 1000, 3), rows=rows, site=site))
+
+    def merge(self, other: "RequestProfile") -> None:
+        """并入另一份汇总（如批量接口并发子调用各自的汇总）"""
+        self.count += other.count
+        self.total += other.total
+        room = self.max_statements - len(self.statements)
+        if room > 0:
+            self.statements.extend(other.statements[:room])
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        slowest = sorted(self.statements, key=lambda s: s['ms'], reverse=True)[:top]
+        return dict(count=self.count, total_ms=round(self.total * 1000, 3), slowest=slowest)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """当前请求的 SQL 汇总，不在请求上下文中时返回 None"""
+    if not has_request_context():
+        return None
+    profile = g.get('_sql_profile')
+    if profile is None:
+        profile = g._sql_profile = RequestProfile(get_options()['max_statements'])
+    return profile
+
+
+def should_attach_summary() -> bool:
+    """当前请求是否需要在响应中附带 SQL 汇总：debug 模式、开启了 attach_to_response 且本请求执行过 SQL"""
+    return (has_request_context() and current_app.debug and g.get('_sql_profile') is not None
+            and get_options()['attach_to_response'])
+
+
+def attach_summary(payload: Any) -> Any:
+    """debug 模式下把本请求的 SQL 汇总附加到响应体的 _sql 字段（原地修改，调用方应传入本次响应专用的副本）"""
+    if isinstance(payload, dict) and should_attach_summary():
+        payload['_sql'] = g._sql_profile.summary()
+    return payload
+
+
+class SqlProfilerMixin(object):
+    """记录 execute_sql 的耗时、行数与调用位置；需放在数据库类的 MRO 最前面"""
+
+    profile_name = ''
+    slow_seconds = 0.2
+    explain_sample_rate = 0.1
+
+    def set_profile_name(self, name: str, options: Optional[Dict[str, Any]] = None) -> None:
+        options = options or get_options()
+        self.profile_name = name
+        self.slow_seconds = options['slow_ms'] / 1000.0
+        self.explain_sample_rate = options['explain_sample_rate']
+
+    def execute_sql(self, sql: str, params: Any = None, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        cursor = super(SqlProfilerMixin, self).execute_sql(sql, params, *args, **kwargs)
+        duration = time.perf_counter() - started
+
+        rows = getattr(cursor, 'rowcount', -1)
+        rows = rows if rows is not None and rows >= 0 else None
+        query_seconds.observe(duration, format_labels(db=self.profile_name))
+        site = _call_site()
+        profile = current_profile()
+        if profile is not None:
+            profile.record(self.profile_name, sql, duration, rows, site)
+        if duration >= self.slow_seconds:
+            self._log_slow(sql, params, duration, rows, site, cursor)
+        return cursor
+
+    def _explain(self, sql: str, params: Any, cursor: Any) -> Optional[List[Any]]:
+        """
+        在执行 sql 的连接上直接 EXPLAIN：不经过 execute_sql，不被记录，
+        也不会被读写分离路由到另一个库（从库上的慢查询要看从库的执行计划）
+        """
+        prefix = 'EXPLAIN QUERY PLAN ' if isinstance(self, peewee.SqliteDatabase) else 'EXPLAIN '
+        connection = getattr(cursor, 'connection', None)
+        if connection is None:
+            return None
+        try:
+            explain_cursor = connection.cursor()
+            try:
+                explain_cursor.execute(prefix + sql, params or ())
+                columns = [col[0] for col in explain_cursor.description or ()]
+                return [dict(zip(columns, row)) for row in explain_cursor.fetchall()]
+            finally:
+                explain_cursor.close()
+        except Exception as exc:
+            logger.debug('explain slow query failed: %s', exc)
+            return None
+
+    def _log_slow(self, sql: str, params: Any, duration: float, rows: Optional[int], site: str,
+                  cursor: Any = None) -> None:
+        slow_queries_total.inc(format_labels(db=self.profile_name))
+        plan = None
+        if _READ_SQL.match(sql) and random.random() < self.explain_sample_rate:
+            plan = self._explain(sql, params, cursor)
+        slow_logger.warning(
+            'slow query on %s: %.1f ms, rows=%s, at %s\n%s\nparams=%r%s',
+            self.profile_name, duration * 1000, rows, site, sql, params,
+            '' if plan is None else '\nexplain=%r' % (plan,))
+
+
+_profiled_classes: Dict[type, type] = {}
+
+
+def profiled_class(db_cls: type) -> type:
+    """返回在 db_cls 外面加上 SqlProfilerMixin 的子类（按类缓存）"""
+    cls = _profiled_classes.get(db_cls)
+    if cls is None:
+        cls = _profiled_classes[db_cls] = type('Profiled' + db_cls.__name__, (SqlProfilerMixin, db_cls), {})
+    return cls
+
+
+__all__ = [
+    'RequestProfile',
+    'SqlProfilerMixin',
+    'attach_summary',
+    'current_profile',
+    'get_options',
+    'profiled_class',
+    'should_attach_summary',
+]
@@ -1,25 +1,39 @@
 import importlib
-import os
+import inspect
+import logging
 import re
+import threading
+from functools import wraps
 
 from flask import Flask
 from flask.views import View
 
+from app._webapi.aio import run_coroutine
+from app._webapi.batch import BATCH_PATH, register_route, rpc_batch
+from app._webapi.health import db_health
+from app._webapi.limits import resolve_admission
+from app._webapi.metrics import rpc_metrics
+
+from ._manifest import get_manifest
+
+logger = logging.getLogger(__name__)
+
 
 class LoginRequiredDispatchView(object):
     # methods = ['GET', 'POST', 'PUT', 'DELETE']
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 类属性声明的隔离舱 / 限流在定义视图类时校验（见 rpc 的 bulkhead / rate_limit 参数）
+        resolve_admission(getattr(cls, 'bulkhead', None), getattr(cls, 'rate_limit', None))
+
     @classmethod
-    def register(cls, app_or_blueprint):
+    def iter_routes(cls):
         """
-        注册视图类的所有路由
+        遍历视图类的路由，返回 (URL, 方法名, HTTP 方法列表)
         """
         # 获取类名并转换为URL前缀
         url_prefix = '/' + '_'.join([s.lower() for s in re.findall('[A-Z][^A-Z]*', cls.__name__)])
-        # view_func = cls.as_view(cls.__name__.lower())
-
-        # 实例化一次，确保绑定方法的 self
-        instance = cls()
 
         # 遍历类中的所有方法
         for name, method in cls.__dict__.items():
@@ -35,47 +49,114 @@ class LoginRequiredDispatchView(object):
                     _http_method = ['GET', 'POST']
                     _method_name = method_name
 
-                # 绑定实例方法，避免缺失 self
-                view_func = getattr(instance, method_name)
+                yield f'{url_prefix}/{_method_name}', method_name, _http_method
+
+    @classmethod
+    def register(cls, app_or_blueprint):
+        """
+        注册视图类的所有路由
+        """
+        # 实例化一次，确保绑定方法的 self
+        instance = cls()
+
+        for rule, method_name, _http_method in cls.iter_routes():
+            view_func = _bind_view(instance, method_name)
+            # 注册路由
+            app_or_blueprint.add_url_rule(
+                rule,
+                view_func=view_func,
+                methods=_http_method
+            )
+            # 登记到批量接口
+            register_route(rule, view_func, _http_method)
+
 
-                # 注册路由
-                app_or_blueprint.add_url_rule(
-                    f'{url_prefix}/{_method_name}',
-                    view_func=view_func,
-                    methods=_http_method
-                )
+def _bind_view(instance, method_name):
+    # 绑定实例方法，避免缺失 self
+    view_func = getattr(instance, method_name)
+    if inspect.iscoroutinefunction(view_func):
+        # 未经 rpc 包装的 async 视图，同样交给共享事件循环执行
+        view_func = _async_view(view_func)
+    return view_func
+
+
+def _async_view(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_coroutine(func(*args, **kwargs))
+
+    return wrapper
+
+
+class LazyViewFunc(object):
+    """
+    按需导入的视图函数：路由按清单注册，第一次被调用时才导入视图模块并绑定实例方法。
+
+    批量接口用到的 _rpc_invoke / _is_stream / __self__ 同样在访问时才解析。
+    """
+
+    # (模块, 类名) -> 视图类实例，同一个类的所有路由共用一个实例
+    _instances = {}
+    _lock = threading.RLock()
+
+    def __init__(self, module, cls_name, method_name):
+        self.module = module
+        self.cls_name = cls_name
+        self.method_name = method_name
+        # Flask 以 __name__ 作为 endpoint，与直接注册绑定方法时保持一致
+        self.__name__ = method_name
+        self._target = None
+
+    def resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                target = self._target
+                if target is None:
+                    key = (self.module, self.cls_name)
+                    instance = self._instances.get(key)
+                    if instance is None:
+                        cls = importlib.import_module(self.module)
+                        for name in self.cls_name.split('.'):
+                            cls = getattr(cls, name)
+                        instance = self._instances[key] = cls()
+                    target = self._target = _bind_view(instance, self.method_name)
+        return target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    @property
+    def __self__(self):
+        return self.resolve().__self__
+
+    @property
+    def _rpc_invoke(self):
+        return self.resolve()._rpc_invoke
+
+    @property
+    def _is_stream(self):
+        return getattr(self.resolve(), '_is_stream', False)
+
+    def __repr__(self):
+        return f'<LazyViewFunc {self.module}.{self.cls_name}.{self.method_name}>'
 
 
 def register_all_views(app, views_folder='views'):
     """
-    自动注册views文件夹下所有视图类的路由
+    注册views文件夹下所有视图类的路由，以及框架内置路由（批量接口、指标、健康检查）
+
+    路由来自路由清单（见 app/views/_manifest.py），视图模块在第一次请求时才导入
     """
-    # 获取views文件夹的绝对路径
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    views_dir = os.path.join(base_dir, views_folder)
-
-    # 遍历views文件夹下的所有Python文件
-    for root, dirs, files in os.walk(views_dir):
-        for file in files:
-            if file.endswith('.py') and not file.startswith('__'):
-                # 构建模块路径
-                rel_path = os.path.relpath(root, base_dir)
-                module_path = f"app.{'.'.join(rel_path.split(os.sep))}.{file[:-3]}"
-
-                try:
-                    # 导入模块
-                    module = importlib.import_module(module_path)
-
-                    # 遍历模块中的所有成员
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        # 检查是否是LoginRequiredDispatchView的子类
-                        if (isinstance(attr, type) and
-                                issubclass(attr, LoginRequiredDispatchView) and
-                                attr != LoginRequiredDispatchView):
-                            # 注册视图类的路由
-                            attr.register(app)
-                            print(f"Registered routes for {attr.__name__}")
-
-                except Exception as e:
-                    print(f"Error loading module {module_path}: {str(e)}")
\ No newline at end of file
+    app.add_url_rule(BATCH_PATH, view_func=rpc_batch, methods=['POST'])
+    app.add_url_rule('/_metrics', view_func=rpc_metrics, methods=['GET'])
+    app.add_url_rule('/_health/db', view_func=db_health, methods=['GET'])
+
+    manifest = get_manifest(LoginRequiredDispatchView, views_folder)
+    for view in manifest['views']:
+        for route in view['routes']:
+            view_func = LazyViewFunc(view['module'], view['class'], route['attr'])
+            app.add_url_rule(route['rule'], view_func=view_func, methods=route['methods'])
+            # 登记到批量接口
+            register_route(route['rule'], view_func, route['methods'])
+        logger.debug('Registered routes for %s', view['class'])
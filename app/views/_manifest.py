@@ -0,0 +1,182 @@
+# coding: utf-8
+
+"""
+视图路由清单。
+
+启动时不再逐个导入 views 下的模块来发现路由：路由表（模块、类、方法、URL、HTTP 方法）
+在部署时（或首次启动时）生成一次，写入 config.ROUTE_MANIFEST 指定的 JSON 文件，
+并以 views 下所有 .py 文件内容的指纹作为 key。之后 worker 启动只需读一个文件，
+视图模块在其路由第一次被请求时才导入（见 app.views.LazyViewFunc）。
+
+views 下任一文件改动都会使指纹失效，下次启动自动重新生成；部署脚本中会强制重新生成：
+
+    python -m app.views._manifest
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import logging
+import os
+import os.path as osp
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+APP_DIR = osp.dirname(osp.dirname(osp.abspath(__file__)))
+
+
+def iter_view_modules(views_folder: str = 'views') -> Iterator[Tuple[str, str]]:
+    """
+    遍历 views 目录下的视图模块，按路径排序，返回 (模块路径, 文件路径)。
+
+    以下划线开头的文件（__init__.py、本模块等）不是视图模块，跳过。
+    """
+    views_dir = osp.join(APP_DIR, views_folder)
+    for root, dirs, files in os.walk(views_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith('.py') and not file.startswith('_'):
+                rel_path = osp.relpath(osp.join(root, file[:-3]), APP_DIR)
+                yield 'app.' + '.'.join(rel_path.split(os.sep)), osp.join(root, file)
+
+
+def fingerprint(views_folder: str = 'views') -> str:
+    """views 下所有视图模块（路径 + 内容）的指纹"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(b'%d' % MANIFEST_VERSION)
+    for module_path, file_path in iter_view_modules(views_folder):
+        digest.update(module_path.encode('utf-8') + b'\0')
+        with open(file_path, 'rb') as fr:
+            digest.update(fr.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def build_manifest(base_cls: type, views_folder: str = 'views',
+                   fp: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    导入所有视图模块，收集 base_cls 子类的路由。
+
+    Returns:
+        (清单, 是否完整)；有模块导入失败时清单不完整，不应写入文件
+    """
+    complete = True
+    views = []
+    seen = set()
+    for module_path, _ in iter_view_modules(views_folder):
+        try:
+            module = importlib.import_module(module_path)
+        except Exception:
+            complete = False
+            logger.exception('load views module %s failed', module_path)
+            continue
+
+        for attr_name in dir(module):
+            attr = getattr(module, attr_name)
+            if not (isinstance(attr, type) and issubclass(attr, base_cls) and attr is not base_cls):
+                continue
+            # 其他视图模块中导入进来的类只登记一次
+            key = (attr.__module__, attr.__qualname__)
+            if key in seen:
+                continue
+            seen.add(key)
+            views.append({
+                'module': attr.__module__,
+                'class': attr.__qualname__,
+                'routes': [
+                    {'rule': rule, 'attr': method_name, 'methods': list(methods)}
+                    for rule, method_name, methods in attr.iter_routes()
+                ],
+            })
+
+    return {
+        'version': MANIFEST_VERSION,
+        'fingerprint': fp or fingerprint(views_folder),
+        'views': views,
+    }, complete
+
+
+def load_manifest(path: Optional[str], fp: str) -> Optional[Dict[str, Any]]:
+    """读取清单，不存在、损坏或指纹不一致时返回 None"""
+    if not path or not osp.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as fr:
+            manifest = json.load(fr)
+    except (OSError, ValueError) as exc:
+        logger.warning('load route manifest %s failed: %s', path, exc)
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('fingerprint') != fp:
+        return None
+    return manifest
+
+
+def write_manifest(path: Optional[str], manifest: Dict[str, Any]) -> None:
+    """写入清单（先写临时文件再原子替换，多个 worker 同时生成时互不影响）"""
+    if not path:
+        return
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(osp.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as fw:
+            json.dump(manifest, fw, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning('write route manifest %s failed: %s', path, exc)
+
+
+def manifest_path() -> Optional[str]:
+    import config
+
+    return getattr(config, 'ROUTE_MANIFEST', None)
+
+
+def get_manifest(base_cls: type, views_folder: str = 'views', force: bool = False) -> Dict[str, Any]:
+    """
+    取路由清单：指纹一致时直接读文件，否则导入视图模块重新生成并写回
+    """
+    path = manifest_path()
+    fp = fingerprint(views_folder)
+    manifest = None if force else load_manifest(path, fp)
+    if manifest is not None:
+        return manifest
+
+    manifest, complete = build_manifest(base_cls, views_folder, fp)
+    if complete:
+        write_manifest(path, manifest)
+        logger.info('route manifest rebuilt: %s routes in %s views',
+                    sum(len(v['routes']) for v in manifest['views']), len(manifest['views']))
+    return manifest
+
+
+def main() -> None:
+    from app.views import LoginRequiredDispatchView
+
+    manifest, complete = build_manifest(LoginRequiredDispatchView)
+    if not complete:
+        raise SystemExit('route manifest is incomplete, check the errors above')
+    path = manifest_path()
+    write_manifest(path, manifest)
+    for view in manifest['views']:
+        for route in view['routes']:
+            print('%-8s %s -> %s.%s' % (','.join(route['methods']), route['rule'], view['module'], route['attr']))
+    print('route manifest written to %s' % path)
+
+
+__all__ = [
+    'build_manifest',
+    'fingerprint',
+    'get_manifest',
+    'iter_view_modules',
+    'load_manifest',
+    'write_manifest',
+]
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,31 @@
 from flask import Blueprint, jsonify, request
 
+import config
 from app.services.basic_service import BasicSvr
 from app.views import LoginRequiredDispatchView
 from app._webapi import *
 
 basic_app = Blueprint('basic', __name__)
 
+# 单个账号的字段（add_account 的入参）
+ACCOUNT_FIELDS = dict(
+    securityCode=required.StringField(desc='安全码'),
+    cardNumber=required.StringField(desc='安全码'),
+    month=required.IntegerField(desc='月'),
+    year=required.StringField(desc='年'),
+)
+# 批量导入时每一行的字段，在 add_account 的基础上可以带邮编
+IMPORT_ACCOUNT_FIELDS = dict(
+    ACCOUNT_FIELDS,
+    postalCode=optional.StringField(desc='邮编', default=''),
+)
+IMPORT_ACCOUNT_PLAN = compile_schema(IMPORT_ACCOUNT_FIELDS)
+
 
 class Basic(LoginRequiredDispatchView):
     @rpc(
         '添加账号',
-        args=dict(
-            securityCode=required.StringField(desc='安全码'),
-            cardNumber=required.StringField(desc='安全码'),
-            month=required.IntegerField(desc='月'),
-            year=required.StringField(desc='年'),
-        ),
+        args=ACCOUNT_FIELDS,
         returns=dict(
 
     ))
@@ -23,3 +33,72 @@ class Basic(LoginRequiredDispatchView):
         svr = BasicSvr()
         svr.add_account(req)
         rsp.data = rsp.new()
+
+    @rpc(
+        '批量添加账号',
+        args=dict(
+            accounts=required.MessageField(desc='账号列表，每项字段同 add_account，另可带 postalCode'),
+            batch_size=optional.IntegerField(desc='每批写入行数，超过 max_batch_size 时按 max_batch_size',
+                                             default=config.ACCOUNT_IMPORT['batch_size']),
+        ),
+        returns=dict(
+            inserted=required.IntegerField(desc='写入行数'),
+            failed=optional.MessageField(desc='失败的行 [{index, error}]'),
+        ),
+        input_type=(InputType.JSON, InputType.MSGPACK),
+    )
+    def add_accounts(self, req, rsp):
+        accounts = req.accounts
+        max_rows = config.ACCOUNT_IMPORT['max_rows']
+        if not isinstance(accounts, list):
+            raise ValidationError('必须是列表', field_name='accounts',
+                                  error_type=ValidationError.ERROR_INVALID_TYPE)
+        if len(accounts) > max_rows:
+            raise ValidationError('单次最多导入 %d 条' % max_rows, field_name='accounts',
+                                  error_type=ValidationError.ERROR_INVALID_VALUE)
+
+        # 先整体校验一遍，校验不通过的行不写入，与写入失败的行一起按下标返回
+        valid, index_map, failed = [], [], []
+        for i, account in enumerate(accounts):
+            try:
+                if not isinstance(account, dict):
+                    raise ValidationError('必须是对象', error_type=ValidationError.ERROR_INVALID_TYPE)
+                valid.append(IMPORT_ACCOUNT_PLAN(account))
+                index_map.append(i)
+            except ValidationError as e:
+                failed.append(dict(index=i, error=e.to_dict()))
+
+        batch_size = min(max(1, req.batch_size), config.ACCOUNT_IMPORT['max_batch_size'])
+        svr = BasicSvr()
+        inserted, errors = svr.add_accounts(valid, batch_size=batch_size)
+        failed.extend(dict(index=index_map[i], error=dict(error='INSERT_FAILED', message=message))
+                      for i, message in errors)
+        failed.sort(key=lambda f: f['index'])
+
+        rsp.data = dict(inserted=inserted, failed=failed)
+
+    @rpc(
+        '账号列表',
+        args=dict(
+            cursor=optional.StringField(desc='游标翻页：第一页传 first，之后传上一页返回的 next_cursor；'
+                                             '不传时按 page / pageSize 分页'),
+            page=optional.IntegerField(desc='页码', default=1),
+            pageSize=optional.IntegerField(desc='每页条数', default=20),
+        ),
+        returns=dict(
+            total=required.IntegerField(desc='总数'),
+            is_estimate=optional.MessageField(desc='total 是否为估算值', default=False),
+            next_cursor=optional.StringField(desc='下一页的游标，为空时已到末页（或按页码分页）'),
+            items=optional.MessageField(desc='账号列表，不含安全码'),
+        ),
+    )
+    def list_accounts(self, req, rsp):
+        svr = BasicSvr()
+        total, items, page_info = svr.list_accounts(req)
+        rsp.data = dict(
+            total=total,
+            is_estimate=page_info['is_estimate'],
+            next_cursor=page_info['next_cursor'],
+            items=[dict(id=item.id, cardNumber=item.cardNumber, month=item.month, year=item.year,
+                        postalCode=item.postalCode, create_at=item.create_at) for item in items],
+        )
@@ -0,0 +1,49 @@
+# coding: utf-8
+"""
+gunicorn 配置（preload 模式）。
+
+    gunicorn -c conf/gunicorn.conf.py run:my_app
+
+preload_app = True 时应用只在 master 中导入一次，worker fork 后共享只读内存页，
+启动更快、每个 worker 占用的内存更少。worker 中继承来的数据库连接池、事件循环与指标状态
+由 app.utils.fork_utils 在 fork 后自动重置（os.register_at_fork），post_fork 中再显式调用一次兜底。
+
+多个 worker 的 /_metrics 需要共享快照目录：未设置 METRICS_DIR（且 config.METRICS 未配置 multiproc_dir）时
+默认使用临时目录下按端口区分的 wizard-metrics-<port>，master 启动时清空。
+"""
+
+import glob
+import os
+import os.path as osp
+import tempfile
+
+bind = os.environ.get('WIZARD_BIND', '0.0.0.0:5005')
+# 在 preload 导入应用之前设置，app.utils.metric_utils 创建全局指标注册表时读取
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR', osp.join(tempfile.gettempdir(), 'wizard-metrics-%s' % bind.rsplit(':', 1)[-1]))
+# 默认 4 个 worker，与原启动参数 -w 4 一致
+workers = int(os.environ.get('WIZARD_WORKERS', 4))
+# async def 视图在每个 worker 的共享事件循环上执行，请求线程只负责等待；
+# 等待期间线程仍被占用，每个 worker 同时进行中的请求最多 threads 个（含 async 视图），
+# 整机上限 workers × threads，按 峰值 QPS × 平均耗时 估算后设置 WIZARD_THREADS。
+# 默认 256：每个 worker 可同时挂起数百个 LLM 调用，等待中的线程只占栈内存；
+# 同步视图的并发仍受数据库连接池 max_connections 限制（取不到连接时按连接池 timeout 等待）
+worker_class = 'gthread'
+threads = int(os.environ.get('WIZARD_THREADS', 256))
+timeout = 120
+preload_app = True
+
+accesslog = '/var/log/wizard/access.log'
+errorlog = '/var/log/wizard/error.log'
+
+
+def on_starting(server):
+    # 上次运行留下的快照属于已经不存在的进程，计数从零开始
+    for path in glob.glob(osp.join(metrics_dir, '*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    from app.utils.fork_utils import after_fork
+
+    after_fork()
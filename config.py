@@ -115,6 +115,72 @@ APILIST_PATH = None
 # 请求远端api服务的地址，仅在APILIST_PATH已设置的情况下有效
 REMOTE_APILIST_PATH = None
 
+# rpc 指标配置：multiproc_dir 为多 worker 共享的快照目录，None 时取环境变量 METRICS_DIR
+# （conf/gunicorn.conf.py 默认设置），都没有时 /_metrics 只返回当前进程的数据
+METRICS = dict(
+    multiproc_dir=None,
+    flush_interval=5,
+)
+
+# rpc 并发隔离舱：rpc(bulkhead='llm') 或视图类属性 bulkhead = 'llm' 引用
+# max_concurrent 最大并发，max_queue 最大排队数，queue_timeout 排队最长等待秒数
+BULKHEADS = dict(
+    llm=dict(max_concurrent=8, max_queue=16, queue_timeout=1, retry_after=5),
+)
+
+# 列表 / 计数查询结果缓存（见 app/utils/query_cache.py），增删改时按 (表, 数据范围) 失效
+# redis：失效代数是否保存在 Redis（多 worker 间同步失效），None 表示配置了 REDIS 时自动使用
+# enabled：None 表示只在代数保存在 Redis 时启用；进程内代数在多 worker 下会读到其他 worker 写入前的旧结果
+QUERY_CACHE = dict(
+    enabled=None,
+    maxsize=2048,
+    ttl=60,
+    redis=None,
+)
+
+# 列表接口 total 的计数方式（app.consts.basic_const.CountStrategy）所用参数：
+# cached_ttl / cached_maxsize：cached 模式下计数的缓存时间（秒）与条目上限
+# estimate_threshold：estimate 模式下 EXPLAIN 估算行数不低于该值时直接返回估算值，否则精确计数
+LIST_COUNT = dict(
+    cached_ttl=30,
+    cached_maxsize=4096,
+    estimate_threshold=100000,
+)
+
+# 批量导入账号（/basic/add_accounts）：每批 insert_many 的默认行数、请求可指定的最大行数与单次请求的最大行数
+# max_batch_size 限制单条 INSERT 的大小，避免超过 max_allowed_packet 或长时间持有锁
+ACCOUNT_IMPORT = dict(
+    batch_size=500,
+    max_batch_size=1000,
+    max_rows=10000,
+)
+
+# SQL 耗时分析（见 app/utils/sql_profiler.py），库配置中的 profile=True/False 可单独覆盖 enabled
+# slow_ms：慢查询阈值；explain_sample_rate：慢查询中附带 EXPLAIN 的比例；
+# attach_to_response：debug 模式下在 rpc 响应中附带本请求的 SQL 汇总（_sql 字段）
+SQL_PROFILER = dict(
+    enabled=False,
+    slow_ms=200,
+    explain_sample_rate=0.1,
+    max_statements=100,
+    attach_to_response=True,
+)
+
+# 软删除归档（见 app/utils/archiver.py）：delete_at 早于 retain_days 天的行移到 <表名>_archive
+# tables：只处理这些表，None 为全部模型；batch_size：每批的主键区间大小；pause：批次之间暂停的秒数；
+# interval：常驻运行（--loop）时两轮之间的秒数
+ARCHIVE = dict(
+    tables=None,
+    retain_days=90,
+    batch_size=1000,
+    pause=0.2,
+    interval=3600,
+)
+
+# 路由清单文件（见 app/views/_manifest.py），views 下文件的指纹变化时自动重新生成；
+# 设为 None 时每次启动都导入全部视图模块，不写清单
+ROUTE_MANIFEST = osp.join(PROJECT_ROOT, '.cache', 'route_manifest.json')
+
 # 显示路由信息
 LIST_ROUTES = True
 LLM = None
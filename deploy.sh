@@ -32,24 +32,32 @@ if [ ! -d ".venv" ]; then
 fi
 
 # 3. 激活虚拟环境
-echo -e "${GREEN}[1/8] 激活虚拟环境${NC}"
+echo -e "${GREEN}[1/10] 激活虚拟环境${NC}"
 source .venv/bin/activate
 
 # 4. 更新代码（如果使用 Git）
 if [ -d ".git" ]; then
-    echo -e "${GREEN}[2/8] 更新代码${NC}"
+    echo -e "${GREEN}[2/10] 更新代码${NC}"
     git pull || echo -e "${YELLOW}警告: Git pull 失败，继续部署...${NC}"
 else
-    echo -e "${YELLOW}[2/8] 跳过 Git 更新（非 Git 仓库）${NC}"
+    echo -e "${YELLOW}[2/10] 跳过 Git 更新（非 Git 仓库）${NC}"
 fi
 
 # 5. 安装/更新依赖
-echo -e "${GREEN}[3/8] 安装依赖${NC}"
+echo -e "${GREEN}[3/10] 安装依赖${NC}"
 pip install -q --upgrade pip
 pip install -q -r requirements.txt
 
+# 生成路由清单，worker 启动时直接读取，不再逐个导入视图模块
+echo -e "${GREEN}[4/10] 生成路由清单${NC}"
+python -m app.views._manifest || { echo -e "${RED}错误: 路由清单生成失败${NC}"; exit 1; }
+
+# 执行表结构迁移：创建缺失的数据表、补建模型声明的索引（导入模型时不再建表）
+echo -e "${GREEN}[5/10] 执行表结构迁移${NC}"
+python -m app.models.migrations || { echo -e "${RED}错误: 表结构迁移失败${NC}"; exit 1; }
+
 # 6. 生成 Supervisor 配置
-echo -e "${GREEN}[4/8] 生成 Supervisor 配置${NC}"
+echo -e "${GREEN}[6/10] 生成 Supervisor 配置${NC}"
 if [ -f "generate_supervisor_conf.py" ]; then
     python generate_supervisor_conf.py
 else
@@ -57,13 +65,13 @@ else
 fi
 
 # 7. 创建日志目录
-echo -e "${GREEN}[5/8] 创建日志目录${NC}"
+echo -e "${GREEN}[7/10] 创建日志目录${NC}"
 LOG_DIR="/var/log/wizard"
 sudo mkdir -p "$LOG_DIR"
 sudo chown $USER:$USER "$LOG_DIR" 2>/dev/null || echo -e "${YELLOW}注意: 可能需要手动设置日志目录权限${NC}"
 
 # 8. 安装 Supervisor 配置文件
-echo -e "${GREEN}[6/8] 安装 Supervisor 配置${NC}"
+echo -e "${GREEN}[8/10] 安装 Supervisor 配置${NC}"
 if [ -f "supervisor.conf" ]; then
     sudo cp supervisor.conf /etc/supervisor/conf.d/wizard.conf
     sudo chmod 644 /etc/supervisor/conf.d/wizard.conf
@@ -74,12 +82,12 @@ else
 fi
 
 # 9. 重新加载 Supervisor 配置
-echo -e "${GREEN}[7/8] 重新加载 Supervisor 配置${NC}"
+echo -e "${GREEN}[9/10] 重新加载 Supervisor 配置${NC}"
 sudo supervisorctl reread
 sudo supervisorctl update
 
 # 10. 重启服务
-echo -e "${GREEN}[8/8] 重启服务${NC}"
+echo -e "${GREEN}[10/10] 重启服务${NC}"
 sudo supervisorctl restart wizard
 
 # 等待服务启动
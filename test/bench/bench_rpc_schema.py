@@ -0,0 +1,96 @@
+# coding: utf-8
+"""
+rpc 参数校验微基准：对比逐次解释 schema 的旧实现与装饰时预编译的 SchemaPlan。
+
+用法：
+    python test/bench/bench_rpc_schema.py [循环次数]
+"""
+
+import os.path as osp
+import sys
+import timeit
+import types
+
+PROJECT_ROOT = osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+# 只加载 rpc 层，跳过 app/__init__ 中的 Flask 应用与数据库初始化
+if 'app' not in sys.modules:
+    _pkg = types.ModuleType('app')
+    _pkg.__path__ = [osp.join(PROJECT_ROOT, 'app')]
+    sys.modules['app'] = _pkg
+
+from app._webapi import ValidationError, compile_schema, optional, required  # noqa: E402
+
+
+def legacy_validate_input(data, args_schema):
+    """优化前 validate_input 的实现，作为对照组"""
+    if not args_schema:
+        return {}
+
+    result = {}
+    for field_name, field in args_schema.items():
+        value = data.get(field_name)
+
+        if getattr(field, '_is_required', False):
+            if value is None or value == '':
+                raise ValidationError(
+                    message=f'必填字段不能为空',
+                    field_name=field_name,
+                    error_type=ValidationError.ERROR_MISSING_REQUIRED,
+                    value=value
+                )
+
+        if value is not None and value != '':
+            try:
+                result[field_name] = field.validate(value)
+            except ValidationError:
+                raise
+            except Exception as e:
+                raise ValidationError(
+                    message=f'字段值验证失败: {str(e)}',
+                    field_name=field_name,
+                    error_type=ValidationError.ERROR_INVALID_VALUE,
+                    value=value
+                )
+        else:
+            result[field_name] = field.default
+
+    return result
+
+
+ARGS = dict(
+    group_id=required.IntegerField(desc='集团id'),
+    team_id=optional.IntegerField(desc='公司id', default=0),
+    project_id=optional.IntegerField(desc='项目id', default=0),
+    name=required.StringField(desc='名称'),
+    kw=optional.StringField(desc='关键字', default=''),
+    page=optional.IntegerField(desc='页码', default=1),
+    pageSize=optional.IntegerField(desc='每页条数', default=20),
+    extra=optional.MessageField(desc='扩展信息'),
+)
+
+DATA = {
+    'group_id': '1001',
+    'team_id': '12',
+    'name': '检查项',
+    'page': '3',
+    'extra': {'a': 1},
+}
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    plan = compile_schema(ARGS)
+    assert plan(DATA) == legacy_validate_input(DATA, ARGS)
+
+    legacy = min(timeit.repeat(lambda: legacy_validate_input(DATA, ARGS), number=number, repeat=5))
+    compiled = min(timeit.repeat(lambda: plan(DATA), number=number, repeat=5))
+
+    print('legacy   : %.3f us/call' % (legacy / number * 1e6))
+    print('compiled : %.3f us/call' % (compiled / number * 1e6))
+    print('speedup  : %.2fx' % (legacy / compiled))
+
+
+if __name__ == '__main__':
+    main()
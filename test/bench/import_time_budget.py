@@ -0,0 +1,103 @@
+# coding: utf-8
+"""
+启动导入耗时预算检查：用 python -X importtime 在子进程中导入指定模块，
+统计总耗时并列出最慢的模块，超出预算或加载了禁止的重量级依赖（LangChain / LangGraph 等）时返回非 0。
+
+web worker 只应加载 Flask / peewee / rpc 层，AI 相关依赖由用到它们的接口按需导入。
+
+用法：
+    python test/bench/import_time_budget.py                       # 检查 import app
+    python test/bench/import_time_budget.py app.utils app._webapi --budget-ms 300
+    python test/bench/import_time_budget.py app --top 30 --allow openai
+"""
+
+import argparse
+import os
+import os.path as osp
+import subprocess
+import sys
+
+PROJECT_ROOT = osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__))))
+
+# 非 AI worker 启动时不应加载的顶层包
+FORBIDDEN_PACKAGES = (
+    'langchain',
+    'langchain_core',
+    'langchain_community',
+    'langchain_openai',
+    'langgraph',
+    'langsmith',
+    'openai',
+    'tiktoken',
+    'numpy',
+)
+
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure(module):
+    """
+    在干净的子进程中导入模块，返回 [(模块名, 自身耗时 us, 累计耗时 us, 嵌套深度), ...]
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get('PYTHONPATH')]))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError('import %s failed:\n%s' % (module, proc.stderr[-3000:]))
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def check(module, budget_ms, top, forbidden):
+    rows = measure(module)
+    # 深度为 0（缩进 1 个空格）的是顶层导入，累计耗时之和即总耗时
+    total_ms = sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000.0
+    loaded = {name.split('.')[0] for name, _, _, _ in rows}
+    bad = sorted(loaded & set(forbidden))
+
+    print('import %s: %.1f ms (budget %d ms), %d modules' % (module, total_ms, budget_ms, len(rows)))
+    print('  slowest (self time):')
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print('    %8.1f ms  %8.1f ms  %s' % (self_us / 1000.0, cumulative_us / 1000.0, name))
+
+    ok = True
+    if bad:
+        ok = False
+        print('  FAIL: forbidden packages loaded: %s' % ', '.join(bad))
+    if total_ms > budget_ms:
+        ok = False
+        print('  FAIL: over budget by %.1f ms' % (total_ms - budget_ms))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import time budget check')
+    parser.add_argument('modules', nargs='*', default=['app'], help='要检查的模块，默认 app')
+    parser.add_argument('--budget-ms', type=int, default=DEFAULT_BUDGET_MS, help='每个模块的导入耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=15, help='列出最慢的前 N 个模块')
+    parser.add_argument('--allow', action='append', default=[], help='允许加载的禁止包，可重复指定')
+    opts = parser.parse_args()
+
+    forbidden = [name for name in FORBIDDEN_PACKAGES if name not in opts.allow]
+    results = []
+    for module in opts.modules:
+        try:
+            results.append(check(module, opts.budget_ms, opts.top, forbidden))
+        except RuntimeError as exc:
+            print(exc)
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# coding: utf-8
+"""
+单元测试（标准库 unittest），在项目根目录执行：
+
+    python -m unittest discover -s test/unit
+
+各用例模块首先 import 本模块：它只加载被测模块，跳过 app/__init__ 中的 Flask 应用与数据库初始化；
+用到数据库的用例使用内存 SQLite，不连接 config 中的 MySQL。
+"""
+
+import os.path as osp
+import sys
+import types
+
+PROJECT_ROOT = osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+if 'app' not in sys.modules:
+    _pkg = types.ModuleType('app')
+    _pkg.__path__ = [osp.join(PROJECT_ROOT, 'app')]
+    sys.modules['app'] = _pkg
@@ -0,0 +1,110 @@
+# coding: utf-8
+"""批量 rpc：路由与方法校验、串行 / 并发执行、子调用 g 的隔离与合并"""
+
+import threading
+import unittest
+
+import orjson
+from flask import Flask, g
+
+import _env  # noqa: F401
+from app._webapi.batch import BATCH_PATH, MAX_BATCH_ITEMS, register_route, rpc_batch
+from app.utils.sql_profiler import RequestProfile
+
+
+class EchoView(object):
+    """模拟 rpc 视图：_rpc_invoke 返回 (响应体, 状态码)"""
+
+    def echo(self):
+        pass
+
+    def read(self):
+        pass
+
+
+def _invoke(self, params):
+    seen = g.get('unit_seen')
+    g.unit_seen = params.get('n')
+    g._db_write_pins = {'t%s' % params.get('n')}
+    profile = g._sql_profile = RequestProfile()
+    profile.record('wz', 'SELECT %s' % params.get('n'), 0.001, 1, 'unit')
+    return {'result': 0, 'message': 'ok', 'data': dict(params, seen=seen,
+                                                       thread=threading.current_thread().name)}, 200
+
+
+EchoView.echo._rpc_invoke = _invoke
+EchoView.read._rpc_invoke = _invoke
+
+
+class BatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        view = EchoView()
+        register_route('/unit/echo', view.echo, ['POST'])
+        register_route('/unit/read', view.read, ['GET'])
+
+        cls.merged = merged = []
+        app = Flask(__name__)
+
+        @app.route('/tiger' + BATCH_PATH, methods=['POST'])
+        def batch():
+            response = rpc_batch()
+            profile = g.get('_sql_profile')
+            merged.append((g.get('_db_write_pins'), profile and profile.count))
+            return response
+
+        cls.client = app.test_client()
+
+    def setUp(self):
+        del self.merged[:]
+
+    def post(self, body, **kwargs):
+        return self.client.post('/tiger' + BATCH_PATH, json=body, **kwargs)
+
+    def test_serial(self):
+        resp = self.post({'items': [
+            {'path': '/unit/echo', 'params': {'n': 1}},
+            {'path': '/tiger/unit/read', 'method': 'get', 'params': {'n': 2}},
+        ]})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json['data']
+        self.assertEqual([d['data']['n'] for d in data], [1, 2])
+        # 串行时共用批量请求的 g
+        self.assertEqual(data[1]['data']['seen'], 1)
+
+    def test_item_errors(self):
+        data = self.post([
+            {'path': '/unit/missing'},
+            {'path': '/unit/read', 'params': {}},
+            {'path': '/unit/echo', 'params': [1]},
+            {'params': {}},
+        ]).json['data']
+        self.assertTrue(all(d['result'] == 1 for d in data))
+        self.assertIn('Unknown rpc path', data[0]['message'])
+        self.assertIn('Method POST is not allowed', data[1]['message'])
+        self.assertIn('"params" must be an object', data[2]['message'])
+        self.assertIn('"path" is required', data[3]['message'])
+
+    def test_parallel_isolates_and_merges_g(self):
+        items = [{'path': '/unit/echo', 'params': {'n': n}} for n in range(4)]
+        resp = self.post({'items': items, 'parallel': True})
+        data = resp.json['data']
+        self.assertEqual([d['data']['n'] for d in data], [0, 1, 2, 3])
+        # 每个子调用有独立的 g，看不到其他子调用写入的值
+        self.assertTrue(all(d['data']['seen'] is None for d in data))
+        self.assertTrue(all(d['data']['thread'] != threading.current_thread().name for d in data))
+        pins, count = self.merged[0]
+        self.assertEqual(pins, {'t0', 't1', 't2', 't3'})
+        self.assertEqual(count, 4)
+
+    def test_invalid_body(self):
+        self.assertEqual(self.post({'items': []}).status_code, 400)
+        self.assertEqual(self.post({'items': [{}] * (MAX_BATCH_ITEMS + 1)}).status_code, 400)
+        resp = self.client.post('/tiger' + BATCH_PATH, data=b'{bad', content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(orjson.loads(resp.data)['result'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# coding: utf-8
+"""SingleFlight：同 key 的并发调用只执行一次"""
+
+import threading
+import time
+import unittest
+
+import _env  # noqa: F401
+from app._webapi.coalesce import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def run_concurrently(self, flights, key, fn, n=5):
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker) for _ in range(n)]
+        for t in threads:
+            t.start()
+        return threads, results, errors
+
+    def test_shared_execution(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return 'value'
+
+        threads, results, errors = self.run_concurrently(flights, 'k', fn)
+        self.assertTrue(started.wait(2))
+        # 留出时间让其余调用进入等待后再放行
+        time.sleep(0.2)
+        release.set()
+        for t in threads:
+            t.join(2)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('value', False)] + [('value', True)] * 4)
+        self.assertEqual(len(flights), 0)
+
+    def test_error_propagates_to_waiters(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fn():
+            release.wait(2)
+            raise KeyError('x')
+
+        threads, results, errors = self.run_concurrently(flights, 'k', fn, n=3)
+        release.set()
+        for t in threads:
+            t.join(2)
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(e, KeyError) for e in errors))
+
+    def test_sequential_calls_rerun(self):
+        flights = SingleFlight()
+        counter = iter(range(10))
+        self.assertEqual(flights.do('k', lambda: next(counter)), (0, False))
+        self.assertEqual(flights.do('k', lambda: next(counter)), (1, False))
+        self.assertEqual(flights.do('other', lambda: 'o'), ('o', False))
+
+
+if __name__ == '__main__':
+    unittest.main()
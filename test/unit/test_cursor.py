@@ -0,0 +1,133 @@
+# coding: utf-8
+"""游标的编码 / 解析与 _model_db_page 的游标翻页"""
+
+import datetime
+import unittest
+
+import peewee
+
+import _env  # noqa: F401
+from app._webapi import RequestObject
+from app.consts.errors import ErrorNum
+from app.models import BaseModel
+from app.services.common_help_services import HelperSvcApi
+from app.utils.model_utils import (FIRST_CURSOR, InvalidCursor, decode_cursor, encode_cursor, seek_condition,
+                                   seek_fields, seek_order)
+
+database = peewee.SqliteDatabase(':memory:')
+
+
+class Item(BaseModel):
+    group_id = peewee.IntegerField()
+    team_id = peewee.IntegerField(null=True)
+    project_id = peewee.IntegerField(null=True)
+    name = peewee.CharField()
+
+    class Meta:
+        database = database
+        table_name = 'unit_cursor_item'
+
+
+class NoCreateAt(peewee.Model):
+    name = peewee.CharField()
+
+    class Meta:
+        database = database
+
+
+BASE_TIME = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+
+def make_req(**kwargs):
+    req = RequestObject()
+    req.update(dict(dict(group_id=1, page=1, pageSize=2), **kwargs))
+    return req
+
+
+class CursorCodecTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        fields = seek_fields(Item)
+        self.assertEqual([f.name for f in fields], ['create_at', 'id'])
+        row = Item(id=7, create_at=BASE_TIME)
+        cursor = encode_cursor(fields, row)
+        self.assertNotIn('=', cursor)
+        self.assertNotEqual(cursor, FIRST_CURSOR)
+        self.assertEqual(decode_cursor(fields, cursor), [BASE_TIME, 7])
+
+    def test_without_create_at(self):
+        fields = seek_fields(NoCreateAt)
+        self.assertEqual([f.name for f in fields], ['id'])
+        self.assertEqual(decode_cursor(fields, encode_cursor(fields, NoCreateAt(id=3))), [3])
+
+    def test_invalid(self):
+        fields = seek_fields(Item)
+        other = encode_cursor(seek_fields(NoCreateAt), NoCreateAt(id=3))
+        for cursor in ('bogus', FIRST_CURSOR, '!!', other, 'WzJd'):
+            with self.assertRaises(InvalidCursor, msg=cursor):
+                decode_cursor(fields, cursor)
+
+    def test_seek_condition(self):
+        fields = seek_fields(Item)
+        sql, params = Item.select().where(seek_condition(fields, [BASE_TIME, 7])).sql()
+        self.assertIn('OR', sql)
+        self.assertEqual(len(params), 3)
+        self.assertEqual(len(seek_order(fields)), 2)
+
+
+class SeekPageTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        database.connect(reuse_if_open=True)
+        database.create_tables([Item])
+        rows = []
+        for i in range(5):
+            # 两两相同的 create_at，翻页要靠 id 区分
+            rows.append(dict(group_id=1, name='n%d' % i, create_at=BASE_TIME + datetime.timedelta(minutes=i // 2),
+                             update_at=BASE_TIME, delete_at=None))
+        rows.append(dict(group_id=2, name='other', create_at=BASE_TIME, update_at=BASE_TIME, delete_at=None))
+        rows.append(dict(group_id=1, name='gone', create_at=BASE_TIME, update_at=BASE_TIME, delete_at=BASE_TIME))
+        Item.insert_many(rows).execute()
+
+    @classmethod
+    def tearDownClass(cls):
+        database.drop_tables([Item])
+        database.close()
+
+    def test_walk_all_pages(self):
+        svc = HelperSvcApi()
+        cursor, names, pages = FIRST_CURSOR, [], 0
+        while cursor:
+            total, items, page_info = svc._model_db_page(Item, make_req(cursor=cursor))
+            self.assertEqual(total, 5)
+            self.assertFalse(page_info['is_estimate'])
+            self.assertLessEqual(len(items), 2)
+            names.extend(item.name for item in items)
+            cursor = page_info['next_cursor']
+            pages += 1
+        self.assertEqual(pages, 3)
+        # (create_at, id) 倒序，不重不漏
+        self.assertEqual(names, ['n4', 'n3', 'n2', 'n1', 'n0'])
+
+    def test_exact_page_size_has_no_extra_page(self):
+        svc = HelperSvcApi()
+        _, items, page_info = svc._model_db_page(Item, make_req(cursor=FIRST_CURSOR, pageSize=5))
+        self.assertEqual(len(items), 5)
+        self.assertIsNone(page_info['next_cursor'])
+
+    def test_without_cursor_uses_offset(self):
+        svc = HelperSvcApi()
+        total, items, page_info = svc._model_db_page(Item, make_req(page=3))
+        self.assertEqual(total, 5)
+        self.assertEqual(len(items), 1)
+        self.assertIsNone(page_info['next_cursor'])
+        self.assertEqual(svc._model_db_list(Item, make_req(page=3)), (total, items))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ErrorNum.ArgError):
+            HelperSvcApi()._model_db_page(Item, make_req(cursor='bogus'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# coding: utf-8
+"""准入控制：隔离舱的并发与排队上限、令牌桶限流、装饰期参数校验"""
+
+import threading
+import time
+import unittest
+
+import _env  # noqa: F401
+from app._webapi.limits import (ERROR_RATE_LIMITED, Bulkhead, RateLimit, RejectedError, TokenBucket, admit,
+                                resolve_admission)
+
+
+class BulkheadTest(unittest.TestCase):
+
+    def test_reject_without_queue(self):
+        bulkhead = Bulkhead('unit-nq', max_concurrent=1)
+        with bulkhead.hold():
+            self.assertEqual(bulkhead.in_flight, 1)
+            with self.assertRaises(RejectedError) as cm:
+                bulkhead.acquire()
+            self.assertEqual(cm.exception.status, 503)
+            self.assertIn('queue full', cm.exception.message)
+        self.assertEqual(bulkhead.in_flight, 0)
+        # 释放后恢复
+        with bulkhead.hold():
+            pass
+
+    def test_queue_then_acquire(self):
+        bulkhead = Bulkhead('unit-q', max_concurrent=1, max_queue=1, queue_timeout=2)
+        bulkhead.acquire()
+        acquired = threading.Event()
+
+        def waiter():
+            bulkhead.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        for _ in range(100):
+            if bulkhead.queued == 1:
+                break
+            time.sleep(0.01)
+        self.assertEqual(bulkhead.queued, 1)
+        # 排队已满，第三个请求立即拒绝
+        with self.assertRaises(RejectedError):
+            bulkhead.acquire()
+
+        bulkhead.release()
+        self.assertTrue(acquired.wait(2))
+        thread.join(2)
+        self.assertEqual((bulkhead.in_flight, bulkhead.queued), (1, 0))
+        bulkhead.release()
+
+    def test_queue_timeout(self):
+        bulkhead = Bulkhead('unit-timeout', max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        with bulkhead.hold():
+            with self.assertRaises(RejectedError) as cm:
+                bulkhead.acquire()
+        self.assertIn('queue timeout', cm.exception.message)
+        self.assertEqual(bulkhead.queued, 0)
+
+    def test_release_on_error(self):
+        bulkhead = Bulkhead('unit-err', max_concurrent=1)
+        with self.assertRaises(KeyError):
+            with admit(bulkhead):
+                raise KeyError('x')
+        self.assertEqual(bulkhead.in_flight, 0)
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_and_refill(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        wait = bucket.take()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 1 / 20.0)
+        time.sleep(wait + 0.02)
+        self.assertEqual(bucket.take(), 0)
+
+    def test_rate_limit(self):
+        limit = RateLimit(rate=1, burst=2, per_user=False)
+        limit.check()
+        limit.check()
+        with self.assertRaises(RejectedError) as cm:
+            with admit(rate_limit=limit):
+                pass
+        self.assertEqual(cm.exception.status, 429)
+        self.assertEqual(cm.exception.error_type, ERROR_RATE_LIMITED)
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+
+
+class ResolveAdmissionTest(unittest.TestCase):
+
+    def test_instances(self):
+        bulkhead, limit = Bulkhead('unit-resolve', max_concurrent=1), RateLimit(rate=1)
+        self.assertEqual(resolve_admission(bulkhead, limit), (bulkhead, limit))
+        self.assertEqual(resolve_admission(), (None, None))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            resolve_admission('unit-not-configured')
+        with self.assertRaises(TypeError):
+            resolve_admission(rate_limit=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# coding: utf-8
+"""指标：线程分片汇总、多 worker 快照合并、已退出 worker 快照的归档"""
+
+import json
+import os
+import os.path as osp
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import _env  # noqa: F401
+from app.utils.metric_utils import DEAD_SNAPSHOT, MetricsRegistry, format_labels
+
+BUCKETS = (0.1, 1.0)
+LABELS = format_labels(endpoint='unit')
+
+
+def exited_pid():
+    """一个已退出进程的 pid"""
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='wizard-metrics-unit-')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def make_registry(self, gauge=None):
+        registry = MetricsRegistry(multiproc_dir=self.dir)
+        registry.counter('unit_total').inc(LABELS, 2)
+        registry.histogram('unit_seconds', buckets=BUCKETS).observe(0.5, LABELS)
+        if gauge is not None:
+            registry.register_collector(lambda: [('unit_in_flight', 'gauge', '', [({'endpoint': 'unit'}, gauge)])])
+        return registry
+
+    def write_snapshot(self, registry, pid):
+        snap = registry.snapshot()
+        snap['pid'] = pid
+        with open(osp.join(self.dir, '%s.json' % pid), 'w') as fw:
+            json.dump(snap, fw)
+
+    def test_thread_shards(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('unit_total')
+        threads = [threading.Thread(target=counter.inc, args=(LABELS,)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counter.inc(LABELS)
+        self.assertEqual(registry.collect_all()['unit_total']['values'], {LABELS: 5})
+
+    def test_merge_workers(self):
+        registry = self.make_registry(gauge=1)
+        # 仍在运行的另一个 worker（父进程）
+        self.write_snapshot(self.make_registry(gauge=3), os.getppid())
+
+        merged = registry.collect_all()
+        self.assertEqual(merged['unit_total']['values'][LABELS], 4)
+        # [<=0.1, <=1.0, +Inf, sum, count]
+        self.assertEqual(merged['unit_seconds']['values'][LABELS], [0, 2, 0, 1.0, 2])
+        self.assertEqual(merged['unit_in_flight']['values'][LABELS], 4)
+
+        text = registry.expose()
+        self.assertIn('unit_seconds_bucket{%s,le="1.0"} 2' % LABELS, text)
+        self.assertIn('unit_seconds_count{%s} 2' % LABELS, text)
+
+    def test_prune_dead(self):
+        registry = self.make_registry(gauge=1)
+        dead_pid = exited_pid()
+        self.write_snapshot(self.make_registry(gauge=5), dead_pid)
+
+        merged = registry.collect_all()
+        self.assertEqual(merged['unit_total']['values'][LABELS], 4)
+        # 已退出 worker 的 gauge 丢弃
+        self.assertEqual(merged['unit_in_flight']['values'][LABELS], 1)
+        self.assertFalse(osp.exists(osp.join(self.dir, '%s.json' % dead_pid)))
+
+        with open(osp.join(self.dir, DEAD_SNAPSHOT)) as fr:
+            archive = json.load(fr)
+        self.assertNotIn('unit_in_flight', archive['metrics'])
+        self.assertEqual(archive['metrics']['unit_total']['values'][LABELS], 2)
+
+        # 再有 worker 退出时累加到归档中，已归档的数据不重复计算
+        dead_pid = exited_pid()
+        self.write_snapshot(self.make_registry(), dead_pid)
+        merged = registry.collect_all()
+        self.assertEqual(merged['unit_total']['values'][LABELS], 6)
+        self.assertEqual(merged['unit_seconds']['values'][LABELS][-1], 3)
+        self.assertEqual(registry.collect_all()['unit_total']['values'][LABELS], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# coding: utf-8
+"""SchemaPlan：空值与默认值、必填校验、类型转换"""
+
+import unittest
+
+import _env  # noqa: F401
+from app._webapi import Field, ValidationError, compile_schema, optional, required
+
+
+class SchemaPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = compile_schema(dict(
+            name=required.StringField(desc='名称'),
+            page=optional.IntegerField(desc='页码', default=1),
+            cursor=optional.StringField(desc='游标'),
+            tags=optional.MessageField(desc='标签'),
+        ))
+
+    def test_missing_and_empty_use_default(self):
+        for value in (None, ''):
+            result = self.plan(dict(name='a', page=value, cursor=value))
+            self.assertEqual(result['page'], 1)
+            self.assertIsNone(result['cursor'])
+        self.assertEqual(self.plan(dict(name='a')), dict(name='a', page=1, cursor=None, tags=None))
+
+    def test_falsy_values_are_kept(self):
+        result = self.plan(dict(name='a', page=0, tags=[]))
+        self.assertEqual(result['page'], 0)
+        self.assertEqual(result['tags'], [])
+
+    def test_required_empty_string_is_missing(self):
+        with self.assertRaises(ValidationError) as cm:
+            self.plan(dict(name=''))
+        self.assertEqual(cm.exception.error_type, ValidationError.ERROR_MISSING_REQUIRED)
+        self.assertEqual(cm.exception.field_name, 'name')
+        self.assertEqual(cm.exception.error_code, 400)
+
+    def test_integer_coercion(self):
+        self.assertEqual(self.plan(dict(name='a', page='3'))['page'], 3)
+        with self.assertRaises(ValidationError) as cm:
+            self.plan(dict(name='a', page='x'))
+        self.assertEqual(cm.exception.error_type, ValidationError.ERROR_INVALID_TYPE)
+
+    def test_string_type_checked(self):
+        with self.assertRaises(ValidationError):
+            self.plan(dict(name=1))
+
+    def test_custom_validate_wrapped(self):
+        class Upper(Field):
+            def validate(self, value):
+                if not value.isalpha():
+                    raise ValueError('only letters')
+                return value.upper()
+
+        plan = compile_schema(dict(code=Upper(default='X')))
+        self.assertEqual(plan(dict(code='ab')), dict(code='AB'))
+        self.assertEqual(plan(dict(code='')), dict(code='X'))
+        with self.assertRaises(ValidationError) as cm:
+            plan(dict(code='a1'))
+        self.assertEqual(cm.exception.error_type, ValidationError.ERROR_INVALID_VALUE)
+
+    def test_compile_schema(self):
+        self.assertIsNone(compile_schema(None))
+        self.assertIs(compile_schema(self.plan), self.plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# coding: utf-8
+"""EventStream：各种上游都以 end 或 error 事件结束，客户端断开时停止上游"""
+
+import threading
+import time
+import unittest
+
+import orjson
+from flask import Flask
+
+import _env  # noqa: F401
+from app._webapi.streaming import HEARTBEAT, SSE_MIMETYPE, EventStream, event_stream_response
+
+
+def parse(chunks):
+    """把 SSE 消息解析为 [(event, data), ...]，心跳记为 ('ping', None)"""
+    events = []
+    for chunk in chunks:
+        if chunk == HEARTBEAT:
+            events.append(('ping', None))
+            continue
+        lines = dict(line.split(b': ', 1) for line in chunk.strip().split(b'\n'))
+        events.append((lines[b'event'].decode(), orjson.loads(lines[b'data'])))
+    return events
+
+
+class EventStreamTest(unittest.TestCase):
+
+    def test_iterable(self):
+        events = parse(EventStream([1, {'a': 2}]))
+        self.assertEqual(events, [
+            ('message', 1), ('message', {'a': 2}), ('end', {'result': 0, 'message': 'ok'})])
+
+    def test_generator(self):
+        def gen():
+            yield 'x'
+            yield 'y'
+
+        self.assertEqual([e for e, _ in parse(EventStream(gen()))], ['message', 'message', 'end'])
+
+    def test_not_iterable(self):
+        with self.assertLogs('app._webapi.streaming', 'WARNING'):
+            events = parse(EventStream(None))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'error')
+        self.assertEqual(events[0][1]['result'], -1)
+
+    def test_generator_raises(self):
+        def gen():
+            yield 1
+            raise RuntimeError('boom')
+
+        with self.assertLogs('app._webapi.streaming', 'WARNING'):
+            events = parse(EventStream(gen()))
+        self.assertEqual(events[0], ('message', 1))
+        self.assertEqual(events[1][0], 'error')
+        self.assertIn('boom', events[1][1]['message'])
+        self.assertEqual(len(events), 2)
+
+    def test_async_generator(self):
+        async def agen():
+            yield 1
+            yield 2
+
+        self.assertEqual(parse(EventStream(agen())), [
+            ('message', 1), ('message', 2), ('end', {'result': 0, 'message': 'ok'})])
+
+    def test_async_generator_raises(self):
+        async def agen():
+            yield 1
+            raise ValueError('bad')
+
+        with self.assertLogs('app._webapi.streaming', 'WARNING'):
+            events = parse(EventStream(agen()))
+        self.assertEqual([e for e, _ in events], ['message', 'error'])
+
+    def test_heartbeat(self):
+        def gen():
+            time.sleep(0.3)
+            yield 1
+
+        events = parse(EventStream(gen(), heartbeat=0.05))
+        self.assertIn(('ping', None), events)
+        self.assertEqual(events[-2:], [('message', 1), ('end', {'result': 0, 'message': 'ok'})])
+
+    def test_client_disconnect_stops_source(self):
+        closed = threading.Event()
+        on_close = []
+
+        def gen():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.set()
+
+        it = iter(EventStream(gen(), max_buffer=2, on_close=lambda: on_close.append(1)))
+        next(it)
+        it.close()
+        self.assertTrue(closed.wait(2))
+        self.assertEqual(on_close, [1])
+
+    def test_response(self):
+        app = Flask(__name__)
+
+        @app.route('/stream')
+        def stream():
+            return event_stream_response(iter(['a', 'b']))
+
+        resp = app.test_client().get('/stream')
+        self.assertEqual(resp.mimetype, SSE_MIMETYPE)
+        self.assertEqual(resp.headers['Cache-Control'], 'no-cache')
+        events = parse(c + b'\n\n' for c in resp.data.split(b'\n\n') if c)
+        self.assertEqual([e for e, _ in events], ['message', 'message', 'end'])
+
+
+if __name__ == '__main__':
+    unittest.main()